@@ -1,8 +1,6 @@
 from flask import Blueprint, render_template_string, session, redirect
-from backend.engines.db_engine import (
-    get_conn,
-    get_api_credits
-)
+from backend.engines.db_engine import get_api_credits
+from backend.engines.stats_engine import get_counters, get_daily_series
 
 analytics_bp = Blueprint("analytics", __name__, url_prefix="/admin")
 
@@ -162,71 +160,56 @@ new Chart(document.getElementById("costChart"), {
 @analytics_bp.route("/analytics")
 def analytics():
 
-    conn = get_conn()
-    cur = conn.cursor()
+    # All figures come from the trigger-maintained stat counters
+    counters = get_counters([
+        "users",
+        "messages",
+        "questions",
+        "api.calls:OPENAI",
+        "api.calls:OPENAI_CACHE",
+        "api.calls:PROKERALA",
+        "api.cost:OPENAI",
+        "api.cost:PROKERALA",
+        "payments.revenue"
+    ])
 
     # USERS
-    cur.execute("SELECT COUNT(*) FROM users")
-    users = cur.fetchone()[0]
+    users = int(counters.get("users", 0))
 
     # ACTIVITY
-    cur.execute("SELECT COUNT(*) FROM message_logs")
-    messages = cur.fetchone()[0]
-
-    cur.execute("SELECT COUNT(*) FROM question_logs")
-    questions = cur.fetchone()[0]
+    messages = int(counters.get("messages", 0))
+    questions = int(counters.get("questions", 0))
 
     # API USAGE COUNTS
-    cur.execute("SELECT COUNT(*) FROM api_usage WHERE service='OPENAI'")
-    openai_calls = cur.fetchone()[0]
-
-    cur.execute("SELECT COUNT(*) FROM api_usage WHERE service='OPENAI_CACHE'")
-    cache_calls = cur.fetchone()[0]
-
-    cur.execute("SELECT COUNT(*) FROM api_usage WHERE service='PROKERALA'")
-    prokerala_calls = cur.fetchone()[0]
+    openai_calls = int(counters.get("api.calls:OPENAI", 0))
+    cache_calls = int(counters.get("api.calls:OPENAI_CACHE", 0))
+    prokerala_calls = int(counters.get("api.calls:PROKERALA", 0))
 
     # COSTS
-    cur.execute("SELECT SUM(cost) FROM api_usage WHERE service='OPENAI'")
-    openai_cost = cur.fetchone()[0] or 0
-
-    cur.execute("SELECT SUM(cost) FROM api_usage WHERE service='PROKERALA'")
-    prokerala_cost = cur.fetchone()[0] or 0
+    openai_cost = counters.get("api.cost:OPENAI", 0)
+    prokerala_cost = counters.get("api.cost:PROKERALA", 0)
 
     total_cost = round(openai_cost + prokerala_cost, 2)
 
     # EARNINGS
-    cur.execute("SELECT SUM(amount) FROM payments WHERE status='SUCCESS'")
-    earnings = cur.fetchone()[0] or 0
+    earnings = counters.get("payments.revenue", 0)
 
     profit = round(earnings - total_cost, 2)
 
     # 📈 MESSAGES PER DAY
-    cur.execute("""
-        SELECT DATE(created_at), COUNT(*)
-        FROM message_logs
-        GROUP BY DATE(created_at)
-        ORDER BY DATE(created_at)
-    """)
+    rows = get_daily_series("messages")
 
-    rows = cur.fetchall()
-
-    msg_labels = [r[0] for r in rows]
-    msg_data = [r[1] for r in rows]
+    msg_labels = [day for _, day, _ in rows]
+    msg_data = [int(count) for _, _, count in rows]
 
     # 📊 MONTHLY COST
-    cur.execute("""
-        SELECT strftime('%Y-%m', created_at), SUM(cost)
-        FROM api_usage
-        GROUP BY strftime('%Y-%m', created_at)
-        ORDER BY 1
-    """)
-
-    monthly_rows = cur.fetchall()
-    conn.close()
-
-    months = [r[0] for r in monthly_rows]
-    costs = [round(r[1],2) for r in monthly_rows]
+    monthly = {}
+
+    for _, day, cost in get_daily_series(prefix="api.cost:"):
+        monthly[day[:7]] = monthly.get(day[:7], 0) + cost
+
+    months = sorted(monthly)
+    costs = [round(monthly[m], 2) for m in months]
 
     # Simple profit per month (earnings evenly split)
     profits = []
@@ -1,50 +1,210 @@
-from flask import Blueprint, Response
+from flask import Blueprint, Response, request, stream_with_context
 import csv
+import zlib
 from io import StringIO
+from datetime import datetime
+from backend.config import Config
 from backend.engines.db_engine import get_conn
 
 export_bp = Blueprint("export", __name__, url_prefix="/admin")
 
 
-def generate_csv(query, headers):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute(query)
-    rows = cur.fetchall()
-    conn.close()
+# =========================
+# EXPORT DEFINITIONS
+# =========================
+
+# name -> (table, keyset column, columns)
+# The keyset column is exported first so an interrupted download can be
+# resumed with ?after=<last value received>.
+EXPORTS = {
+    "users": ("users", "phone", ["phone", "name", "created_at"]),
+    "messages": ("message_logs", "id", ["id", "phone", "message", "created_at"]),
+    "questions": ("questions_log", "id", ["id", "phone", "question", "created_at"]),
+}
+
+
+class ExportError(ValueError):
+    """Invalid export filter"""
+
+
+def _parse_day(value, name):
+    if not value:
+        return None
+
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").strftime("%Y-%m-%d")
+    except ValueError:
+        raise ExportError(f"{name} must be YYYY-MM-DD")
+
+
+def _export_filters(args, key):
+    """
+    Build the WHERE clause from query params
+
+    Supported: since / until (YYYY-MM-DD, on created_at, until inclusive),
+    phone, after (keyset resume).
+    """
+
+    clauses, params = [], []
+
+    since = _parse_day(args.get("since"), "since")
+    until = _parse_day(args.get("until"), "until")
+
+    if since:
+        clauses.append("created_at >= ?")
+        params.append(since)
+
+    if until:
+        clauses.append("created_at < date(?, '+1 day')")
+        params.append(until)
+
+    phone = args.get("phone")
+
+    if phone:
+        clauses.append("phone = ?")
+        params.append(phone)
+
+    after = args.get("after")
+
+    if after:
+        if key == "id":
+            try:
+                after = int(after)
+            except ValueError:
+                raise ExportError("after must be an integer")
+
+        clauses.append(f"{key} > ?")
+        params.append(after)
+
+    return clauses, params
+
+
+# =========================
+# STREAMING
+# =========================
+
+def iter_rows(table, key, columns, clauses, params, chunk_size=None):
+    """
+    Yield rows in keyset order, one short query per chunk
+
+    Each chunk borrows a pooled connection only for the duration of the
+    query, so a long download neither pins a connection nor holds a read
+    snapshot open for its whole lifetime.
+    """
+
+    chunk_size = chunk_size or Config.EXPORT_CHUNK_SIZE
+    select = ", ".join(columns)
+    key_index = columns.index(key)
+    last = None
+
+    while True:
+        where = list(clauses)
+        args = list(params)
+
+        if last is not None:
+            where.append(f"{key} > ?")
+            args.append(last)
+
+        sql = f"SELECT {select} FROM {table}"
+
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+
+        sql += f" ORDER BY {key} LIMIT ?"
+        args.append(chunk_size)
+
+        conn = get_conn()
+
+        try:
+            cur = conn.cursor()
+            cur.execute(sql, args)
+            rows = cur.fetchall()
+        finally:
+            conn.close()
+
+        if not rows:
+            return
+
+        for row in rows:
+            yield tuple(row)
+
+        if len(rows) < chunk_size:
+            return
+
+        last = rows[-1][key_index]
+
+
+def generate_csv(rows, headers):
+    """Yield CSV text in roughly chunk-sized pieces"""
 
     output = StringIO()
     writer = csv.writer(output)
     writer.writerow(headers)
 
-    for r in rows:
-        writer.writerow(r)
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+
+        if i % 1000 == 0:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate(0)
+
+    yield output.getvalue()
+
+
+def gzip_stream(chunks):
+    """Gzip a stream of text chunks on the fly"""
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
 
-    return output.getvalue()
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
 
+        if data:
+            yield data
+
+    yield compressor.flush()
+
+
+def stream_export(name):
+    table, key, columns = EXPORTS[name]
+
+    try:
+        clauses, params = _export_filters(request.args, key)
+    except ExportError as e:
+        return Response(str(e), status=400, mimetype="text/plain")
+
+    body = generate_csv(iter_rows(table, key, columns, clauses, params), columns)
+    filename = f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+
+    if request.args.get("gzip") in ("1", "true"):
+        body = gzip_stream(body)
+        filename += ".gz"
+        mimetype = "application/gzip"
+    else:
+        mimetype = "text/csv"
+
+    return Response(
+        stream_with_context(body),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+
+# =========================
+# ROUTES
+# =========================
 
 @export_bp.route("/export/users")
 def export_users():
-    csv_data = generate_csv(
-        "SELECT phone, name, created_at FROM users",
-        ["phone", "name", "created_at"]
-    )
-    return Response(csv_data, mimetype="text/csv")
+    return stream_export("users")
 
 
 @export_bp.route("/export/messages")
 def export_messages():
-    csv_data = generate_csv(
-        "SELECT phone, message, created_at FROM message_logs",
-        ["phone", "message", "created_at"]
-    )
-    return Response(csv_data, mimetype="text/csv")
+    return stream_export("messages")
 
 
 @export_bp.route("/export/questions")
 def export_questions():
-    csv_data = generate_csv(
-        "SELECT phone, question, created_at FROM question_logs",
-        ["phone", "question", "created_at"]
-    )
-    return Response(csv_data, mimetype="text/csv")
+    return stream_export("questions")
@@ -9,7 +9,7 @@ from flask import Flask, request, Response
 import xml.sax.saxutils as saxutils
 
 from backend.engines.fsm_engine import process_message
-from backend.engines.db_engine import init_db
+from backend.engines.db_engine import init_db, unit_of_work
 from backend.utils.security import validate_twilio_signature
 from backend.utils.rate_limiter import is_rate_limited
 from backend.config import settings
@@ -113,11 +113,47 @@ except Exception as e:
 # HEALTH CHECK ENDPOINT
 # =========================
 
+# Optional subsystems reported by /health:
+# key -> (module, getter, method called on the getter's result)
+HEALTH_STATS = {
+    "database_pool": ("backend.engines.db_engine", "get_pool_stats", None),
+    "unit_of_work": ("backend.engines.db_engine", "get_unit_of_work_stats", None),
+    "log_sink": ("backend.engines.log_engine", "get_log_sink", "stats"),
+    "cache": ("backend.engines.cache_engine", "get_cache", "stats"),
+    "charts": ("backend.engines.chart_engine", "get_chart_stats", None),
+    "transits": ("backend.engines.transit_engine", "get_snapshot_stats", None),
+    "answers": ("backend.engines.answer_cache_engine", "get_answer_cache_stats", None),
+    "prompts": ("backend.engines.prompt_engine", "get_prompt_stats", None),
+    "singleflight": ("backend.utils.singleflight", "get_singleflight_stats", None),
+    "upstreams": ("backend.services.http_client", "get_http_stats", None),
+    "circuit_breakers": ("backend.utils.resilience", "get_resilience_stats", None),
+    "ai_executor": ("backend.engines.ai_stream_engine", "get_ai_executor", "stats"),
+    "rate_limits": ("backend.utils.rate_limiter", "get_rate_limit_stats", None),
+    "workers": ("worker.worker", "get_worker_stats", None),
+}
+
+
+def _subsystem_stats(name, module, getter, method):
+    """Stats of one subsystem; None (and a warning) if they can't be read"""
+    try:
+        from importlib import import_module
+        
+        result = getattr(import_module(module), getter)()
+        
+        return getattr(result, method)() if method else result
+    except Exception as e:
+        logger.warning(f"{name} stats unavailable: {e}")
+        return None
+
+
 @app.route("/health", methods=["GET"])
 def health_check():
     """
     Health check endpoint for monitoring and load balancers
     Returns 200 if healthy, 503 if unhealthy
+    
+    Only the database decides health; every other subsystem is reported
+    under its own key and a failing one shows up as null.
     """
     try:
         from backend.engines.db_engine import get_conn
@@ -155,6 +191,9 @@ def health_check():
         "environment": settings.ENV
     }
     
+    for name, (module, getter, method) in HEALTH_STATS.items():
+        health_status[name] = _subsystem_stats(name, module, getter, method)
+    
     return health_status, 200 if healthy else 503
 
 
@@ -223,7 +262,9 @@ def bot():
         logger.info(f"📩 [{user}] {body[:50]}{'...' if len(body) > 50 else ''}")
         
         # 🤖 Process message through FSM engine
-        reply_text = process_message(user, body)
+        # All DB writes for this message commit together (or not at all)
+        with unit_of_work():
+            reply_text = process_message(user, body)
         
         # Fallback if no reply
         if not reply_text:
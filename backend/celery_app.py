@@ -38,6 +38,7 @@ def configure_celery():
         task_routes={
             'backend.workers.payment_recovery.*': {'queue': 'high_priority'},
             'backend.workers.payment_retry.*': {'queue': 'high_priority'},
+            'backend.workers.kundali.*': {'queue': 'high_priority'},
             'backend.workers.notification.*': {'queue': 'normal'},
             'backend.workers.analytics.*': {'queue': 'low_priority'},
         },
@@ -52,10 +53,18 @@ def configure_celery():
                 'task': 'backend.workers.payment_retry.retry_failed_payments',
                 'schedule': crontab(minute=0, hour='*/2'),
             },
+            'refresh-analytics-rollups': {
+                'task': 'backend.workers.analytics.refresh_rollups',
+                'schedule': crontab(minute='*/5'),
+            },
             'daily-revenue-report': {
                 'task': 'backend.workers.analytics.generate_daily_report',
                 'schedule': crontab(hour=9, minute=0),
             },
+            'precompute-transits': {
+                'task': 'backend.workers.transits.precompute_transits',
+                'schedule': crontab(minute=5, hour='0,6,12,18'),
+            },
             'clean-expired-sessions': {
                 'task': 'backend.workers.cleanup.clean_expired_sessions',
                 'schedule': crontab(minute=0, hour='*/6'),
@@ -69,6 +78,8 @@ def configure_celery():
         'backend.workers.payment_retry',
         'backend.workers.analytics',
         'backend.workers.cleanup',
+        'backend.workers.transits',
+        'backend.workers.kundali',
     ])
 
 
@@ -27,6 +27,9 @@ class Settings(BaseSettings):
     DB_MAX_OVERFLOW: int = 20
     DB_POOL_TIMEOUT: int = 30
     DB_ECHO: bool = False
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000
+    SQLITE_SYNCHRONOUS: str = "NORMAL"
+    SQLITE_STATEMENT_CACHE_SIZE: int = 256
 
     REDIS_URL: str = "redis://localhost:6379/0"
     REDIS_CACHE_DB: int = 0
@@ -34,6 +37,24 @@ class Settings(BaseSettings):
     REDIS_SESSION_DB: int = 2
     REDIS_MAX_CONNECTIONS: int = 50
 
+    # Two-tier cache: "auto" uses Redis when reachable, else the SQLite cache table
+    CACHE_BACKEND: str = "auto"
+    CACHE_L1_MAX_ENTRIES: int = 2048
+
+    # FSM sessions: "auto" uses Redis (REDIS_SESSION_DB) when reachable, else SQLite
+    SESSION_BACKEND: str = "auto"
+    SESSION_TTL_HOURS: int = 24
+
+    # Rate limits: "auto" shares token buckets through Redis when reachable,
+    # "local" keeps them per process
+    RATE_LIMIT_BACKEND: str = "auto"
+    RATE_LIMIT_MESSAGES: int = 10
+    RATE_LIMIT_MESSAGES_WINDOW_SECONDS: int = 60
+    RATE_LIMIT_AI_COOLDOWN_SECONDS: int = 5
+
+    # Kundali charts kept in memory by chart_engine (sessions store only the key)
+    CHART_CACHE_MAX_ENTRIES: int = 512
+
     CELERY_BROKER_URL: str = "redis://localhost:6379/1"
     CELERY_RESULT_BACKEND: str = "redis://localhost:6379/1"
     CELERY_TASK_TIME_LIMIT: int = 300
@@ -60,11 +81,78 @@ class Settings(BaseSettings):
     PROKERALA_MODE: str = "sandbox"  # ADD THIS LINE
     PROKERALA_TIMEOUT_SECONDS: int = 10
     PROKERALA_MAX_RETRIES: int = 3
+    # Token treated as expired this close to expires_in ...
+    PROKERALA_TOKEN_REFRESH_MARGIN_SECONDS: int = 60
+    # ... and refreshed in the background from this point on
+    PROKERALA_TOKEN_PREFETCH_SECONDS: int = 300
+
+    # Chart source: "prokerala", "local" (ephemeris_engine, no API cost)
+    # or "verify" (Prokerala, cross-checked against the local ephemeris)
+    EPHEMERIS_MODE: str = "prokerala"
+
+    # Upstream circuit breakers (rolling window) and bulkheads
+    BREAKER_WINDOW_SECONDS: int = 60
+    BREAKER_MIN_CALLS: int = 10
+    BREAKER_FAILURE_RATE: float = 0.5
+    BREAKER_OPEN_SECONDS: int = 30
+    # Timeout = p99 of recent latencies x this, within each upstream's bounds
+    ADAPTIVE_TIMEOUT_MULTIPLIER: float = 1.5
+    BULKHEAD_WAIT_SECONDS: float = 0.5
+    PROKERALA_MAX_CONCURRENT: int = 8
+    OPENAI_MAX_CONCURRENT: int = 8
+
+    # Coalescing of concurrent kundali / transit computations
+    SINGLEFLIGHT_WAIT_SECONDS: float = 30.0
+    SINGLEFLIGHT_DISTRIBUTED: bool = True
+
+    # Daily transits: days precomputed ahead of today / max range per query
+    TRANSIT_PRECOMPUTE_DAYS: int = 7
+    TRANSIT_MAX_RANGE_DAYS: int = 31
+
+    # Charts not cached at the place step are computed off the webhook and
+    # pushed when ready; backend "thread" (in-process worker) or "celery"
+    KUNDALI_ASYNC: bool = True
+    KUNDALI_JOB_BACKEND: str = "thread"
+    KUNDALI_JOB_TIMEOUT_SECONDS: int = 120
+
+    # In-process task pools (worker/worker.py): threads per task type,
+    # tasks per priority lane, producer wait when a lane is full
+    WORKER_AI_THREADS: int = 4
+    WORKER_PDF_THREADS: int = 2
+    WORKER_KUNDALI_THREADS: int = 2
+    WORKER_CHART_THREADS: int = 4
+    WORKER_QUEUE_SIZE: int = 100
+    WORKER_ENQUEUE_WAIT_SECONDS: float = 0.5
+    WORKER_DRAIN_SECONDS: int = 20
 
     OPENAI_API_KEY: str = ""
     OPENAI_MODEL: str = "gpt-4"
     OPENAI_MAX_TOKENS: int = 500
     OPENAI_TEMPERATURE: float = 0.7
+    OPENAI_TIMEOUT_SECONDS: int = 30
+
+    # Q&A answers generated off the web thread and streamed to WhatsApp
+    AI_STREAMING: bool = True
+    AI_MAX_CONCURRENT: int = 8
+    AI_MAX_PER_USER: int = 1
+    AI_QUEUE_SIZE: int = 200
+    AI_QUEUE_DEADLINE_SECONDS: int = 60
+    # First message is sent early, later ones carry more text
+    AI_STREAM_FIRST_CHUNK_CHARS: int = 160
+    AI_STREAM_CHUNK_CHARS: int = 700
+
+    # Answers reused across rephrasings of a question about the same chart
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIMILARITY: float = 0.7
+    ANSWER_CACHE_MAX_PER_SCOPE: int = 32
+    ANSWER_CACHE_MAX_TTL_SECONDS: int = 2592000
+
+    # AI prompt assembly. Fits the required sections, focus lines, key
+    # months, transits and calendar of every question type (~450-600
+    # tokens) plus room for Prokerala's yoga descriptions; the rest of
+    # the chart is what gets trimmed
+    PROMPT_TOKEN_BUDGET: int = 800
+    PROMPT_CONTEXT_MAX_CHARTS: int = 1000
 
     ALLOWED_HOSTS: List[str] = ["*"]
     CORS_ORIGINS: List[str] = ["*"]
@@ -97,6 +185,21 @@ class Settings(BaseSettings):
     LOG_FORMAT: str = "json"
     LOG_FILE: Optional[str] = None
 
+    # Write-behind sink for message_logs / questions_log / api_usage
+    LOG_SINK_ENABLED: bool = True
+    LOG_SINK_CAPACITY: int = 10000
+    LOG_SINK_BATCH_SIZE: int = 500
+    LOG_SINK_FLUSH_INTERVAL_SECONDS: float = 1.0
+    LOG_SINK_BLOCK_TIMEOUT_MS: int = 50
+    LOG_SINK_FLUSH_RETRIES: int = 3
+
+    # Rows fetched per keyset page by the admin CSV exports
+    EXPORT_CHUNK_SIZE: int = 5000
+
+    # SQLite -> PostgreSQL migration (backend.engines.migration_engine)
+    MIGRATION_BATCH_SIZE: int = 5000
+    MIGRATION_WORKERS: int = 4
+
     ENABLE_ANALYTICS: bool = True
     ENABLE_REVENUE_TRACKING: bool = True
     ENABLE_PAYMENT_RETRY: bool = True
@@ -1,15 +1,14 @@
-import time
 import logging
+from functools import lru_cache
 from datetime import datetime, timedelta
 
 from backend.config import Config
-from backend.engines.transit_engine import get_daily_transits
-from backend.engines.db_engine import (
-    get_ai_cached_answer,
-    save_ai_answer,
-    log_api_usage,
-    use_api_credit
-)
+from backend.engines.prompt_engine import build_user_prompt
+from backend.engines.classifier_engine import classify_labels
+from backend.utils.resilience import get_guard, UpstreamUnavailable
+from backend.utils.rate_limiter import allow
+from backend.engines.answer_cache_engine import get_cached_answer, save_answer, estimate_tokens
+from backend.engines.db_engine import log_api_usage, use_api_credit
 
 logger = logging.getLogger(__name__)
 
@@ -25,14 +24,6 @@ except:
     client = None
 
 
-# =========================
-# RATE LIMIT
-# =========================
-
-LAST_CALL = {}
-COOLDOWN = 5
-
-
 # =========================
 # COST
 # =========================
@@ -45,22 +36,9 @@ OPENAI_COST_PER_CALL = 0.01
 # =========================
 
 def classify_question(question):
+    """Main question type (a RULE_FOCUS key) in any supported language"""
 
-    q = question.lower()
-
-    if any(w in q for w in ["career","job","promotion","business","work"]):
-        return "CAREER"
-
-    if any(w in q for w in ["marriage","love","relationship","husband","wife"]):
-        return "MARRIAGE"
-
-    if any(w in q for w in ["money","finance","income","wealth","salary","profit"]):
-        return "FINANCE"
-
-    if any(w in q for w in ["health","ill","disease","medical","problem"]):
-        return "HEALTH"
-
-    return "GENERAL"
+    return classify_labels(question)[0]
 
 
 # =========================
@@ -181,6 +159,7 @@ def build_month_calendar():
 # SYSTEM PROMPT (HIGH ACCURACY + NEW FEATURES)
 # =========================
 
+@lru_cache(maxsize=64)
 def build_system_prompt(lang, astro_system):
 
     base_prompt = f"""
@@ -244,125 +223,101 @@ Remedy:
 
 
 # =========================
-# MAIN AI FUNCTION
+# PROMPT
 # =========================
 
-def ask_ai(phone, question, data):
+AI_MODEL = "gpt-4o-mini"
+AI_TEMPERATURE = 0.4
+AI_MAX_TOKENS = 1100
 
-    # ---------- CACHE ----------
-    cached = get_ai_cached_answer(phone, question)
+ANSWER_HEADER = "🔮 *Vedic Astrology Insight*\n\n"
 
-    if cached:
-        log_api_usage("OPENAI_CACHE", 0)
-        return cached
-
-    # ---------- RATE LIMIT ----------
-    now = time.time()
-
-    if now - LAST_CALL.get(phone, 0) < COOLDOWN:
-        return "⏳ Please wait a moment before asking again."
 
-    LAST_CALL[phone] = now
+def build_ai_messages(question, data):
+    """
+    Chat messages for a question about the user's chart
 
-    if not client:
-        return "⚠️ AI service unavailable right now."
+    Args:
+        question: User's question
+        data: Session data (birth details, chart reference, language)
 
-    # ---------- DATA ----------
+    Returns:
+        list: OpenAI chat messages (system + user)
+    """
 
     lang = data.get("lang", "EN")
     astro_system = data.get("astro_system", "LAHIRI")
-    kundali = data.get("kundali", {})
-
-    planets_text = format_planets(kundali.get("planets", []))
-    lords_text = format_house_lords(kundali.get("house_lords", {}))
-    aspects_text = format_aspects(kundali.get("aspects", []))
-    transits_text = format_transits(get_daily_transits())
-
-    yogas = kundali.get("yogas", [])
-    yogas_text = "\n".join(y["name"] for y in yogas) if yogas else "None"
-
-    dasha_timeline = kundali.get("dasha_timeline", {})
-    dasha_text = format_dasha_timeline(dasha_timeline)
-    key_months = extract_key_months(dasha_timeline)
-
-    calendar_text = build_month_calendar()
 
-    qtype = classify_question(question)
-
-    # ---------- PROMPTS ----------
+    qtype, *also = classify_labels(question)
 
     system_instruction = build_system_prompt(lang, astro_system)
+    user_prompt = build_user_prompt(question, data, qtype, also=also)
 
-    user_prompt = f"""
-CLIENT DETAILS
-Name: {data.get('name')}
-DOB: {data.get('dob')} {data.get('time')}
-Place: {data.get('place')}
-
-CORE CHART
-Ascendant: {kundali.get('lagna')}
-Sun Sign: {kundali.get('sun_sign')}
-Moon Sign: {kundali.get('moon_sign')}
-Nakshatra: {kundali.get('nakshatra')} (Pada {kundali.get('pada')})
-
-PLANETS:
-{planets_text}
+    return [
+        {"role": "system", "content": system_instruction},
+        {"role": "user", "content": user_prompt}
+    ]
 
-HOUSE LORDS:
-{lords_text}
 
-ASPECTS:
-{aspects_text}
-
-YOGAS:
-{yogas_text}
+# =========================
+# MAIN AI FUNCTION
+# =========================
 
-MANGLIK:
-{kundali.get('manglik')}
+def ask_ai(phone, question, data):
 
-DASHA + ANTARDASHA:
-{dasha_text}
+    # ---------- CACHE ----------
+    cached = get_cached_answer(question, data)
 
-IMPORTANT UPCOMING MONTHS:
-{key_months}
+    if cached:
+        log_api_usage(phone, "OPENAI_CACHE", 0)
+        return cached
 
-CURRENT TRANSITS:
-{transits_text}
+    # ---------- RATE LIMIT ----------
+    if not allow("ai_question", phone):
+        return "⏳ Please wait a moment before asking again."
 
-MONTH CALENDAR:
-{calendar_text}
+    if not client:
+        return "⚠️ AI service unavailable right now."
 
-ANALYSIS FOCUS:
-{RULE_FOCUS[qtype]}
+    # ---------- PROMPTS ----------
 
-USER QUESTION:
-{question}
-"""
+    messages = build_ai_messages(question, data)
 
     logger.info(f"🔮 Calling OpenAI: {question}")
 
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": system_instruction},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.4,
-            max_tokens=1100
+        response = get_guard("openai").call(
+            lambda timeout: client.chat.completions.create(
+                model=AI_MODEL,
+                messages=messages,
+                temperature=AI_TEMPERATURE,
+                max_tokens=AI_MAX_TOKENS,
+                timeout=timeout
+            )
         )
 
         answer = response.choices[0].message.content.strip()
 
-        final_answer = f"🔮 *Vedic Astrology Insight*\n\n{answer}"
+        final_answer = ANSWER_HEADER + answer
+
+        usage = getattr(response, "usage", None)
+        tokens = usage.total_tokens if usage else estimate_tokens(messages, answer)
 
-        save_ai_answer(phone, question, final_answer)
+        save_answer(question, data, final_answer, tokens)
 
-        log_api_usage("OPENAI", OPENAI_COST_PER_CALL)
+        log_api_usage(phone, "OPENAI", OPENAI_COST_PER_CALL)
         use_api_credit("OPENAI", 1)
 
         return final_answer
 
+    except UpstreamUnavailable as e:
+        logger.warning(f"🔌 OpenAI call rejected: {e}")
+
+        return (
+            "⚠️ AI service is busy right now.\n"
+            "Please try again in a few minutes."
+        )
+
     except Exception as e:
         logger.error(f"❌ OpenAI error: {e}")
 
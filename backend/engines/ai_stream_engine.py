@@ -0,0 +1,491 @@
+"""
+AI Answer Executor
+Answers Q&A questions off the web thread and streams them to WhatsApp
+
+- One asyncio event loop (in a daemon thread) per process makes every
+  OpenAI call, so the webhook returns as soon as the question is queued
+- At most AI_MAX_CONCURRENT answers are generated at once and
+  AI_MAX_PER_USER per phone; further questions wait in a queue bounded by
+  AI_QUEUE_SIZE and are dropped once older than AI_QUEUE_DEADLINE_SECONDS
+- Completions are streamed and pushed through the Twilio REST API at
+  sentence boundaries, in order; the first chunk goes out as soon as a
+  sentence or two is ready
+- A question that got no answer at all has its Q&A credit refunded
+
+Usage (from the FSM, inside the webhook's unit of work):
+    if get_ai_executor().accepts(phone) is None:
+        submit_question(phone, question, data, footer)
+"""
+
+import re
+import time
+import asyncio
+import logging
+import threading
+
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+# WhatsApp rejects bodies over 1600 characters
+WHATSAPP_LIMIT = 1600
+
+# Split after sentence punctuation (incl. Devanagari danda) or at blank lines
+SENTENCE_END = re.compile(r"(?<=[.!?।॥])\s+|\n\s*\n")
+
+
+# =========================
+# CHUNKING
+# =========================
+
+class SentenceChunker:
+    """
+    Buffers streamed text and cuts it into WhatsApp messages
+
+    A chunk is released at the last sentence boundary past the target
+    size: `first_size` for the first chunk (fast first reply), `size`
+    after that (fewer messages).
+    """
+
+    def __init__(self, first_size, size, limit=WHATSAPP_LIMIT):
+        self.first_size = first_size
+        self.size = size
+        self.limit = limit
+
+        self.buffer = ""
+        self.released = 0
+
+    def feed(self, text):
+        """Add streamed text; returns the chunks now ready"""
+
+        self.buffer += text
+        chunks = []
+
+        while True:
+            target = self.first_size if not self.released else self.size
+
+            if len(self.buffer) < target:
+                return chunks
+
+            cut = None
+
+            for match in SENTENCE_END.finditer(self.buffer, 0, self.limit):
+                if match.start() >= target:
+                    cut = match
+                    break
+
+            if cut is not None:
+                chunks.append(self._take(cut.start(), cut.end()))
+            elif len(self.buffer) >= self.limit:
+                # No sentence end within the limit; break at a space
+                space = self.buffer.rfind(" ", 0, self.limit)
+                end = space if space > 0 else self.limit
+                chunks.append(self._take(end, end))
+            else:
+                return chunks
+
+    def flush(self):
+        """Whatever is left, within the message limit"""
+
+        chunks = []
+
+        while self.buffer.strip():
+            if len(self.buffer) <= self.limit:
+                chunks.append(self._take(len(self.buffer), len(self.buffer)))
+            else:
+                space = self.buffer.rfind(" ", 0, self.limit)
+                end = space if space > 0 else self.limit
+                chunks.append(self._take(end, end))
+
+        self.buffer = ""
+
+        return chunks
+
+    def _take(self, end, resume):
+        chunk = self.buffer[:end].strip()
+        self.buffer = self.buffer[resume:].lstrip()
+        self.released += 1
+        return chunk
+
+
+# =========================
+# EXECUTOR
+# =========================
+
+class AIExecutor:
+    """Process-wide asyncio executor for AI answers"""
+
+    def __init__(self):
+        self._loop = None
+        self._queue = None
+        self._client = None
+        self._thread = None
+
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+        # phone -> questions queued or running
+        self._active = {}
+        self._queued = 0
+
+        self._stats = {
+            "submitted": 0,
+            "answered": 0,
+            "failed": 0,
+            "expired": 0,
+            "refunded": 0,
+            "rejected_user": 0,
+            "rejected_full": 0,
+            "chunks": 0,
+            "first_chunks": 0,
+            "first_chunk_ms_total": 0.0
+        }
+
+    # ---------- LIFECYCLE ----------
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run_loop, name="ai-executor", daemon=True)
+                self._thread.start()
+
+        self._ready.wait(5)
+
+    def _run_loop(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        self._queue = asyncio.Queue()
+
+        # One consumer per concurrency slot: the global limit
+        for _ in range(Config.AI_MAX_CONCURRENT):
+            loop.create_task(self._consume())
+
+        self._loop = loop
+        self._ready.set()
+
+        logger.info(f"🤖 AI executor started ({Config.AI_MAX_CONCURRENT} concurrent)")
+
+        loop.run_forever()
+
+    # ---------- SUBMISSION ----------
+
+    def accepts(self, phone):
+        """
+        Whether a question from `phone` would be queued
+
+        Returns:
+            None if accepted, else "user" (answer already in progress) or
+            "full" (queue at capacity)
+        """
+
+        with self._lock:
+            if self._active.get(phone, 0) >= Config.AI_MAX_PER_USER:
+                return "user"
+
+            if self._queued >= Config.AI_QUEUE_SIZE:
+                return "full"
+
+        return None
+
+    def submit(self, job):
+        """
+        Queue a question (thread-safe)
+
+        Returns:
+            str: None if queued, else the accepts() rejection reason
+        """
+
+        phone = job["phone"]
+
+        with self._lock:
+            if self._active.get(phone, 0) >= Config.AI_MAX_PER_USER:
+                self._stats["rejected_user"] += 1
+                return "user"
+
+            if self._queued >= Config.AI_QUEUE_SIZE:
+                self._stats["rejected_full"] += 1
+                return "full"
+
+            self._active[phone] = self._active.get(phone, 0) + 1
+            self._queued += 1
+            self._stats["submitted"] += 1
+
+        self.start()
+
+        job.setdefault("enqueued_at", time.monotonic())
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, job)
+
+        return None
+
+    # ---------- WORKERS ----------
+
+    async def _consume(self):
+        while True:
+            job = await self._queue.get()
+
+            with self._lock:
+                self._queued -= 1
+
+            try:
+                waited = time.monotonic() - job["enqueued_at"]
+
+                if waited > Config.AI_QUEUE_DEADLINE_SECONDS:
+                    logger.warning(f"⏳ AI question for {job['phone']} expired after {waited:.0f}s in queue")
+                    self._count("expired")
+                    await self._give_up(job)
+                else:
+                    await self._answer(job)
+
+            except Exception:
+                logger.exception(f"❌ AI job for {job['phone']} crashed")
+
+            finally:
+                with self._lock:
+                    remaining = self._active.get(job["phone"], 1) - 1
+
+                    if remaining > 0:
+                        self._active[job["phone"]] = remaining
+                    else:
+                        self._active.pop(job["phone"], None)
+
+    async def _answer(self, job):
+        from backend.engines.ai_engine import (
+            build_ai_messages, ANSWER_HEADER, OPENAI_COST_PER_CALL
+        )
+        from backend.engines.answer_cache_engine import save_answer, estimate_tokens
+        from backend.engines.db_engine import log_api_usage, use_api_credit
+        from backend.utils.resilience import get_guard
+
+        loop = asyncio.get_running_loop()
+        phone = job["phone"]
+
+        # Chart / transit lookups touch the DB; keep them off the loop
+        try:
+            messages = await loop.run_in_executor(None, build_ai_messages, job["question"], job["data"])
+        except Exception:
+            logger.exception(f"❌ Could not build AI prompt for {phone}")
+            self._count("failed")
+            await self._give_up(job)
+            return
+
+        chunker = SentenceChunker(Config.AI_STREAM_FIRST_CHUNK_CHARS, Config.AI_STREAM_CHUNK_CHARS)
+        chunker.feed(ANSWER_HEADER)
+
+        outbox = asyncio.Queue()
+        delivered = []
+        sender = loop.create_task(self._send(job, outbox, delivered))
+
+        progress = {"chars": 0, "parts": []}
+        streamed = False
+
+        try:
+            await get_guard("openai").acall(
+                lambda timeout: self._stream(messages, timeout, chunker, outbox, progress)
+            )
+            streamed = True
+
+        except Exception as e:
+            logger.error(f"❌ OpenAI stream failed for {phone}: {e}")
+
+        finally:
+            # A stream cut short still delivers what arrived (never the
+            # bare header)
+            tail = chunker.flush() if progress["chars"] else []
+
+            if streamed and job.get("footer"):
+                tail = self._with_footer(tail, job["footer"])
+
+            for chunk in tail:
+                outbox.put_nowait(chunk)
+
+            outbox.put_nowait(None)
+            await sender
+
+        if not any(delivered):
+            self._count("failed")
+            await self._give_up(job)
+            return
+
+        if not streamed:
+            # Partial answer delivered; the credit stays used
+            self._count("failed")
+            return
+
+        self._count("answered")
+
+        answer = "".join(progress["parts"]).strip()
+        tokens = estimate_tokens(messages, answer)
+
+        await loop.run_in_executor(
+            None, save_answer, job["question"], job["data"], ANSWER_HEADER + answer, tokens
+        )
+        await loop.run_in_executor(None, log_api_usage, phone, "OPENAI", OPENAI_COST_PER_CALL)
+        await loop.run_in_executor(None, use_api_credit, "OPENAI", 1)
+
+    async def _stream(self, messages, timeout, chunker, outbox, progress):
+        from backend.engines.ai_engine import AI_MODEL, AI_TEMPERATURE, AI_MAX_TOKENS
+
+        stream = await self._openai().chat.completions.create(
+            model=AI_MODEL,
+            messages=messages,
+            temperature=AI_TEMPERATURE,
+            max_tokens=AI_MAX_TOKENS,
+            stream=True,
+            timeout=timeout
+        )
+
+        # openai 1.6 has no stream_options, so streams report no usage;
+        # the caller estimates tokens from the streamed text
+        async for event in stream:
+            if not event.choices:
+                continue
+
+            delta = event.choices[0].delta.content
+
+            if delta:
+                progress["chars"] += len(delta)
+                progress["parts"].append(delta)
+
+                for chunk in chunker.feed(delta):
+                    outbox.put_nowait(chunk)
+
+    async def _send(self, job, outbox, delivered):
+        """Push chunks one at a time so they arrive in order"""
+
+        from backend.engines.kundali_job_engine import push_message
+
+        loop = asyncio.get_running_loop()
+
+        while True:
+            chunk = await outbox.get()
+
+            if chunk is None:
+                return
+
+            ok = await loop.run_in_executor(None, push_message, job["phone"], chunk)
+            delivered.append(ok)
+
+            if ok:
+                with self._lock:
+                    self._stats["chunks"] += 1
+
+                    if len(delivered) == 1:
+                        self._stats["first_chunks"] += 1
+                        self._stats["first_chunk_ms_total"] += (time.monotonic() - job["enqueued_at"]) * 1000
+
+    async def _give_up(self, job):
+        """Refund the question and tell the user"""
+
+        from backend.engines.db_engine import grant_qna_pack
+        from backend.engines.kundali_job_engine import push_message
+        from backend.utils.text_content import ERROR_MESSAGES
+
+        loop = asyncio.get_running_loop()
+        lang = job.get("lang", "EN")
+
+        if job.get("refund", True):
+            await loop.run_in_executor(None, grant_qna_pack, job["phone"], 1)
+            self._count("refunded")
+
+        busy = ERROR_MESSAGES["AI_BUSY"].get(lang, ERROR_MESSAGES["AI_BUSY"]["EN"])
+
+        await loop.run_in_executor(None, push_message, job["phone"], busy)
+
+    # ---------- HELPERS ----------
+
+    def _openai(self):
+        if self._client is None:
+            from openai import AsyncOpenAI
+
+            self._client = AsyncOpenAI(api_key=Config.OPENAI_API_KEY)
+
+        return self._client
+
+    def _with_footer(self, chunks, footer):
+        # Footer rides on the last chunk, or goes alone if that would
+        # exceed the WhatsApp limit (it carries the credits and menu)
+        if chunks and len(chunks[-1]) + len(footer) + 2 <= WHATSAPP_LIMIT:
+            return chunks[:-1] + [f"{chunks[-1]}\n\n{footer}"]
+
+        return chunks + [footer]
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["queued"] = self._queued
+            stats["active_users"] = len(self._active)
+
+        first_total = stats.pop("first_chunk_ms_total")
+        first_chunks = stats.pop("first_chunks")
+
+        # Queueing included: question accepted -> first message sent
+        stats["avg_first_chunk_ms"] = round(first_total / first_chunks, 1) if first_chunks else None
+
+        return stats
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_ai_executor():
+    global _executor
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = AIExecutor()
+
+    return _executor
+
+
+def submit_question(phone, question, data, footer=None):
+    """
+    Queue a question once the current unit of work commits
+
+    The credit deduction and the job become visible together; a rolled
+    back request never reaches OpenAI.
+
+    Args:
+        phone: User's WhatsApp number
+        question: Question text
+        data: Session data (copied)
+        footer: Text appended after the answer (remaining credits, menu)
+    """
+
+    from backend.engines.db_engine import current_unit_of_work
+
+    job = {
+        "phone": phone,
+        "question": question,
+        "data": dict(data),
+        "lang": data.get("lang", "EN"),
+        "footer": footer
+    }
+
+    def enqueue():
+        rejected = get_ai_executor().submit(job)
+
+        if rejected:
+            # Raced past accepts(); refund and apologise off-thread
+            logger.warning(f"⚠️ AI question for {phone} rejected at enqueue ({rejected})")
+
+            from backend.engines.db_engine import grant_qna_pack
+            from backend.engines.kundali_job_engine import push_message
+            from backend.utils.text_content import ERROR_MESSAGES
+
+            grant_qna_pack(phone, 1)
+            push_message(phone, ERROR_MESSAGES["AI_BUSY"].get(job["lang"], ERROR_MESSAGES["AI_BUSY"]["EN"]))
+
+    uow = current_unit_of_work()
+
+    if uow is not None:
+        uow.on_commit(enqueue)
+    else:
+        enqueue()
@@ -0,0 +1,568 @@
+"""
+Answer Cache Engine
+Reuses AI answers across rephrasings of the same question about the same chart
+
+Answers are grouped by scope:
+    (chart fingerprint, astro system, language, classify_question type,
+     signs of the slow transiting planets)
+
+Within a scope, a MinHash signature of each question's normalized tokens
+screens the stored questions; a candidate is only served if the exact
+sets agree: the same concepts, no word on either side without a
+counterpart on the other ("mom", "not"), and an exact Jaccard similarity
+of at least ANSWER_CACHE_SIMILARITY. So "when will I marry?" and
+"marriage timing?" share an answer, while "when will my mom get a job?"
+does not get the answer to "when will I get a job?".
+
+Normalization is multilingual: words are lower-cased, stop words (English,
+Hinglish and the Indic languages the bot speaks) dropped and known
+concepts (marriage, career, timing, ...) mapped to one canonical token in
+every language. Remaining words contribute character trigrams, which
+absorb spelling variants.
+
+Run `python -m backend.engines.answer_cache_engine` to check the matcher
+against data/answer_cache_fixtures.tsv.
+
+Entries expire at the next dasha / antardasha boundary or month rollover
+(the prompt lists month-by-month predictions), whichever comes first.
+A slow planet changing sign changes the scope, so answers written under
+the old transit are simply no longer found.
+
+Scopes are stored in the two-tier cache under ai_answers_<hash>.
+"""
+
+import os
+import re
+import sys
+import zlib
+import time
+import random
+import hashlib
+import logging
+import threading
+from datetime import datetime
+
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+FIXTURES_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "data", "answer_cache_fixtures.tsv"
+)
+
+
+# =========================
+# NORMALIZATION
+# =========================
+
+# Latin words plus the Devanagari, Bengali, Tamil and Telugu blocks
+# (vowel signs are not \w, so the blocks are listed explicitly)
+TOKEN_RE = re.compile(r"[a-z0-9ऀ-෿]+")
+
+STOP_WORDS = frozenset("""
+i me my mine am is are was be been will would shall should can could do does did
+the a an of in on at to for from by with about and or any some this that it its
+what which how please tell know get got have has there here
+happen happens exactly really kindly
+kya hai hain ho hoga hogi honge mera meri mere mujhe main ka ki ke ko se me mein
+bataye batao bataiye
+मेरा मेरी मेरे मुझे मैं क्या है हैं का की के को से में होगा होगी होंगे
+माझा माझी माझे मला मी काय आहे
+என் எனக்கு நான் என்ன
+నా నాకు నేను ఏమి
+আমার আমি কি
+""".split())
+
+# Canonical concept -> word stems (matched as prefixes) in every language
+CONCEPTS = {
+    "@when": ["when", "timing", "time", "date", "kab", "कब", "केव्हा", "कधी",
+              "எப்போது", "ఎప్పుడు", "কবে"],
+    "@marriage": ["marr", "wedd", "shaad", "shadi", "vivah", "शादी", "विवाह",
+                  "लग्न", "திருமண", "పెళ్ల", "వివాహ", "বিয়ে", "বিবাহ"],
+    "@love": ["love", "relationship", "partner", "pyar", "प्यार", "प्रेम",
+              "காதல", "ప్రేమ", "প্রেম"],
+    "@career": ["career", "job", "work", "naukri", "nokri", "नौकरी", "करियर",
+                "வேலை", "ఉద్యోగ", "চাকরি"],
+    "@business": ["business", "vyapar", "व्यापार", "व्यवसाय", "धंदा", "வியாபார",
+                  "వ్యాపార", "ব্যবসা"],
+    "@money": ["money", "financ", "income", "wealth", "salary", "paisa", "paise",
+               "dhan", "पैसा", "पैसे", "धन", "பணம", "డబ్బు", "টাকা"],
+    "@health": ["health", "sehat", "स्वास्थ्य", "सेहत", "आरोग्य", "ஆரோக்கிய",
+                "ఆరోగ్య", "স্বাস্থ্য"],
+    "@child": ["child", "baby", "kids", "santan", "bachch", "संतान", "बच्च",
+               "குழந்த", "పిల్ల", "সন্তান"],
+    "@abroad": ["abroad", "foreign", "videsh", "विदेश", "परदेश", "வெளிநாட",
+                "విదేశ", "বিদেশ"],
+    "@house": ["house", "home", "property", "ghar", "घर", "மனை", "ఇల్లు", "বাড়ি"],
+}
+
+# Longest stems first so "marr" never shadows a longer, more specific stem
+_STEMS = sorted(
+    ((stem, concept) for concept, stems in CONCEPTS.items() for stem in stems),
+    key=lambda item: -len(item[0])
+)
+
+
+def _canonical(token):
+    for stem, concept in _STEMS:
+        if token.startswith(stem):
+            return concept
+
+    return None
+
+
+def question_terms(question):
+    """
+    Concepts and remaining words of a question (stop words dropped)
+
+    Returns:
+        tuple: (set of concept tokens, set of other words)
+    """
+
+    concepts, words = set(), set()
+
+    for token in TOKEN_RE.findall(question.lower()):
+        if token in STOP_WORDS:
+            continue
+
+        concept = _canonical(token)
+
+        if concept:
+            concepts.add(concept)
+        else:
+            words.add(token)
+
+    return concepts, words
+
+
+def question_shingles(question, terms=None):
+    """
+    Normalized features of a question
+
+    Returns:
+        set: Concept tokens plus word and trigram shingles of other words
+    """
+
+    concepts, words = terms or question_terms(question)
+    shingles = set(concepts)
+
+    for word in words:
+        shingles.add(word)
+
+        if len(word) > 3:
+            shingles.update(word[i:i + 3] for i in range(len(word) - 2))
+
+    return shingles
+
+
+# =========================
+# MINHASH
+# =========================
+
+MINHASH_PERMUTATIONS = 64
+
+_PRIME = (1 << 61) - 1
+
+# Fixed seed: signatures must agree across processes and restarts
+_rng = random.Random(1729)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME))
+    for _ in range(MINHASH_PERMUTATIONS)
+]
+
+
+def minhash(shingles):
+    """MinHash signature (list of ints) of a shingle set"""
+
+    hashes = [zlib.crc32(s.encode()) for s in shingles] or [0]
+
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures"""
+
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / MINHASH_PERMUTATIONS
+
+
+# =========================
+# EXACT MATCH
+# =========================
+
+# The estimate with 64 permutations is off by up to ~0.18 (3 sigma), so it
+# only screens; stored questions within this margin are checked exactly
+MINHASH_MARGIN = 0.2
+
+
+def _one_edit(a, b):
+    """True if b is a one-letter typo of a (insert, delete or replace)"""
+
+    if abs(len(a) - len(b)) > 1:
+        return False
+
+    if len(a) > len(b):
+        a, b = b, a
+
+    i = 0
+
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+
+    return a[i + (len(a) == len(b)):] == b[i + 1:]
+
+
+def _has_counterpart(word, others):
+    # Typos only count on longer words: "mom" is not "dad", nor "son" "sun"
+    return word in others or (len(word) >= 5 and any(_one_edit(word, o) for o in others))
+
+
+def match_score(terms_a, shingles_a, terms_b, shingles_b):
+    """
+    Exact similarity of two questions, 0.0 unless they ask the same thing
+
+    The concept sets must be equal and every word needs a counterpart on
+    the other side, so a relative ("my mom") or a negation ("not") the
+    other question lacks rules the pair out whatever the overlap.
+
+    Returns:
+        float: Jaccard similarity of the shingle sets, or 0.0
+    """
+
+    (concepts_a, words_a), (concepts_b, words_b) = terms_a, terms_b
+
+    if concepts_a != concepts_b:
+        return 0.0
+
+    if not all(_has_counterpart(w, words_b) for w in words_a):
+        return 0.0
+
+    if not all(_has_counterpart(w, words_a) for w in words_b):
+        return 0.0
+
+    union = shingles_a | shingles_b
+
+    return len(shingles_a & shingles_b) / len(union) if union else 1.0
+
+
+def question_similarity(question_a, question_b):
+    """Exact match score of two questions (see match_score)"""
+
+    terms_a, terms_b = question_terms(question_a), question_terms(question_b)
+
+    return match_score(
+        terms_a, question_shingles(question_a, terms_a),
+        terms_b, question_shingles(question_b, terms_b)
+    )
+
+
+# =========================
+# SCOPE + EXPIRY
+# =========================
+
+# Transits that stay in a sign for months; faster planets would make the
+# scope change every few days
+SLOW_PLANETS = ("Jupiter", "Saturn", "Rahu", "Ketu")
+
+
+def _chart_fingerprint(data):
+    return data.get("kundali_ref") or (data.get("kundali") or {}).get("chart_key")
+
+
+def _transit_signature():
+    from backend.engines.transit_engine import get_daily_transits
+
+    try:
+        transits = get_daily_transits() or ()
+    except Exception:
+        return ""
+
+    signs = {t.get("name"): t.get("sign") for t in transits}
+
+    return ",".join(f"{p}:{signs.get(p)}" for p in SLOW_PLANETS)
+
+
+def _scope_key(question, data):
+    """Cache key of the question's scope, None if the session has no chart"""
+
+    from backend.engines.ai_engine import classify_question
+
+    chart = _chart_fingerprint(data)
+
+    if not chart:
+        return None
+
+    parts = [
+        chart,
+        data.get("astro_system", "LAHIRI"),
+        data.get("lang", "EN"),
+        classify_question(question),
+        _transit_signature()
+    ]
+
+    return "ai_answers_" + hashlib.md5("|".join(parts).encode()).hexdigest()
+
+
+def _parse_date(value):
+    try:
+        return datetime.fromisoformat(str(value)[:10])
+    except (TypeError, ValueError):
+        return None
+
+
+def answer_expiry(chart, now=None):
+    """
+    When an answer about `chart` goes out of date
+
+    The next dasha / antardasha change, the next month rollover, or
+    ANSWER_CACHE_MAX_TTL_SECONDS from now, whichever is first.
+
+    Returns:
+        float: Expiry as a Unix timestamp
+    """
+
+    now = now or datetime.now()
+
+    next_month = datetime(now.year + now.month // 12, now.month % 12 + 1, 1)
+    boundaries = [next_month]
+
+    dasha = (chart or {}).get("dasha_timeline") or {}
+
+    candidates = [(dasha.get("current") or {}).get("end")]
+    candidates += [d.get("start") for d in dasha.get("upcoming", [])]
+
+    for value in candidates:
+        boundary = _parse_date(value)
+
+        if boundary and boundary > now:
+            boundaries.append(boundary)
+
+    expiry = min(boundaries).timestamp()
+
+    return min(expiry, now.timestamp() + Config.ANSWER_CACHE_MAX_TTL_SECONDS)
+
+
+# =========================
+# METRICS
+# =========================
+
+_stats = {
+    "lookups": 0,
+    "hits": 0,
+    "near_hits": 0,
+    "misses": 0,
+    "stores": 0,
+    "tokens_saved": 0
+}
+_stats_lock = threading.Lock()
+
+
+def _count(field, amount=1):
+    with _stats_lock:
+        _stats[field] += amount
+
+
+def get_answer_cache_stats():
+    """Hit rate and OpenAI tokens saved by this process, for health checks"""
+
+    with _stats_lock:
+        stats = dict(_stats)
+
+    stats["hit_rate"] = round(stats["hits"] / stats["lookups"], 3) if stats["lookups"] else 0.0
+
+    return stats
+
+
+# =========================
+# PUBLIC API
+# =========================
+
+# Serializes read-modify-write of a scope within this process; a write
+# racing another process may drop one entry, which only costs a miss
+_write_lock = threading.Lock()
+
+
+def get_cached_answer(question, data):
+    """
+    Answer to the same (or a rephrased) question about the same chart
+
+    Args:
+        question: User's question
+        data: Session data (chart reference, language, astro system)
+
+    Returns:
+        str: Cached answer or None
+    """
+
+    if not Config.ANSWER_CACHE_ENABLED:
+        return None
+
+    from backend.engines.db_engine import cache_get
+
+    scope = _scope_key(question, data)
+
+    if scope is None:
+        return None
+
+    _count("lookups")
+
+    terms = question_terms(question)
+    shingles = question_shingles(question, terms)
+    signature = minhash(shingles)
+    now = time.time()
+
+    best, best_score = None, 0.0
+
+    for entry in cache_get(scope) or []:
+        # Entries without their sets predate exact matching
+        if entry["expires_at"] <= now or "shingles" not in entry:
+            continue
+
+        if similarity(signature, entry["sig"]) < Config.ANSWER_CACHE_SIMILARITY - MINHASH_MARGIN:
+            continue
+
+        entry_terms = (set(entry["concepts"]), set(entry["words"]))
+        score = match_score(terms, shingles, entry_terms, set(entry["shingles"]))
+
+        if score > best_score:
+            best, best_score = entry, score
+
+    if best is None or best_score < Config.ANSWER_CACHE_SIMILARITY:
+        _count("misses")
+        return None
+
+    _count("hits")
+    _count("tokens_saved", best.get("tokens") or 0)
+
+    if best_score < 1.0:
+        _count("near_hits")
+        logger.info(f"🧠 Answer cache near hit ({best_score:.2f}): '{question}' ~ '{best.get('question')}'")
+
+    return best["answer"]
+
+
+def save_answer(question, data, answer, tokens=None):
+    """
+    Remember an answer for its scope
+
+    Args:
+        question: Question that was answered
+        data: Session data
+        answer: Final answer text (as sent to the user)
+        tokens: OpenAI tokens the answer cost (saved-token metric)
+    """
+
+    if not Config.ANSWER_CACHE_ENABLED or not answer:
+        return
+
+    from backend.engines.chart_engine import resolve_chart
+    from backend.engines.db_engine import cache_get, cache_set
+
+    scope = _scope_key(question, data)
+
+    if scope is None:
+        return
+
+    expires_at = answer_expiry(resolve_chart(data))
+    now = time.time()
+
+    if expires_at <= now:
+        return
+
+    concepts, words = terms = question_terms(question)
+    shingles = question_shingles(question, terms)
+
+    entry = {
+        "question": question[:200],
+        "sig": minhash(shingles),
+        "concepts": sorted(concepts),
+        "words": sorted(words),
+        "shingles": sorted(shingles),
+        "answer": answer,
+        "tokens": tokens,
+        "expires_at": expires_at
+    }
+
+    with _write_lock:
+        entries = [e for e in (cache_get(scope) or []) if e["expires_at"] > now]
+        entries.append(entry)
+
+        # Oldest out first
+        entries = entries[-Config.ANSWER_CACHE_MAX_PER_SCOPE:]
+
+        ttl = int(max(e["expires_at"] for e in entries) - now) + 1
+        cache_set(scope, entries, ttl_seconds=ttl)
+
+    _count("stores")
+
+
+def estimate_tokens(messages, answer):
+    """Token count of a call when OpenAI did not report usage"""
+
+    from backend.engines.prompt_engine import count_tokens
+
+    return sum(count_tokens(m.get("content") or "") for m in messages) + count_tokens(answer)
+
+
+# =========================
+# FIXTURES
+# =========================
+
+def load_fixtures(path=FIXTURES_PATH):
+    """
+    Labelled question pairs
+
+    Returns:
+        list: (expected "same" / "different", question, cached question)
+    """
+
+    fixtures = []
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+
+            if not line or line.startswith("#"):
+                continue
+
+            expected, question, cached = line.split("\t", 2)
+            fixtures.append((expected, question, cached))
+
+    return fixtures
+
+
+def evaluate(fixtures=None):
+    """
+    Check the matcher against the fixture pairs
+
+    Returns:
+        dict: expected -> {"total", "correct", "failures"}
+    """
+
+    fixtures = load_fixtures() if fixtures is None else fixtures
+
+    report = {}
+
+    for expected, question, cached in fixtures:
+        score = question_similarity(question, cached)
+        got = "same" if score >= Config.ANSWER_CACHE_SIMILARITY else "different"
+
+        entry = report.setdefault(expected, {"total": 0, "correct": 0, "failures": []})
+        entry["total"] += 1
+
+        if got == expected:
+            entry["correct"] += 1
+        else:
+            entry["failures"].append((question, cached, score))
+
+    return report
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else FIXTURES_PATH
+
+    for expected, entry in evaluate(load_fixtures(path)).items():
+        print(f"{expected:9} {entry['correct']}/{entry['total']}")
+
+        for question, cached, score in entry["failures"]:
+            print(f"    ✗ {question!r} ~ {cached!r}: {score:.2f}")
@@ -1,15 +1,19 @@
 import logging
 import hashlib
 import json
+from datetime import datetime
 
-from backend.services.geocode import geocode_city
-from backend.services.prokerala import get_kundali_data as get_prokerala_data
+from backend.config import Config
+from backend.engines.place_engine import resolve_place
+from backend.services.prokerala import combine_datetime, get_kundali_data
 from backend.engines.db_engine import (
     get_kundali_cache,
-    save_kundali_cache,
     log_api_usage,
     use_api_credit
 )
+from backend.engines.chart_engine import get_chart, save_chart
+from backend.utils.singleflight import get_flight, SingleFlightTimeout
+from backend.utils.resilience import upstream_available, UpstreamUnavailable
 
 logger = logging.getLogger(__name__)
 
@@ -61,10 +65,39 @@ ASPECTS = {
 # CACHE KEY
 # =========================
 
-def _build_hash(place, dob, time_str):
+def _build_hash(place, dob, time_str, system="LAHIRI", source="prokerala"):
+    # The local ephemeris computes a different chart per astro system, so
+    # the system and the chart source are part of the fingerprint
+    return hashlib.md5(f"{place}|{dob}|{time_str}|{source}|{system}".encode()).hexdigest()
+
+
+def _legacy_hash(place, dob, time_str):
+    # Fingerprint before the system / source were part of it
     return hashlib.md5(f"{place}|{dob}|{time_str}".encode()).hexdigest()
 
 
+def _chart_source():
+    """Source a fresh chart comes from (the fallback aside)"""
+
+    return "local" if Config.EPHEMERIS_MODE == "local" else "prokerala"
+
+
+def _chart_key(data, source=None):
+    return _build_hash(
+        data.get("place"),
+        data.get("dob"),
+        data.get("time"),
+        data.get("astro_system", "LAHIRI"),
+        source or _chart_source()
+    )
+
+
+def peek_kundali(data):
+    """Chart for these birth details if already computed (never fetches)"""
+
+    return get_chart(_chart_key(data))
+
+
 # =========================
 # NORMALIZE PLANETS
 # =========================
@@ -204,24 +237,80 @@ def calculate_aspects(planets):
 # =========================
 
 def get_kundali_cached(data):
+    """
+    Chart for a person's birth details, computed on a cache miss
 
-    place = data.get("place")
-    dob = data.get("dob")
-    time_str = data.get("time")
+    Returns:
+        dict: Chart, or None if the place / date could not be resolved
+
+    Raises:
+        UpstreamUnavailable: Prokerala busy and no local chart either
+    """
 
     # ---------- CACHE ----------
 
-    cache_key = _build_hash(place, dob, time_str)
+    cache_key = _chart_key(data)
 
-    cached = get_kundali_cache(cache_key)
+    cached = get_chart(cache_key)
 
     if cached:
         logger.info("⚡ Kundali cache hit")
         return cached
 
+    cached = _legacy_chart(data)
+
+    if cached:
+        cached = dict(cached, chart_key=cache_key)
+        save_chart(cache_key, cached)
+
+        logger.info("⚡ Kundali cache hit (moved to current chart key)")
+        return cached
+
+    # Duplicate deliveries / Milan retries for the same chart share one
+    # Prokerala call
+    try:
+        return get_flight("kundali").do(
+            cache_key,
+            lambda: _compute_kundali(cache_key, data),
+            peek=lambda: get_chart(cache_key)
+        )
+    except SingleFlightTimeout:
+        logger.warning(f"⏳ Gave up waiting for kundali {cache_key}")
+        return None
+
+
+def _legacy_chart(data):
+    """
+    Chart stored under the old fingerprint (place, dob, time only)
+
+    Only Prokerala charts for Lahiri users are reused: an old entry may
+    also be a local chart computed for another system, which would be
+    served to everyone with the same birth details.
+    """
+
+    if data.get("astro_system", "LAHIRI") != "LAHIRI" or _chart_source() != "prokerala":
+        return None
+
+    legacy_key = _legacy_hash(data.get("place"), data.get("dob"), data.get("time"))
+
+    # Chart store, then charts cached before the chart store existed
+    cached = get_chart(legacy_key) or get_kundali_cache(legacy_key)
+
+    if not cached or cached.get("source", "prokerala") != "prokerala":
+        return None
+
+    return cached
+
+
+def _compute_kundali(cache_key, data):
+
+    place = data.get("place")
+    dob = data.get("dob")
+    time_str = data.get("time")
+
     # ---------- GEOCODE ----------
 
-    geo = geocode_city(place)
+    geo = resolve_place(place, dob, time_str)
 
     if not geo:
         logger.warning(f"❌ Geocoding failed: {place}")
@@ -230,61 +319,76 @@ def get_kundali_cached(data):
     lat = geo["lat"]
     lon = geo["lon"]
 
-    logger.info(f"📍 {place} -> {lat},{lon}")
+    logger.info(f"📍 {place} -> {lat},{lon} ({geo['timezone']} {geo['utc_offset']}, {geo['source']})")
 
-    # ---------- PROKERALA ----------
+    datetime_str = combine_datetime(dob, time_str, geo["utc_offset"])
 
-    try:
-        astro = get_prokerala_data(
-            dob=dob,
-            time_str=time_str,
-            latitude=lat,
-            longitude=lon
-        )
-    except Exception:
-        logger.exception("❌ Prokerala failed")
+    if not datetime_str:
         return None
 
-    if not astro:
-        return None
+    system = data.get("astro_system", "LAHIRI")
 
-    raw_chart = astro.get("raw", astro)
+    # ---------- CHART ----------
 
-    # 👀 Debug (remove in production)
-    print("\n========== RAW PROKERALA JSON ==========\n")
-    print(json.dumps(raw_chart, indent=2))
-    print("\n=======================================\n")
+    if Config.EPHEMERIS_MODE == "local":
+        chart = _local_chart(datetime_str, lat, lon, system)
+        source = "local"
+    else:
+        rejected = None
 
-    # ---------- NORMALIZATION ----------
+        try:
+            chart = _prokerala_chart(datetime_str, lat, lon)
+        except UpstreamUnavailable as e:
+            chart, rejected = None, e
 
-    planets = _normalize_planets(raw_chart)
-    dasha_timeline = _normalize_dasha(raw_chart)
-    advanced = _extract_advanced(raw_chart)
+        source = "prokerala"
+
+        if chart and Config.EPHEMERIS_MODE == "verify":
+            _verify_chart(chart, datetime_str, lat, lon, system)
+
+        # Prokerala down or busy: degrade to the local ephemeris
+        if not chart and (rejected or not upstream_available("prokerala")):
+            logger.warning("🔌 Prokerala unavailable, using local ephemeris")
+            chart = _local_chart(datetime_str, lat, lon, system)
+            source = "local"
+
+        # Busy, not a bad birthplace: let the caller say so
+        if not chart and rejected:
+            raise rejected
 
-    house_lords = calculate_house_lords(planets)
-    aspects = calculate_aspects(planets)
+    if not chart:
+        return None
+
+    # A fallback chart is stored under its own source's key
+    cache_key = _chart_key(data, source)
+
+    house_lords = calculate_house_lords(chart["planets"])
+    aspects = calculate_aspects(chart["planets"])
 
     # ---------- FINAL DATA ----------
 
     kundali_data = {
 
+        # Fingerprint sessions use to refer to this chart
+        "chart_key": cache_key,
+
         # CORE
-        "lagna": astro.get("lagna"),
-        "moon_sign": astro.get("moon_sign"),
-        "sun_sign": astro.get("sun_sign"),
-        "current_dasha": astro.get("current_dasha"),
+        "lagna": chart["lagna"],
+        "moon_sign": chart["moon_sign"],
+        "sun_sign": chart["sun_sign"],
+        "current_dasha": chart["current_dasha"],
 
         # PROFESSIONAL
-        "planets": planets,
-        "dasha_timeline": dasha_timeline,
+        "planets": chart["planets"],
+        "dasha_timeline": chart["dasha_timeline"],
 
         # ADVANCED VEDIC
-        "nakshatra": advanced["nakshatra"],
-        "pada": advanced["pada"],
-        "moon_rasi": advanced["moon_rasi"],
-        "sun_rasi": advanced["sun_rasi"],
-        "yogas": advanced["yogas"],
-        "manglik": advanced["manglik"],
+        "nakshatra": chart["nakshatra"],
+        "pada": chart["pada"],
+        "moon_rasi": chart["moon_rasi"],
+        "sun_rasi": chart["sun_rasi"],
+        "yogas": chart["yogas"],
+        "manglik": chart["manglik"],
 
         # 🔥 REAL ASTRO INTELLIGENCE
         "house_lords": house_lords,
@@ -293,19 +397,93 @@ def get_kundali_cached(data):
         "coordinates": {
             "lat": lat,
             "lon": lon,
-            "place": place
-        }
+            "place": place,
+            "timezone": geo["timezone"],
+            "utc_offset": geo["utc_offset"]
+        },
+
+        "source": source
     }
 
     # ---------- CACHE ----------
 
-    save_kundali_cache(cache_key, kundali_data)
+    save_chart(cache_key, kundali_data)
 
     logger.info("💾 Kundali cached (full professional logic)")
 
     # ---------- COST ----------
 
-    log_api_usage("PROKERALA", PROKERALA_COST_PER_CALL)
-    use_api_credit("PROKERALA", 1)
+    if source == "prokerala":
+        log_api_usage(data.get("phone", "SYSTEM"), "PROKERALA", PROKERALA_COST_PER_CALL)
+        use_api_credit("PROKERALA", 1)
 
     return kundali_data
+
+
+# =========================
+# CHART SOURCES
+# =========================
+
+def _prokerala_chart(datetime_str, lat, lon):
+
+    try:
+        astro = get_kundali_data(datetime_str, lat, lon)
+    except UpstreamUnavailable:
+        raise
+    except Exception:
+        logger.exception("❌ Prokerala failed")
+        return None
+
+    if not astro:
+        return None
+
+    raw_chart = astro.get("raw", astro)
+
+    # 👀 Debug (remove in production)
+    print("\n========== RAW PROKERALA JSON ==========\n")
+    print(json.dumps(raw_chart, indent=2))
+    print("\n=======================================\n")
+
+    # ---------- NORMALIZATION ----------
+
+    advanced = _extract_advanced(raw_chart)
+
+    return {
+        "lagna": astro.get("lagna"),
+        "moon_sign": astro.get("moon_sign"),
+        "sun_sign": astro.get("sun_sign"),
+        "current_dasha": astro.get("current_dasha"),
+        "planets": _normalize_planets(raw_chart),
+        "dasha_timeline": _normalize_dasha(raw_chart),
+        **advanced
+    }
+
+
+def _local_chart(datetime_str, lat, lon, system):
+    """Chart from the local ephemeris (no network, no API cost)"""
+
+    from backend.engines.ephemeris_engine import compute_chart
+
+    try:
+        return compute_chart(datetime.fromisoformat(datetime_str), lat, lon, system)
+    except Exception:
+        logger.exception("❌ Local ephemeris failed")
+        return None
+
+
+def _verify_chart(chart, datetime_str, lat, lon, system):
+    """Log where Prokerala and the local ephemeris disagree"""
+
+    from backend.engines.ephemeris_engine import compare_charts
+
+    local = _local_chart(datetime_str, lat, lon, system)
+
+    if local is None:
+        return
+
+    mismatches = compare_charts(local, chart)
+
+    if mismatches:
+        logger.warning(f"⚠️ Ephemeris mismatch for {datetime_str} @ {lat},{lon}: {'; '.join(mismatches)}")
+    else:
+        logger.info("✅ Local ephemeris agrees with Prokerala")
@@ -1,17 +1,495 @@
-import hashlib,json
-from db_engine import get_conn
+"""
+Two-tier Cache Engine
+Sits behind db_engine.cache_get / cache_set
 
-def get_hash(phone,d):
-    s=f"{phone}{d['dob']}{d['time']}{d['place']}"
+L1: bounded in-process LRU with per-namespace TTLs
+L2: shared store - Redis (REDIS_CACHE_DB) when reachable, otherwise the
+    SQLite `cache` table
+
+Features:
+- Namespaces derived from the key prefix (kundali_, place_, ai_, DAILY_TRANSIT)
+- Negative caching of misses, so repeated misses skip the L2 round-trip
+- Stale-while-revalidate for get_or_load()
+- Per-namespace hit / miss / eviction stats
+
+Values handed out from L1 are shared between callers - treat them as
+read-only.
+"""
+
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+# =========================
+# NAMESPACES
+# =========================
+
+# Checked in order - the transit key is stored under kundali_DAILY_TRANSIT_<date>
+NAMESPACE_PREFIXES = [
+    ("kundali_DAILY_TRANSIT", "DAILY_TRANSIT"),
+    ("DAILY_TRANSIT", "DAILY_TRANSIT"),
+    ("kundali_", "kundali"),
+    ("place_", "place"),
+    ("ai_", "ai"),
+]
+
+# How long an entry may live in L1 before it is re-read from L2
+L1_TTLS = {
+    "kundali": 3600,
+    "place": 86400,
+    "ai": 600,
+    "DAILY_TRANSIT": 3600,
+    "default": 300
+}
+
+# How long a stale L1 entry may still be served while a refresh runs
+STALE_TTLS = {
+    "kundali": 3600,
+    "place": 86400,
+    "ai": 0,
+    "DAILY_TRANSIT": 1800,
+    "default": 0
+}
+
+NEGATIVE_TTL_SECONDS = 30
+
+_MISSING = object()
+
+
+def namespace_of(key):
+    """Map a cache key to its namespace"""
+
+    for prefix, namespace in NAMESPACE_PREFIXES:
+        if key.startswith(prefix):
+            return namespace
+
+    return "default"
+
+
+# =========================
+# L2 BACKENDS
+# =========================
+
+class SQLiteCacheStore:
+    """L2 backed by the `cache` table in bot.db"""
+
+    name = "sqlite"
+
+    def get(self, key):
+        from backend.engines.db_engine import _cache_table_get
+
+        return _cache_table_get(key)
+
+    def set(self, key, value_json, ttl_seconds):
+        from backend.engines.db_engine import _cache_table_set
+
+        _cache_table_set(key, value_json, ttl_seconds)
+
+    def delete(self, key):
+        from backend.engines.db_engine import _cache_table_delete
+
+        _cache_table_delete(key)
+
+
+class RedisCacheStore:
+    """L2 backed by Redis (REDIS_CACHE_DB), keys expire natively"""
+
+    name = "redis"
+    prefix = "cache:"
+
+    def __init__(self, client):
+        self.client = client
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+
+        if value is None:
+            return None
+
+        ttl = self.client.ttl(self.prefix + key)
+
+        return value, max(ttl, 0)
+
+    def set(self, key, value_json, ttl_seconds):
+        self.client.setex(self.prefix + key, max(int(ttl_seconds), 1), value_json)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+
+# =========================
+# TWO-TIER CACHE
+# =========================
+
+class TwoTierCache:
+    """
+    L1 LRU in front of a shared L2 store
+
+    L1 entries: key -> (value, fresh_until, stale_until), monotonic time.
+    A value of _MISSING marks a negative (known-miss) entry.
+    """
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+
+        self._l1 = OrderedDict()
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._stats = {}
+
+    # ---------- L2 SELECTION ----------
+
+    def _l2(self):
+        backend = Config.CACHE_BACKEND
+
+        if backend in ("auto", "redis"):
+            from backend.utils.redis_client import get_redis
+
+            client = get_redis(Config.REDIS_CACHE_DB)
+
+            if client is not None:
+                return RedisCacheStore(client)
+
+        return SQLiteCacheStore()
+
+    def _l2_call(self, method, *args):
+        store = self._l2()
+
+        try:
+            return getattr(store, method)(*args)
+
+        except Exception as e:
+            if store.name != "redis":
+                raise
+
+            # Redis went away mid-request: degrade to SQLite
+            from backend.utils.redis_client import mark_redis_down
+
+            logger.warning(f"⚠️ Redis cache {method} failed, using SQLite: {e}")
+            mark_redis_down(Config.REDIS_CACHE_DB)
+
+            return getattr(SQLiteCacheStore(), method)(*args)
+
+    # ---------- STATS ----------
+
+    def _count(self, namespace, field, amount=1):
+        # Called with self._lock held
+        ns = self._stats.setdefault(namespace, {
+            "hits_l1": 0,
+            "hits_l2": 0,
+            "misses": 0,
+            "negative_hits": 0,
+            "stale_served": 0,
+            "sets": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "refreshes": 0
+        })
+        ns[field] += amount
+
+    def stats(self):
+        """
+        Per-namespace cache statistics
+
+        Returns:
+            dict: {"backend", "l1_entries", "namespaces": {ns: counters + hit_rate}}
+        """
+
+        with self._lock:
+            namespaces = {ns: dict(c) for ns, c in self._stats.items()}
+            l1_entries = len(self._l1)
+
+        for counters in namespaces.values():
+            hits = counters["hits_l1"] + counters["hits_l2"] + counters["negative_hits"]
+            lookups = hits + counters["misses"]
+            counters["hit_rate"] = round(hits / lookups * 100, 2) if lookups else 0.0
+
+        return {
+            "backend": self._l2().name,
+            "l1_entries": l1_entries,
+            "l1_max_entries": self.max_entries,
+            "namespaces": namespaces
+        }
+
+    # ---------- L1 ----------
+
+    def _l1_lookup(self, key, namespace, allow_stale=False):
+        """Return (value, is_stale, found) - called with self._lock held"""
+
+        entry = self._l1.get(key)
+
+        if entry is None:
+            return _MISSING, False, False
+
+        value, fresh_until, stale_until = entry
+        now = time.monotonic()
+
+        if now < fresh_until:
+            self._l1.move_to_end(key)
+            return value, False, True
+
+        if allow_stale and now < stale_until and value is not _MISSING:
+            self._l1.move_to_end(key)
+            return value, True, True
+
+        if now >= stale_until:
+            del self._l1[key]
+            self._count(namespace, "expirations")
+
+        return _MISSING, False, False
+
+    def _l1_store(self, key, namespace, value, ttl_seconds, stale_seconds=None):
+        # Called with self._lock held
+        if stale_seconds is None:
+            stale_seconds = STALE_TTLS.get(namespace, 0)
+
+        now = time.monotonic()
+        fresh_until = now + ttl_seconds
+
+        self._l1[key] = (value, fresh_until, fresh_until + stale_seconds)
+        self._l1.move_to_end(key)
+
+        while len(self._l1) > self.max_entries:
+            evicted_key, _ = self._l1.popitem(last=False)
+            self._count(namespace_of(evicted_key), "evictions")
+
+    # ---------- PUBLIC API ----------
+
+    def get(self, key):
+        """
+        Get a cached value
+
+        Returns:
+            Cached value or None if not found / expired
+        """
+
+        namespace = namespace_of(key)
+
+        with self._lock:
+            value, _, found = self._l1_lookup(key, namespace)
+
+            if found:
+                if value is _MISSING:
+                    self._count(namespace, "negative_hits")
+                    return None
+
+                self._count(namespace, "hits_l1")
+                return value
+
+        row = self._l2_call("get", key)
+
+        with self._lock:
+            if row is None:
+                self._count(namespace, "misses")
+                self._l1_store(key, namespace, _MISSING, NEGATIVE_TTL_SECONDS, 0)
+                return None
+
+            value_json, remaining = row
+            value = json.loads(value_json)
+
+            ttl = min(L1_TTLS.get(namespace, L1_TTLS["default"]), remaining)
+
+            self._count(namespace, "hits_l2")
+            self._l1_store(key, namespace, value, ttl, 0)
+
+            return value
+
+    def peek(self, key):
+        """
+        Get a value without trusting or recording a miss
+
+        For single-flight peeks: a known-miss L1 entry is skipped and an
+        L2 miss is not negatively cached, so a value another process has
+        just written to L2 is seen on the next call.
+
+        Returns:
+            Cached value or None
+        """
+
+        namespace = namespace_of(key)
+
+        with self._lock:
+            value, _, found = self._l1_lookup(key, namespace)
+
+            if found and value is not _MISSING:
+                self._count(namespace, "hits_l1")
+                return value
+
+        row = self._l2_call("get", key)
+
+        if row is None:
+            return None
+
+        value_json, remaining = row
+        value = json.loads(value_json)
+
+        ttl = min(L1_TTLS.get(namespace, L1_TTLS["default"]), remaining)
+
+        with self._lock:
+            self._count(namespace, "hits_l2")
+            self._l1_store(key, namespace, value, ttl, 0)
+
+        return value
+
+    def set(self, key, value, ttl_seconds=3600):
+        """Store a value in both tiers"""
+
+        namespace = namespace_of(key)
+
+        self._l2_call("set", key, json.dumps(value), ttl_seconds)
+
+        with self._lock:
+            self._count(namespace, "sets")
+            self._l1_store(
+                key,
+                namespace,
+                value,
+                min(L1_TTLS.get(namespace, L1_TTLS["default"]), ttl_seconds)
+            )
+
+    def set_negative(self, key, ttl_seconds=NEGATIVE_TTL_SECONDS):
+        """Remember (in L1 only) that a key has no value"""
+
+        with self._lock:
+            self._l1_store(key, namespace_of(key), _MISSING, ttl_seconds, 0)
+
+    def delete(self, key):
+        """Remove a key from both tiers"""
+
+        with self._lock:
+            self._l1.pop(key, None)
+
+        self._l2_call("delete", key)
+
+    def get_or_load(self, key, loader, ttl_seconds=3600, negative_ttl=NEGATIVE_TTL_SECONDS):
+        """
+        Get a value, computing it with loader() on a miss
+
+        A stale L1 entry (within the namespace's stale window) is returned
+        immediately while a single background refresh runs. A loader
+        result of None is negatively cached for negative_ttl seconds.
+        """
+
+        namespace = namespace_of(key)
+
+        with self._lock:
+            value, is_stale, found = self._l1_lookup(key, namespace, allow_stale=True)
+
+            if found:
+                if value is _MISSING:
+                    self._count(namespace, "negative_hits")
+                    return None
+
+                if not is_stale:
+                    self._count(namespace, "hits_l1")
+                    return value
+
+                self._count(namespace, "stale_served")
+                refresh = key not in self._refreshing
+
+                if refresh:
+                    self._refreshing.add(key)
+
+        if found:
+            if refresh:
+                threading.Thread(
+                    target=self._refresh,
+                    args=(key, loader, ttl_seconds),
+                    daemon=True
+                ).start()
+
+            return value
+
+        value = self.get(key)
+
+        if value is not None:
+            return value
+
+        value = loader()
+
+        if value is None:
+            self.set_negative(key, negative_ttl)
+            return None
+
+        self.set(key, value, ttl_seconds)
+
+        return value
+
+    def _refresh(self, key, loader, ttl_seconds):
+        namespace = namespace_of(key)
+
+        try:
+            value = loader()
+
+            if value is not None:
+                self.set(key, value, ttl_seconds)
+
+                with self._lock:
+                    self._count(namespace, "refreshes")
+
+        except Exception:
+            logger.exception(f"❌ Cache refresh failed for {key}")
+
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def purge_expired(self):
+        """Drop expired L1 entries (L2 expiry is handled by the store)"""
+
+        now = time.monotonic()
+
+        with self._lock:
+            expired = [k for k, (_, _, stale_until) in self._l1.items() if now >= stale_until]
+
+            for key in expired:
+                del self._l1[key]
+                self._count(namespace_of(key), "expirations")
+
+        return len(expired)
+
+
+# =========================
+# SINGLETON
+# =========================
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> TwoTierCache:
+    """Get the process-wide two-tier cache"""
+
+    global _cache
+
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = TwoTierCache(max_entries=Config.CACHE_L1_MAX_ENTRIES)
+
+    return _cache
+
+
+# =========================
+# LEGACY KUNDALI HELPERS
+# =========================
+
+def get_hash(phone, d):
+    s = f"{phone}{d['dob']}{d['time']}{d['place']}"
     return hashlib.md5(s.encode()).hexdigest()
 
+
 def get_cached(h):
-    conn=get_conn();cur=conn.cursor()
-    cur.execute("SELECT payload FROM kundali_cache WHERE hash=%s",(h,))
-    r=cur.fetchone();conn.close()
-    return r[0] if r else None
-
-def save_cache(h,payload):
-    conn=get_conn();cur=conn.cursor()
-    cur.execute("INSERT INTO kundali_cache VALUES(%s,%s)",(h,json.dumps(payload)))
-    conn.commit();conn.close()
+    return get_cache().get(f"kundali_{h}")
+
+
+def save_cache(h, payload):
+    get_cache().set(f"kundali_{h}", payload, 86400)
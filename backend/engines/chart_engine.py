@@ -0,0 +1,177 @@
+"""
+Chart Store
+Keeps computed kundali charts out of FSM sessions
+
+Sessions only hold a chart fingerprint (the astro_engine _chart_key,
+stored as data["kundali_ref"] / "boy_kundali_ref" / "girl_kundali_ref").
+Charts themselves live in the durable `charts` table and are resolved
+lazily through a bounded in-process LRU.
+
+Charts handed out by the store are shared between callers - treat them
+as read-only.
+"""
+
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+# =========================
+# IN-PROCESS LRU
+# =========================
+
+_charts = OrderedDict()
+_charts_lock = threading.Lock()
+
+_stats = {
+    "hits": 0,
+    "loads": 0,
+    "misses": 0,
+    "saves": 0,
+    "evictions": 0
+}
+
+
+def _remember(chart_key, chart):
+    # Called with _charts_lock held
+    _charts[chart_key] = chart
+    _charts.move_to_end(chart_key)
+
+    while len(_charts) > Config.CHART_CACHE_MAX_ENTRIES:
+        _charts.popitem(last=False)
+        _stats["evictions"] += 1
+
+
+# =========================
+# STORE
+# =========================
+
+def get_chart(chart_key):
+    """
+    Get a chart by fingerprint
+
+    Args:
+        chart_key: Chart fingerprint (astro_engine._chart_key)
+
+    Returns:
+        dict: Chart data or None if unknown
+    """
+
+    if not chart_key:
+        return None
+
+    with _charts_lock:
+        chart = _charts.get(chart_key)
+
+        if chart is not None:
+            _charts.move_to_end(chart_key)
+            _stats["hits"] += 1
+            return chart
+
+    from backend.engines.db_engine import get_conn
+
+    conn = get_conn()
+    cur = conn.cursor()
+
+    cur.execute("SELECT chart FROM charts WHERE chart_key=?", (chart_key,))
+    row = cur.fetchone()
+
+    conn.close()
+
+    with _charts_lock:
+        if not row:
+            _stats["misses"] += 1
+            return None
+
+        chart = json.loads(row["chart"])
+
+        _stats["loads"] += 1
+        _remember(chart_key, chart)
+
+    return chart
+
+
+def save_chart(chart_key, chart):
+    """
+    Store a chart under its fingerprint
+
+    Written immediately rather than staged on the unit of work: a chart
+    fetched from Prokerala is still valid if the request rolls back.
+    """
+
+    from backend.engines.db_engine import get_conn
+
+    conn = get_conn()
+
+    conn.execute("""
+    INSERT INTO charts(chart_key, chart, created_at)
+    VALUES (?, ?, CURRENT_TIMESTAMP)
+    ON CONFLICT(chart_key) DO UPDATE SET
+        chart=excluded.chart
+    """, (chart_key, json.dumps(chart)))
+
+    conn.commit()
+    conn.close()
+
+    with _charts_lock:
+        _stats["saves"] += 1
+        _remember(chart_key, chart)
+
+
+def get_chart_stats():
+    """LRU counters for health checks"""
+
+    with _charts_lock:
+        stats = dict(_stats)
+        stats["entries"] = len(_charts)
+
+    return stats
+
+
+# =========================
+# SESSION HELPERS
+# =========================
+
+def attach_chart(data, chart, field="kundali"):
+    """
+    Point a session at a chart instead of embedding it
+
+    Args:
+        data: Session data (modified in place)
+        chart: Chart returned by get_kundali_cached (carries "chart_key")
+        field: "kundali", "boy_kundali" or "girl_kundali"
+    """
+
+    data[f"{field}_ref"] = chart["chart_key"]
+
+    # Drop any chart inlined by an older session
+    data.pop(field, None)
+
+
+def resolve_chart(data, field="kundali"):
+    """
+    Resolve the chart a session points at
+
+    Sessions written before charts were stored by reference still carry
+    the chart inline; those are returned as-is.
+
+    Returns:
+        dict: Chart data ({} if the session has none)
+    """
+
+    chart_key = data.get(f"{field}_ref")
+
+    if chart_key:
+        chart = get_chart(chart_key)
+
+        if chart is not None:
+            return chart
+
+        logger.warning(f"⚠️ Chart {chart_key} not found in chart store")
+
+    return data.get(field) or {}
@@ -0,0 +1,375 @@
+"""
+Question Classifier
+Multilingual, multi-label question typing over a compiled keyword automaton
+
+Keyword stems for every question type, in English, transliterated
+Hinglish, Hindi, Marathi, Tamil, Telugu and Bengali, are compiled once
+into an Aho-Corasick automaton. A question is classified in a single pass
+over its text:
+
+- A stem matches at the start of a word and covers any suffix
+  ("marri" -> married, marriage); a stem ending in "$" only matches the
+  whole word ("ill" must not match "will")
+- Every matched keyword adds its weight (1 weak ... 3 unambiguous) to its
+  type, once per question
+- All types that scored are returned, best first; no match is GENERAL
+
+Run `python -m backend.engines.classifier_engine` to check accuracy
+against data/question_fixtures.tsv and time the classifier.
+"""
+
+import os
+import sys
+import time
+import unicodedata
+from collections import deque
+
+GENERAL = "GENERAL"
+
+# Tie-break order between equally scored types
+LABEL_ORDER = ["CAREER", "MARRIAGE", "FINANCE", "HEALTH"]
+
+FIXTURES_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "data", "question_fixtures.tsv"
+)
+
+
+# =========================
+# KEYWORDS
+# =========================
+
+# type -> language -> {stem: weight}
+KEYWORDS = {
+    "CAREER": {
+        "EN": {"career": 3, "job": 3, "promotion": 3, "business": 3, "profession": 3,
+               "employ": 3, "unemploy": 3, "interview": 3, "work$": 2, "working$": 2, "workplace": 2, "office": 2,
+               "boss": 2, "startup": 2, "transfer": 1, "exam": 1},
+        "HINGLISH": {"naukri": 3, "naukari": 3, "nokri": 3, "vyapar": 3, "vyapaar": 3,
+                     "dhandha": 3, "tarakki": 3, "taraqqi": 3, "kaam$": 2, "sarkari": 1},
+        "HI": {"नौकरी": 3, "करियर": 3, "कैरियर": 3, "व्यापार": 3, "व्यवसाय": 3, "धंधा": 3,
+               "पदोन्नति": 3, "प्रमोशन": 3, "तरक्की": 3, "बिजनेस": 3, "बिज़नेस": 3,
+               "काम": 2, "दफ्तर": 2, "ऑफिस": 2, "सरकारी": 1},
+        "MR": {"नोकरी": 3, "करिअर": 3, "धंदा": 3, "पदोन्नती": 3, "उद्योग": 2, "बढती": 2},
+        "TA": {"வேலை": 3, "தொழில்": 3, "உத்தியோக": 3, "பதவி உயர்வு": 3, "வியாபார": 3,
+               "வணிக": 3, "பணி": 2},
+        "TE": {"ఉద్యోగ": 3, "వృత్తి": 3, "వ్యాపార": 3, "పదోన్నతి": 3, "ప్రమోషన్": 3,
+               "కెరీర్": 3, "పని": 2},
+        "BN": {"চাকরি": 3, "চাকরী": 3, "কর্মজীবন": 3, "ক্যারিয়ার": 3, "ব্যবসা": 3,
+               "পদোন্নতি": 3, "কাজ": 2, "অফিস": 2},
+    },
+    "MARRIAGE": {
+        "EN": {"marri": 3, "marry": 3, "wedding": 3, "spouse": 3, "husband": 3, "wife$": 3,
+               "divorce": 3, "love": 2, "relationship": 2, "partner": 2, "girlfriend": 2,
+               "boyfriend": 2, "engage": 2, "soulmate": 2},
+        "HINGLISH": {"shaadi": 3, "shadi": 3, "vivah": 3, "byah": 3, "biyah": 3, "pati$": 3,
+                     "patni": 3, "talaq": 3, "rishta": 2, "rishte": 2, "pyar": 2, "pyaar": 2,
+                     "mohabbat": 2, "sagai": 2, "dulha": 2, "dulhan": 2},
+        "HI": {"शादी": 3, "विवाह": 3, "ब्याह": 3, "पति$": 3, "पत्नी": 3, "तलाक": 3,
+               "जीवनसाथी": 3, "प्रेम": 2, "प्यार": 2, "रिश्ता": 2, "रिश्ते": 2, "सगाई": 2},
+        # लग्न is marriage in Marathi but the ascendant in Hindi
+        "MR": {"लग्न": 2, "नवरा": 3, "बायको": 3, "जोडीदार": 3, "घटस्फोट": 3, "साखरपुडा": 2},
+        "TA": {"திருமண": 3, "கல்யாண": 3, "கணவர்": 3, "கணவன்": 3, "மனைவி": 3,
+               "விவாகரத்து": 3, "காதல்": 2},
+        "TE": {"పెళ్లి": 3, "పెళ్ళి": 3, "వివాహ": 3, "భర్త": 3, "భార్య": 3, "విడాకులు": 3,
+               "ప్రేమ": 2},
+        "BN": {"বিয়ে": 3, "বিয়ে": 3, "বিবাহ": 3, "স্বামী": 3, "স্ত্রী": 3, "ডিভোর্স": 3,
+               "প্রেম": 2, "ভালোবাসা": 2},
+    },
+    "FINANCE": {
+        "EN": {"money": 3, "financ": 3, "income": 3, "wealth": 3, "salary": 3, "profit": 3,
+               "debt": 3, "loan": 3, "invest": 3, "lottery": 3, "share market": 3,
+               "loss$": 2, "saving": 2, "rich$": 2, "property": 2, "stock": 2, "earn": 2,
+               "cash": 2},
+        "HINGLISH": {"paisa": 3, "paise": 3, "dhan$": 3, "daulat": 3, "kamai": 3, "karz": 3,
+                     "karza": 3, "karja": 3, "nivesh": 3, "munafa": 3, "tankhwah": 3,
+                     "udhar": 2, "nuksan": 2, "nuksaan": 2, "ameer": 2, "jaydad": 2},
+        # धनु (Sagittarius) and आयु (age) must not count as money
+        "HI": {"पैसा": 3, "पैसे": 3, "धन$": 3, "आय$": 3, "कमाई": 3, "वेतन": 3, "तनख्वाह": 3,
+               "कर्ज": 3, "कर्ज़": 3, "क़र्ज़": 3, "निवेश": 3, "मुनाफा": 3, "आर्थिक": 3,
+               "दौलत": 3, "लाभ": 2, "नुकसान": 2, "संपत्ति": 2, "अमीर": 2},
+        "MR": {"पगार": 3, "गुंतवणूक": 3, "नफा": 3, "तोटा": 2, "संपत्ती": 2, "श्रीमंत": 2},
+        # பண alone would also match பணி (work)
+        "TA": {"பணம்": 3, "வருமான": 3, "சம்பள": 3, "கடன்": 3, "முதலீடு": 3, "லாப": 3,
+               "செல்வ": 3, "நஷ்ட": 2, "சொத்து": 2},
+        "TE": {"డబ్బు": 3, "ధన": 3, "ఆదాయ": 3, "జీతం": 3, "అప్పు": 3, "పెట్టుబడి": 3,
+               "లాభ": 3, "సంపద": 3, "ఆర్థిక": 3, "నష్ట": 2, "ఆస్తి": 2},
+        "BN": {"টাকা": 3, "আয়$": 3, "আয়$": 3, "রোজগার": 3, "বেতন": 3, "ঋণ": 3,
+               "বিনিয়োগ": 3, "বিনিয়োগ": 3, "লাভ": 3, "আর্থিক": 3, "ধন$": 3, "অর্থ": 2,
+               "ধার": 2, "লোকসান": 2, "সম্পত্তি": 2, "ক্ষতি": 1},
+    },
+    "HEALTH": {
+        "EN": {"health": 3, "illness": 3, "disease": 3, "medical": 3, "sick": 3,
+               "surgery": 3, "hospital": 3, "fever": 3, "cancer": 3, "diabet": 3,
+               "injur": 3, "longevity": 3, "lifespan": 3, "ill$": 2, "operation": 2,
+               "doctor": 2, "pain": 2, "accident": 2, "recover": 2, "depress": 2,
+               "anxiety": 2, "stress": 1, "problem$": 1},
+        "HINGLISH": {"sehat": 3, "swasthya": 3, "bimari": 3, "beemari": 3, "bimaar": 3,
+                     "rog$": 3, "rogi": 3, "ilaj": 3, "ilaaj": 3, "bukhar": 3, "aspatal": 3,
+                     "dawai": 2, "dawa$": 2, "dard": 2},
+        "HI": {"स्वास्थ्य": 3, "सेहत": 3, "बीमारी": 3, "बिमारी": 3, "बीमार": 3, "रोग": 3,
+               "इलाज": 3, "उपचार": 3, "बुखार": 3, "अस्पताल": 3, "तबीयत": 3, "तबियत": 3,
+               "दवा": 2, "दर्द": 2, "ऑपरेशन": 2, "दुर्घटना": 2, "चोट": 2, "आयु$": 2},
+        "MR": {"आरोग्य": 3, "तब्येत": 3, "आजार": 3, "दवाखाना": 3, "रुग्णालय": 3,
+               "औषध": 2, "वेदना": 2, "ताप$": 2, "अपघात": 2},
+        "TA": {"ஆரோக்கிய": 3, "உடல்நல": 3, "உடல் நல": 3, "நோய": 3, "மருத்துவ": 3,
+               "சிகிச்சை": 3, "காய்ச்சல்": 3, "அறுவை": 3, "மருந்து": 2, "வலி": 2,
+               "விபத்து": 2},
+        "TE": {"ఆరోగ్య": 3, "అనారోగ్య": 3, "వ్యాధి": 3, "జబ్బు": 3, "రోగ": 3, "వైద్య": 3,
+               "చికిత్స": 3, "జ్వర": 3, "ఆసుపత్రి": 3, "మందు": 2, "నొప్పి": 2, "ప్రమాద": 2},
+        "BN": {"স্বাস্থ্য": 3, "অসুখ": 3, "অসুস্থ": 3, "রোগ": 3, "চিকিৎসা": 3, "জ্বর": 3,
+               "হাসপাতাল": 3, "ওষুধ": 2, "ব্যথা": 2, "দুর্ঘটনা": 2, "শরীর": 2},
+    },
+}
+
+
+# =========================
+# AUTOMATON
+# =========================
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over weighted, labelled keywords
+
+    Args:
+        keywords: Iterable of (text, label, weight); a trailing "$" makes
+            the keyword whole-word only
+    """
+
+    def __init__(self, keywords):
+        # Node i: transitions, failure link, outputs
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+
+        # Spellings that normalize to the same text are one keyword
+        unique = {}
+
+        for text, label, weight in keywords:
+            key = (_normalize(text.rstrip("$")), text.endswith("$"), label)
+            unique[key] = max(weight, unique.get(key, 0))
+
+        self.size = len(unique)
+
+        for keyword_id, ((text, whole_word, label), weight) in enumerate(unique.items()):
+            self._add(text, (keyword_id, len(text), label, weight, whole_word))
+
+        self._link()
+
+    def _add(self, text, output):
+        node = 0
+
+        for ch in text:
+            nxt = self._goto[node].get(ch)
+
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+
+            node = nxt
+
+        self._out[node].append(output)
+
+    def _link(self):
+        queue = deque(self._goto[0].values())
+
+        while queue:
+            node = queue.popleft()
+
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+
+                fail = self._fail[node]
+
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+
+                self._fail[child] = self._goto[fail].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def scan(self, text):
+        """
+        Keywords found in `text` at word starts, each reported once
+
+        Returns:
+            list: (label, weight) per matched keyword
+        """
+
+        goto, fail, out = self._goto, self._fail, self._out
+
+        node = 0
+        seen = set()
+        matches = []
+
+        for end, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+
+            node = goto[node].get(ch, 0)
+
+            for keyword_id, length, label, weight, whole_word in out[node]:
+                if keyword_id in seen:
+                    continue
+
+                start = end - length + 1
+
+                if start > 0 and _is_word_char(text[start - 1]):
+                    continue
+
+                if whole_word and end + 1 < len(text) and _is_word_char(text[end + 1]):
+                    continue
+
+                seen.add(keyword_id)
+                matches.append((label, weight))
+
+        return matches
+
+
+def _normalize(text):
+    # NFC so composed / decomposed Indic letters (e.g. য়) compare equal
+    return unicodedata.normalize("NFC", text.casefold())
+
+
+def _is_word_char(ch):
+    # Letters, digits and combining vowel signs / viramas of Indic scripts
+    return ch.isalnum() or unicodedata.category(ch)[0] == "M"
+
+
+def _compile():
+    return KeywordAutomaton(
+        (stem, label, weight)
+        for label, languages in KEYWORDS.items()
+        for stems in languages.values()
+        for stem, weight in stems.items()
+    )
+
+
+_automaton = _compile()
+
+
+# =========================
+# PUBLIC API
+# =========================
+
+def classify(question):
+    """
+    All question types the text points at
+
+    Args:
+        question: User's question, any supported language
+
+    Returns:
+        list: [(type, score)] best first; [("GENERAL", 0)] if nothing matched
+    """
+
+    scores = {}
+
+    for label, weight in _automaton.scan(_normalize(question or "")):
+        scores[label] = scores.get(label, 0) + weight
+
+    if not scores:
+        return [(GENERAL, 0)]
+
+    return sorted(scores.items(), key=lambda item: (-item[1], LABEL_ORDER.index(item[0])))
+
+
+def classify_labels(question):
+    """Question types best first (["GENERAL"] if none)"""
+
+    return [label for label, _ in classify(question)]
+
+
+# =========================
+# BENCHMARK
+# =========================
+
+def load_fixtures(path=FIXTURES_PATH):
+    """
+    Labelled questions
+
+    Returns:
+        list: (language, [expected types, primary first], question)
+    """
+
+    fixtures = []
+
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+
+            if not line or line.startswith("#"):
+                continue
+
+            lang, labels, question = line.split("\t", 2)
+            fixtures.append((lang, labels.split(","), question))
+
+    return fixtures
+
+
+def evaluate(fixtures=None):
+    """
+    Accuracy per language against the fixture set
+
+    Returns:
+        dict: language -> {"total", "primary", "exact", "failures"}
+    """
+
+    fixtures = load_fixtures() if fixtures is None else fixtures
+
+    report = {}
+
+    for lang, expected, question in fixtures:
+        got = classify_labels(question)
+
+        entry = report.setdefault(lang, {"total": 0, "primary": 0, "exact": 0, "failures": []})
+        entry["total"] += 1
+
+        if got[0] == expected[0]:
+            entry["primary"] += 1
+
+        if set(got) == set(expected):
+            entry["exact"] += 1
+        else:
+            entry["failures"].append((question, expected, got))
+
+    return report
+
+
+def benchmark(fixtures=None, rounds=200):
+    """
+    Classification speed over the fixture questions
+
+    Returns:
+        float: Microseconds per question
+    """
+
+    fixtures = load_fixtures() if fixtures is None else fixtures
+    questions = [question for _, _, question in fixtures]
+
+    started = time.perf_counter()
+
+    for _ in range(rounds):
+        for question in questions:
+            classify(question)
+
+    elapsed = time.perf_counter() - started
+
+    return elapsed / (rounds * len(questions)) * 1e6
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else FIXTURES_PATH
+    fixtures = load_fixtures(path)
+
+    print(f"Automaton: {_automaton.size} keywords, {len(_automaton._goto)} states")
+
+    for lang, entry in evaluate(fixtures).items():
+        print(f"{lang:9} primary {entry['primary']}/{entry['total']}  exact {entry['exact']}/{entry['total']}")
+
+        for question, expected, got in entry["failures"]:
+            print(f"    ✗ {question!r}: expected {expected}, got {got}")
+
+    print(f"{benchmark(fixtures):.1f} µs per question")
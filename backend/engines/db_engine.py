@@ -14,9 +14,15 @@ Features:
 - Admin analytics
 """
 
+import os
+import queue
 import sqlite3
 import logging
 import json
+import threading
+import time
+import weakref
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from backend.config import Config
 
@@ -27,37 +33,555 @@ logger = logging.getLogger(__name__)
 # DATABASE CONNECTION
 # =========================
 
+def _sqlite_path():
+    """
+    Resolve the SQLite file used by the bot
+
+    DATABASE_URL may point at PostgreSQL for the SQLAlchemy layer, in which
+    case the legacy engine keeps using bot.db in the working directory.
+    """
+
+    db_url = Config.DB_URL
+
+    if db_url.startswith("sqlite:///"):
+        return os.path.abspath(db_url.replace("sqlite:///", ""))
+
+    return os.path.abspath("bot.db")
+
+
+class PooledConnection:
+    """
+    Proxy around a pooled sqlite3.Connection
+
+    Behaves like the underlying connection, except that close() hands the
+    connection back to the pool. A proxy that is garbage-collected without
+    being closed is reclaimed automatically, so a helper that returns early
+    cannot leak a connection.
+    """
+
+    __slots__ = ("_raw", "_pool", "_finalizer", "__weakref__")
+
+    def __init__(self, raw, pool):
+        object.__setattr__(self, "_raw", raw)
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(
+            self, "_finalizer", weakref.finalize(self, pool._reclaim, raw)
+        )
+
+    def close(self):
+        """Return the connection to the pool (idempotent)"""
+
+        raw = self._raw
+
+        if raw is None:
+            return
+
+        self._finalizer.detach()
+        object.__setattr__(self, "_raw", None)
+        self._pool._release(raw)
+
+    def _connection(self):
+        if self._raw is None:
+            raise sqlite3.ProgrammingError("Cannot operate on a closed database.")
+
+        return self._raw
+
+    def __getattr__(self, name):
+        return getattr(self._connection(), name)
+
+    def __setattr__(self, name, value):
+        # isolation_level / row_factory tweaks go to the real connection and
+        # are reset when it is released
+        setattr(self._connection(), name, value)
+
+    def __enter__(self):
+        self._connection().__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._connection().__exit__(exc_type, exc, tb)
+
+
+class SQLiteConnectionPool:
+    """
+    Thread-safe pool of long-lived SQLite connections
+
+    - Up to `size` connections are kept open and reused (LIFO, so the
+      hottest connections keep their page and statement caches warm)
+    - Up to `max_overflow` extra connections are opened under bursts and
+      closed again on release
+    - Every connection is configured once: WAL, busy_timeout, synchronous
+      and a per-connection prepared-statement cache
+    - Checkout/wait metrics are exposed through stats()
+    """
+
+    def __init__(
+        self,
+        db_path,
+        size=10,
+        max_overflow=20,
+        timeout=30,
+        busy_timeout_ms=5000,
+        synchronous="NORMAL",
+        statement_cache_size=256
+    ):
+        self.db_path = db_path
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.busy_timeout_ms = busy_timeout_ms
+        self.synchronous = synchronous
+        self.statement_cache_size = statement_cache_size
+
+        self._lock = threading.Lock()
+        self._reset_state()
+
+    def _reset_state(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._open = 0
+        self._in_use = 0
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "timeouts": 0,
+            "created": 0,
+            "overflow_created": 0,
+            "discarded": 0,
+            "reclaimed": 0
+        }
+
+    # ---------- CONNECTION SETUP ----------
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            cached_statements=self.statement_cache_size
+        )
+
+        conn.row_factory = sqlite3.Row
+
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+
+        return conn
+
+    # ---------- CHECKOUT / RELEASE ----------
+
+    def checkout(self):
+        """
+        Borrow a connection from the pool
+
+        Returns:
+            PooledConnection: Connection proxy (call close() to return it)
+
+        Raises:
+            sqlite3.OperationalError: If no connection frees up within `timeout`
+        """
+
+        with self._lock:
+            # A forked worker must never reuse the parent's sqlite handles
+            if os.getpid() != self._pid:
+                self._reset_state()
+
+            self._stats["checkouts"] += 1
+
+            raw = self._get_idle()
+
+            if raw is None and self._open < self.size + self.max_overflow:
+                raw = self._open_new()
+
+        if raw is None:
+            raw = self._wait_for_idle()
+
+        with self._lock:
+            self._in_use += 1
+
+        return PooledConnection(raw, self)
+
+    def _get_idle(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return None
+
+    def _open_new(self):
+        raw = self._connect()
+
+        self._open += 1
+        self._stats["created"] += 1
+
+        if self._open > self.size:
+            self._stats["overflow_created"] += 1
+
+        return raw
+
+    def _wait_for_idle(self):
+        started = time.monotonic()
+
+        try:
+            raw = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self._stats["timeouts"] += 1
+            logger.error(f"❌ SQLite pool exhausted after {self.timeout}s")
+            raise sqlite3.OperationalError("SQLite connection pool exhausted")
+
+        waited = time.monotonic() - started
+
+        with self._lock:
+            self._stats["waits"] += 1
+            self._stats["wait_time_total"] += waited
+            self._stats["wait_time_max"] = max(self._stats["wait_time_max"], waited)
+
+        return raw
+
+    def _release(self, raw):
+        try:
+            # Same semantics as sqlite3.Connection.close(): uncommitted work is dropped
+            if raw.in_transaction:
+                raw.rollback()
+
+            raw.isolation_level = ""
+            raw.row_factory = sqlite3.Row
+            healthy = True
+        except sqlite3.Error:
+            healthy = False
+
+        with self._lock:
+            if os.getpid() != self._pid:
+                return
+
+            self._in_use -= 1
+
+            if healthy and self._idle.qsize() < self.size:
+                self._idle.put(raw)
+                return
+
+            self._open -= 1
+            self._stats["discarded"] += 1
+
+        try:
+            raw.close()
+        except sqlite3.Error:
+            pass
+
+    def _reclaim(self, raw):
+        with self._lock:
+            self._stats["reclaimed"] += 1
+
+        self._release(raw)
+
+    # ---------- METRICS ----------
+
+    def stats(self):
+        """
+        Pool metrics for health checks and dashboards
+
+        Returns:
+            dict: Sizes, checkout counts and wait-time figures
+        """
+
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "open": self._open,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize()
+            })
+
+        waits = stats["waits"]
+        stats["wait_time_avg_ms"] = round(stats["wait_time_total"] / waits * 1000, 2) if waits else 0.0
+        stats["wait_time_max_ms"] = round(stats.pop("wait_time_max") * 1000, 2)
+        stats["wait_time_total_ms"] = round(stats.pop("wait_time_total") * 1000, 2)
+
+        return stats
+
+    def close_all(self):
+        """Close every idle connection (used on shutdown / in scripts)"""
+
+        with self._lock:
+            while True:
+                raw = self._get_idle()
+
+                if raw is None:
+                    break
+
+                self._open -= 1
+                raw.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Get (or lazily create) the process-wide connection pool"""
+
+    global _pool
+
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SQLiteConnectionPool(
+                    _sqlite_path(),
+                    size=Config.DB_POOL_SIZE,
+                    max_overflow=Config.DB_MAX_OVERFLOW,
+                    timeout=Config.DB_POOL_TIMEOUT,
+                    busy_timeout_ms=Config.SQLITE_BUSY_TIMEOUT_MS,
+                    synchronous=Config.SQLITE_SYNCHRONOUS,
+                    statement_cache_size=Config.SQLITE_STATEMENT_CACHE_SIZE
+                )
+
+    return _pool
+
+
 def get_conn():
     """
-    Get database connection with WAL mode for better concurrency
-    
+    Get a pooled database connection
+
+    The connection is long-lived and already configured (WAL, busy_timeout,
+    synchronous, statement cache). Callers keep the usual
+    commit()/close() pattern - close() returns it to the pool.
+
     Returns:
-        sqlite3.Connection: Database connection
+        PooledConnection: Database connection
     """
-    
-    from backend.config import Config
-import os
 
-def get_conn():
-    db_path = "bot.db"  # Simple hardcoded path
+    return get_pool().checkout()
 
-    # If DB_URL starts with sqlite:///
-    if db_path.startswith("sqlite:///"):
-        db_path = db_path.replace("sqlite:///", "")
 
-    # Convert to absolute path
-    db_path = os.path.abspath(db_path)
+def get_pool_stats():
+    """Connection pool checkout/wait metrics"""
 
-    conn = sqlite3.connect(db_path, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+    return get_pool().stats()
 
-    conn.row_factory = sqlite3.Row  # Enable column access by name
-    
-    # Enable WAL mode for better performance
-    conn.execute("PRAGMA journal_mode=WAL")
-    
-    return conn
+
+# =========================
+# UNIT OF WORK (one transaction per inbound message)
+# =========================
+
+_uow_local = threading.local()
+
+_uow_stats = {
+    "commits": 0,
+    "rollbacks": 0,
+    "statements": 0,
+    "empty": 0
+}
+_uow_stats_lock = threading.Lock()
+
+
+class UnitOfWork:
+    """
+    Request-scoped write buffer
+
+    While a unit of work is active on the current thread, writes made by the
+    db_engine helpers are staged in memory and applied in a single
+    transaction (one fsync) when the request ends. Reads still go straight
+    to the database, so a slow Prokerala/OpenAI call in the middle of a
+    request never holds the SQLite write lock.
+
+    Staged session and Q&A-credit changes are overlaid on reads so the FSM
+    keeps seeing its own writes within the request.
+    """
+
+    def __init__(self):
+        self._statements = []
+        self._after_commit = []
+        self._after_rollback = []
+
+        # phone -> (step, data_json), or None when the session was cleared
+        self.sessions = {}
+
+        # phone -> pending credit change
+        self.credit_deltas = {}
+
+        # phone -> content hash of the session as loaded / last saved
+        self.session_digests = {}
+
+        # phones whose session is written to Redis after commit
+        self.session_publish = set()
+
+    def stage(self, sql, params=()):
+        """Queue a write statement for the final commit"""
+
+        self._statements.append((sql, params))
+
+    def on_commit(self, callback):
+        """Run callback once the staged writes are durable"""
+
+        self._after_commit.append(callback)
+
+    def on_rollback(self, callback):
+        """
+        Run callback if the unit of work is rolled back
+
+        Undoes writes made outside the unit of work (e.g. a Q&A credit
+        deducted immediately). Runs after the unit of work has ended, so
+        the callback's own writes are applied at once.
+        """
+
+        self._after_rollback.append(callback)
+
+    def commit(self):
+        """Apply every staged write in one IMMEDIATE transaction"""
+
+        statements = self._statements
+
+        if statements:
+            conn = get_conn()
+
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+
+                for sql, params in statements:
+                    conn.execute(sql, params)
+
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+
+        with _uow_stats_lock:
+            _uow_stats["commits"] += 1
+            _uow_stats["statements"] += len(statements)
+
+            if not statements:
+                _uow_stats["empty"] += 1
+
+        callbacks = self._after_commit
+        self.discard()
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.exception("❌ Unit of work after-commit hook failed")
+
+    def discard(self):
+        """Drop everything staged so far"""
+
+        self._statements = []
+        self._after_commit = []
+        self._after_rollback = []
+        self.sessions = {}
+        self.credit_deltas = {}
+        self.session_digests = {}
+        self.session_publish = set()
+
+
+def current_unit_of_work():
+    """Unit of work active on this thread, or None"""
+
+    return getattr(_uow_local, "current", None)
+
+
+@contextmanager
+def unit_of_work():
+    """
+    Run a block as a single unit of work
+
+    Usage:
+        with unit_of_work():
+            reply = process_message(phone, body)
+
+    Staged writes are committed when the block exits normally and rolled
+    back (discarded) if it raises. Nested blocks join the outer one.
+    """
+
+    outer = current_unit_of_work()
+
+    if outer is not None:
+        yield outer
+        return
+
+    uow = UnitOfWork()
+    _uow_local.current = uow
+
+    try:
+        yield uow
+        uow.commit()
+    except BaseException:
+        rollback_hooks = uow._after_rollback
+        uow.discard()
+
+        with _uow_stats_lock:
+            _uow_stats["rollbacks"] += 1
+
+        _uow_local.current = None
+
+        for callback in rollback_hooks:
+            try:
+                callback()
+            except Exception:
+                logger.exception("❌ Unit of work rollback hook failed")
+
+        raise
+    finally:
+        _uow_local.current = None
+
+
+def get_unit_of_work_stats():
+    """Commit/rollback counters for the per-request unit of work"""
+
+    with _uow_stats_lock:
+        stats = dict(_uow_stats)
+
+    committed = stats["commits"] - stats["empty"]
+    stats["avg_statements_per_commit"] = round(stats["statements"] / committed, 2) if committed else 0.0
+
+    return stats
+
+
+def _log_write(table, sql, params):
+    """
+    Append a row to one of the log tables
+
+    Goes through the write-behind log sink (batched, off the request
+    thread) when enabled, otherwise behaves like _write().
+    """
+
+    if Config.LOG_SINK_ENABLED:
+        from backend.engines.log_engine import get_log_sink, utc_timestamp
+
+        get_log_sink().submit(table, tuple(params) + (utc_timestamp(),))
+        return
+
+    _write(sql, params)
+
+
+def _write(sql, params=()):
+    """
+    Execute a write statement
+
+    Staged on the active unit of work if there is one, otherwise executed
+    and committed immediately.
+    """
+
+    uow = current_unit_of_work()
+
+    if uow is not None:
+        uow.stage(sql, params)
+        return
+
+    conn = get_conn()
+
+    try:
+        conn.execute(sql, params)
+        conn.commit()
+    finally:
+        conn.close()
 
 
 # =========================
@@ -177,6 +701,27 @@ def init_db():
     )
     """)
     
+    # ========== CHARTS TABLE ==========
+    # Kundali charts referenced by sessions (see chart_engine)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS charts (
+        chart_key TEXT PRIMARY KEY,
+        chart TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    
+    # ========== API USAGE TABLE ==========
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS api_usage (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        phone TEXT NOT NULL,
+        api_name TEXT NOT NULL,
+        cost REAL DEFAULT 0.0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    
     # ========== CREATE INDEXES ==========
     
     # Sessions
@@ -206,7 +751,17 @@ def init_db():
     # Cache
     cur.execute("CREATE INDEX IF NOT EXISTS idx_cache_expires ON cache(expires_at)")
     
+    # Recent-rows and windowed queries (stats / dashboard)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_payment_orders_created ON payment_orders(created_at DESC)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_api_usage_created ON api_usage(created_at DESC)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_api_usage_phone_created ON api_usage(phone, created_at)")
+    
     conn.commit()
+    
+    # ========== STAT COUNTERS (trigger-maintained) ==========
+    from backend.engines.stats_engine import install_stat_counters
+    install_stat_counters(conn)
+    
     conn.close()
     
     logger.info("✅ Database initialized successfully with all tables and indexes")
@@ -227,38 +782,25 @@ def get_or_create_user(phone):
         dict: User record
     """
     
-    conn = get_conn()
-    cur = conn.cursor()
+    user = get_user(phone)
     
-    # Check if user exists
-    cur.execute("SELECT * FROM users WHERE phone=?", (phone,))
-    user = cur.fetchone()
+    # Create or touch last_active in one statement (safe to stage)
+    _write("""
+    INSERT INTO users(phone, created_at, last_active)
+    VALUES (?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+    ON CONFLICT(phone) DO UPDATE SET last_active=CURRENT_TIMESTAMP
+    """, (phone,))
     
-    if not user:
-        # Create new user
-        cur.execute("""
-        INSERT INTO users(phone, created_at, last_active)
-        VALUES (?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-        """, (phone,))
-        
-        conn.commit()
-        
-        # Fetch the created user
-        cur.execute("SELECT * FROM users WHERE phone=?", (phone,))
-        user = cur.fetchone()
-        
-        logger.info(f"✅ New user created: {phone}")
-    else:
-        # Update last active
-        cur.execute("""
-        UPDATE users SET last_active=CURRENT_TIMESTAMP WHERE phone=?
-        """, (phone,))
-        
-        conn.commit()
+    if user:
+        return user
     
-    conn.close()
+    logger.info(f"✅ New user created: {phone}")
     
-    return dict(user) if user else None
+    if current_unit_of_work() is not None:
+        # Row becomes visible when the unit of work commits
+        return {"phone": phone, "name": None}
+    
+    return get_user(phone)
 
 
 def get_user(phone):
@@ -290,67 +832,34 @@ def get_session(phone):
         dict: Session data with 'step' and 'data' keys
     """
     
-    conn = get_conn()
-    cur = conn.cursor()
-    
-    cur.execute("SELECT * FROM sessions WHERE phone=?", (phone,))
-    session = cur.fetchone()
-    
-    conn.close()
-    
-    if session:
-        return {
-            "phone": session["phone"],
-            "step": session["step"],
-            "data": json.loads(session["data"]) if session["data"] else {}
-        }
-    
-    return None
+    from backend.engines.session_engine import load_session
+
+    return load_session(phone)
 
 
 def save_session(phone, step, data):
     """
     Save user's session (FSM state)
     
+    Unchanged sessions are not rewritten (see session_engine).
+    
     Args:
         phone: User's WhatsApp number
         step: Current FSM step
         data: Session data (dict)
     """
     
-    conn = get_conn()
-    cur = conn.cursor()
-    
-    data_json = json.dumps(data)
-    
-    # Upsert session
-    cur.execute("""
-    INSERT INTO sessions(phone, step, data, updated_at)
-    VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-    ON CONFLICT(phone) DO UPDATE SET
-        step=excluded.step,
-        data=excluded.data,
-        updated_at=CURRENT_TIMESTAMP
-    """, (phone, step, data_json))
-    
-    conn.commit()
-    conn.close()
-    
-    logger.debug(f"📝 Session saved: {phone} → {step}")
+    from backend.engines.session_engine import store_session
+
+    store_session(phone, step, data)
 
 
 def clear_session(phone):
     """Delete user's session"""
     
-    conn = get_conn()
-    cur = conn.cursor()
-    
-    cur.execute("DELETE FROM sessions WHERE phone=?", (phone,))
-    
-    conn.commit()
-    conn.close()
-    
-    logger.info(f"🗑️ Session cleared: {phone}")
+    from backend.engines.session_engine import delete_session
+
+    delete_session(phone)
 
 
 # =========================
@@ -361,21 +870,18 @@ def log_message(phone, message):
     """
     Log incoming message
     
+    Written asynchronously by the log sink, so it may take up to
+    LOG_SINK_FLUSH_INTERVAL_SECONDS to show up in get_message_history().
+    
     Args:
         phone: User's WhatsApp number
         message: Message text
     """
     
-    conn = get_conn()
-    cur = conn.cursor()
-    
-    cur.execute("""
+    _log_write("message_logs", """
     INSERT INTO message_logs(phone, message, created_at)
     VALUES (?, ?, CURRENT_TIMESTAMP)
     """, (phone, message))
-    
-    conn.commit()
-    conn.close()
 
 
 def get_message_history(phone, limit=10):
@@ -421,7 +927,14 @@ def get_qna_credits(phone):
     
     conn.close()
     
-    return result["credits"] if result else 0
+    credits = result["credits"] if result else 0
+    
+    uow = current_unit_of_work()
+    
+    if uow is not None:
+        credits += uow.credit_deltas.get(phone, 0)
+    
+    return credits
 
 
 def grant_qna_pack(phone, credits=4):
@@ -433,11 +946,8 @@ def grant_qna_pack(phone, credits=4):
         credits: Number of credits to grant (default: 4)
     """
     
-    conn = get_conn()
-    cur = conn.cursor()
-    
     # Upsert credits
-    cur.execute("""
+    _write("""
     INSERT INTO qna_credits(phone, credits, updated_at)
     VALUES (?, ?, CURRENT_TIMESTAMP)
     ON CONFLICT(phone) DO UPDATE SET
@@ -445,8 +955,10 @@ def grant_qna_pack(phone, credits=4):
         updated_at=CURRENT_TIMESTAMP
     """, (phone, credits))
     
-    conn.commit()
-    conn.close()
+    uow = current_unit_of_work()
+    
+    if uow is not None:
+        uow.credit_deltas[phone] = uow.credit_deltas.get(phone, 0) + credits
     
     logger.info(f"✅ Granted {credits} Q&A credits to {phone}")
 
@@ -460,26 +972,46 @@ def use_qna_credit(phone):
     
     Returns:
         bool: True if credit was used, False if no credits available
+
+    The deduction is applied immediately, not staged on the unit of work:
+    staged, the check and the UPDATE would be a whole OpenAI call apart
+    and parallel questions could all spend the same credit. If the request
+    then fails, the unit of work refunds it.
     """
     
-    credits = get_qna_credits(phone)
-    
-    if credits <= 0:
-        return False
+    uow = current_unit_of_work()
     
     conn = get_conn()
-    cur = conn.cursor()
     
-    cur.execute("""
-    UPDATE qna_credits 
-    SET credits=credits-1, updated_at=CURRENT_TIMESTAMP
-    WHERE phone=?
-    """, (phone,))
+    try:
+        cur = conn.execute("""
+        UPDATE qna_credits 
+        SET credits=credits-1, updated_at=CURRENT_TIMESTAMP
+        WHERE phone=? AND credits > 0
+        """, (phone,))
+        conn.commit()
+        
+        deducted = cur.rowcount == 1
+    finally:
+        conn.close()
     
-    conn.commit()
-    conn.close()
+    if deducted:
+        if uow is not None:
+            uow.on_rollback(lambda: grant_qna_pack(phone, 1))
     
-    logger.info(f"📉 Used 1 Q&A credit for {phone}, remaining: {credits - 1}")
+    elif uow is not None and uow.credit_deltas.get(phone, 0) > 0:
+        # Pack granted earlier in this request: spend it in the same commit
+        uow.stage("""
+        UPDATE qna_credits 
+        SET credits=credits-1, updated_at=CURRENT_TIMESTAMP
+        WHERE phone=? AND credits > 0
+        """, (phone,))
+        uow.credit_deltas[phone] -= 1
+    
+    else:
+        return False
+    
+    logger.info(f"📉 Used 1 Q&A credit for {phone}")
     
     return True
 
@@ -487,16 +1019,10 @@ def use_qna_credit(phone):
 def log_question(phone, question):
     """Log user's question"""
     
-    conn = get_conn()
-    cur = conn.cursor()
-    
-    cur.execute("""
+    _log_write("questions_log", """
     INSERT INTO questions_log(phone, question, created_at)
     VALUES (?, ?, CURRENT_TIMESTAMP)
     """, (phone, question))
-    
-    conn.commit()
-    conn.close()
 
 
 # =========================
@@ -506,17 +1032,11 @@ def log_question(phone, question):
 def mark_kundali_purchased(phone):
     """Mark that user purchased Kundali"""
     
-    conn = get_conn()
-    cur = conn.cursor()
-    
-    cur.execute("""
+    _write("""
     INSERT INTO purchases(phone, product, purchased_at)
     VALUES (?, 'KUNDALI', CURRENT_TIMESTAMP)
     """, (phone,))
     
-    conn.commit()
-    conn.close()
-    
     logger.info(f"✅ Kundali purchased: {phone}")
 
 
@@ -540,17 +1060,11 @@ def has_kundali_access(phone):
 def mark_milan_purchased(phone):
     """Mark that user purchased Milan"""
     
-    conn = get_conn()
-    cur = conn.cursor()
-    
-    cur.execute("""
+    _write("""
     INSERT INTO purchases(phone, product, purchased_at)
     VALUES (?, 'MILAN', CURRENT_TIMESTAMP)
     """, (phone,))
     
-    conn.commit()
-    conn.close()
-    
     logger.info(f"✅ Milan purchased: {phone}")
 
 
@@ -667,34 +1181,91 @@ def get_latest_milan(phone):
 # CACHE FUNCTIONS
 # =========================
 
-def cache_set(key, value, ttl_seconds=3600):
+def _cache_table_get(key):
     """
-    Set cache value with expiry
-    
-    Args:
-        key: Cache key
-        value: Value to cache (will be JSON-encoded)
-        ttl_seconds: Time to live in seconds (default: 1 hour)
+    Read a row from the SQLite cache table (L2 store for cache_engine)
+
+    Expired rows are deleted as they are found, instead of lingering
+    until cache_clear_expired() runs.
+
+    Returns:
+        (value_json, remaining_seconds) or None
     """
-    
+
     conn = get_conn()
     cur = conn.cursor()
-    
-    expires_at = datetime.now() + timedelta(seconds=ttl_seconds)
-    value_json = json.dumps(value)
-    
+
     cur.execute("""
+    SELECT value,
+           CAST((julianday(expires_at) - julianday('now')) * 86400 AS INTEGER) AS remaining
+    FROM cache
+    WHERE key=?
+    """, (key,))
+
+    result = cur.fetchone()
+
+    conn.close()
+
+    if not result:
+        return None
+
+    if result["remaining"] is None or result["remaining"] <= 0:
+        _cache_table_delete(key)
+        return None
+
+    return result["value"], result["remaining"]
+
+
+def _cache_table_set(key, value_json, ttl_seconds):
+    """
+    Upsert a row in the SQLite cache table (expires_at is UTC)
+
+    Cache writes are not staged in the unit of work: a computed chart
+    is still valid if the request that fetched it rolls back.
+    """
+
+    expires_at = (datetime.utcnow() + timedelta(seconds=ttl_seconds)).strftime("%Y-%m-%d %H:%M:%S")
+
+    conn = get_conn()
+
+    conn.execute("""
     INSERT INTO cache(key, value, expires_at)
     VALUES (?, ?, ?)
     ON CONFLICT(key) DO UPDATE SET
         value=excluded.value,
         expires_at=excluded.expires_at
     """, (key, value_json, expires_at))
-    
+
     conn.commit()
     conn.close()
 
 
+def _cache_table_delete(key):
+    """Delete a row from the SQLite cache table"""
+
+    conn = get_conn()
+
+    conn.execute("DELETE FROM cache WHERE key=?", (key,))
+
+    conn.commit()
+    conn.close()
+
+
+def cache_set(key, value, ttl_seconds=3600):
+    """
+    Set cache value with expiry
+    
+    Args:
+        key: Cache key
+        value: Value to cache (will be JSON-encoded)
+        ttl_seconds: Time to live in seconds (default: 1 hour)
+    """
+    
+    from backend.engines.cache_engine import get_cache
+
+    get_cache().set(key, value, ttl_seconds)
+
+
 def cache_get(key):
     """
     Get cached value
@@ -706,39 +1277,26 @@ def cache_get(key):
         Cached value or None if not found or expired
     """
     
-    conn = get_conn()
-    cur = conn.cursor()
-    
-    cur.execute("""
-    SELECT value FROM cache 
-    WHERE key=? AND expires_at > CURRENT_TIMESTAMP
-    """, (key,))
-    
-    result = cur.fetchone()
-    
-    conn.close()
-    
-    if result:
-        return json.loads(result["value"])
-    
-    return None
+    from backend.engines.cache_engine import get_cache
+
+    return get_cache().get(key)
 
 
 def cache_delete(key):
     """Delete cached value"""
     
-    conn = get_conn()
-    cur = conn.cursor()
-    
-    cur.execute("DELETE FROM cache WHERE key=?", (key,))
-    
-    conn.commit()
-    conn.close()
+    from backend.engines.cache_engine import get_cache
+
+    get_cache().delete(key)
 
 
 def cache_clear_expired():
     """Clear all expired cache entries"""
     
+    from backend.engines.cache_engine import get_cache
+
+    l1_deleted = get_cache().purge_expired()
+
     conn = get_conn()
     cur = conn.cursor()
     
@@ -748,8 +1306,8 @@ def cache_clear_expired():
     conn.commit()
     conn.close()
     
-    if deleted > 0:
-        logger.info(f"🗑️ Cleared {deleted} expired cache entries")
+    if deleted > 0 or l1_deleted > 0:
+        logger.info(f"🗑️ Cleared {deleted} expired cache entries ({l1_deleted} in-process)")
 
 
 # =========================
@@ -771,6 +1329,19 @@ def get_kundali_cache(key):
     return cache_get(f"kundali_{key}")
 
 
+def peek_kundali_cache(key):
+    """
+    Get cached kundali data, bypassing negative caching
+
+    Used as a single-flight peek, where a miss recorded a moment ago must
+    not hide a result another process has since stored.
+    """
+
+    from backend.engines.cache_engine import get_cache
+
+    return get_cache().peek(f"kundali_{key}")
+
+
 def set_kundali_cache(key, kundali_data, ttl_seconds=86400):
     """
     Cache kundali data
@@ -904,29 +1475,12 @@ def log_api_usage(phone, api_name, cost=0.0):
         cost: Cost of the API call in USD (default: 0.0)
     """
     
-    conn = get_conn()
-    cur = conn.cursor()
-    
-    # Create API usage table if not exists
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS api_usage (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        phone TEXT NOT NULL,
-        api_name TEXT NOT NULL,
-        cost REAL DEFAULT 0.0,
-        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-    )
-    """)
-    
     # Insert usage log
-    cur.execute("""
+    _log_write("api_usage", """
     INSERT INTO api_usage(phone, api_name, cost, created_at)
     VALUES (?, ?, ?, CURRENT_TIMESTAMP)
     """, (phone, api_name, cost))
     
-    conn.commit()
-    conn.close()
-    
     logger.debug(f"📊 API usage logged: {phone} - {api_name} - ${cost}")
 
 
@@ -955,6 +1509,10 @@ def get_api_usage_stats(phone=None, days=30):
     """
     Get API usage statistics
     
+    Totals come from the day-bucketed stat counters, so the window is
+    whole UTC days (today plus the previous days-1). Per-user stats
+    still query api_usage, through the (phone, created_at) index.
+    
     Args:
         phone: User's phone (optional, if None returns all users)
         days: Number of days to look back (default: 30)
@@ -963,63 +1521,59 @@ def get_api_usage_stats(phone=None, days=30):
         dict: API usage statistics
     """
     
+    from backend.engines.stats_engine import sum_days
+    
     conn = get_conn()
     cur = conn.cursor()
     
-    # Check if table exists
-    cur.execute("""
-    SELECT name FROM sqlite_master 
-    WHERE type='table' AND name='api_usage'
-    """)
-    
-    if not cur.fetchone():
-        conn.close()
-        return {
-            "total_calls": 0,
-            "total_cost": 0.0,
-            "by_api": {},
-            "recent_calls": []
-        }
-    
-    # Build query
     if phone:
-        where_clause = "WHERE phone=? AND created_at >= datetime('now', ? || ' days')"
         params = (phone, -days)
+        
+        cur.execute("""
+        SELECT api_name, COUNT(*) as count, SUM(cost) as cost
+        FROM api_usage
+        WHERE phone=? AND created_at >= datetime('now', ? || ' days')
+        GROUP BY api_name
+        """, params)
+        by_api = {row["api_name"]: {"count": row["count"], "cost": row["cost"] or 0.0} for row in cur.fetchall()}
+        
+        cur.execute("""
+        SELECT phone, api_name, cost, created_at
+        FROM api_usage
+        WHERE phone=? AND created_at >= datetime('now', ? || ' days')
+        ORDER BY created_at DESC
+        LIMIT 10
+        """, params)
     else:
-        where_clause = "WHERE created_at >= datetime('now', ? || ' days')"
-        params = (-days,)
-    
-    # Total calls
-    cur.execute(f"SELECT COUNT(*) as count FROM api_usage {where_clause}", params)
-    total_calls = cur.fetchone()["count"]
+        calls = sum_days(prefix="api.calls:", days=days)
+        costs = sum_days(prefix="api.cost:", days=days)
+        
+        by_api = {}
+        
+        for metric, count in calls.items():
+            api_name = metric.split(":", 1)[1]
+            
+            if count:
+                by_api[api_name] = {
+                    "count": int(count),
+                    "cost": costs.get(f"api.cost:{api_name}", 0.0)
+                }
+        
+        cur.execute("""
+        SELECT phone, api_name, cost, created_at
+        FROM api_usage
+        WHERE created_at >= datetime('now', ? || ' days')
+        ORDER BY created_at DESC
+        LIMIT 10
+        """, (-days,))
     
-    # Total cost
-    cur.execute(f"SELECT SUM(cost) as total FROM api_usage {where_clause}", params)
-    result = cur.fetchone()
-    total_cost = result["total"] if result["total"] else 0.0
-    
-    # By API
-    cur.execute(f"""
-    SELECT api_name, COUNT(*) as count, SUM(cost) as cost
-    FROM api_usage {where_clause}
-    GROUP BY api_name
-    """, params)
-    by_api = {row["api_name"]: {"count": row["count"], "cost": row["cost"] or 0.0} for row in cur.fetchall()}
-    
-    # Recent calls
-    cur.execute(f"""
-    SELECT phone, api_name, cost, created_at
-    FROM api_usage {where_clause}
-    ORDER BY created_at DESC
-    LIMIT 10
-    """, params)
     recent_calls = [dict(row) for row in cur.fetchall()]
     
     conn.close()
     
     return {
-        "total_calls": total_calls,
-        "total_cost": round(total_cost, 2),
+        "total_calls": sum(api["count"] for api in by_api.values()),
+        "total_cost": round(sum(api["cost"] for api in by_api.values()), 2),
         "by_api": by_api,
         "recent_calls": recent_calls
     }
@@ -1066,53 +1620,26 @@ def get_api_credits(phone=None):
 def get_user_stats():
     """Get user statistics for admin dashboard"""
     
-    conn = get_conn()
-    cur = conn.cursor()
-    
-    # Total users
-    cur.execute("SELECT COUNT(*) as count FROM users")
-    total_users = cur.fetchone()["count"]
-    
-    # Users today
-    cur.execute("""
-    SELECT COUNT(*) as count FROM users 
-    WHERE DATE(created_at) = DATE('now')
-    """)
-    users_today = cur.fetchone()["count"]
-    
-    # Active users (last 7 days)
-    cur.execute("""
-    SELECT COUNT(*) as count FROM users 
-    WHERE last_active >= datetime('now', '-7 days')
-    """)
-    active_users = cur.fetchone()["count"]
-    
-    conn.close()
+    from backend.engines.stats_engine import get_counter, sum_days
     
     return {
-        "total_users": total_users,
-        "users_today": users_today,
-        "active_users_7d": active_users
+        "total_users": int(get_counter("users")),
+        "users_today": int(get_counter("users", datetime.utcnow().strftime("%Y-%m-%d"))),
+        # Users whose last_active falls within the last 7 UTC days
+        "active_users_7d": int(sum_days("users.last_active", days=7))
     }
 
 
 def get_purchase_stats():
     """Get purchase statistics"""
     
-    conn = get_conn()
-    cur = conn.cursor()
-    
-    # Total purchases
-    cur.execute("SELECT COUNT(*) as count FROM purchases")
-    total = cur.fetchone()["count"]
+    from backend.engines.stats_engine import get_counter, get_counters
     
-    # Purchases by product
-    cur.execute("""
-    SELECT product, COUNT(*) as count 
-    FROM purchases 
-    GROUP BY product
-    """)
-    by_product = {row["product"]: row["count"] for row in cur.fetchall()}
+    by_product = {
+        metric.split(":", 1)[1]: int(count)
+        for metric, count in get_counters(prefix="purchases:").items()
+        if count
+    }
     
     # Revenue (approximate)
     revenue = (
@@ -1121,10 +1648,8 @@ def get_purchase_stats():
         by_product.get("MILAN", 0) * getattr(Config, "MILAN_PRICE", 199)
     )
     
-    conn.close()
-    
     return {
-        "total_purchases": total,
+        "total_purchases": int(get_counter("purchases")),
         "by_product": by_product,
         "estimated_revenue": revenue
     }
@@ -1133,24 +1658,20 @@ def get_purchase_stats():
 def get_milan_stats():
     """Get Milan statistics"""
     
-    conn = get_conn()
-    cur = conn.cursor()
+    from backend.engines.stats_engine import get_counters
     
-    # Total Milan calculations
-    cur.execute("SELECT COUNT(*) as count FROM milan_calculations")
-    total = cur.fetchone()["count"]
+    counters = get_counters(["milan", "milan.score"])
+    total = int(counters.get("milan", 0))
+    avg_score = counters.get("milan.score", 0) / total if total else 0
     
-    # Average score
-    cur.execute("SELECT AVG(total_score) as avg FROM milan_calculations")
-    avg_score = cur.fetchone()["avg"] or 0
+    rating_dist = {
+        metric.split(":", 1)[1]: int(count)
+        for metric, count in get_counters(prefix="milan.rating:").items()
+        if count
+    }
     
-    # Rating distribution
-    cur.execute("""
-    SELECT rating, COUNT(*) as count 
-    FROM milan_calculations 
-    GROUP BY rating
-    """)
-    rating_dist = {row["rating"]: row["count"] for row in cur.fetchall()}
+    conn = get_conn()
+    cur = conn.cursor()
     
     # Recent calculations
     cur.execute("""
@@ -1174,28 +1695,18 @@ def get_milan_stats():
 def get_payment_stats():
     """Get payment order statistics"""
     
-    conn = get_conn()
-    cur = conn.cursor()
+    from backend.engines.stats_engine import get_counters
     
-    # Total orders
-    cur.execute("SELECT COUNT(*) as count FROM payment_orders")
-    total_orders = cur.fetchone()["count"]
+    counters = get_counters(["payments", "payments.revenue"])
     
-    # Orders by status
-    cur.execute("""
-    SELECT status, COUNT(*) as count 
-    FROM payment_orders 
-    GROUP BY status
-    """)
-    by_status = {row["status"]: row["count"] for row in cur.fetchall()}
+    by_status = {
+        metric.split(":", 1)[1]: int(count)
+        for metric, count in get_counters(prefix="payments.status:").items()
+        if count
+    }
     
-    # Total revenue (successful payments)
-    cur.execute("""
-    SELECT SUM(amount) as total 
-    FROM payment_orders 
-    WHERE status='SUCCESS'
-    """)
-    revenue = cur.fetchone()["total"] or 0
+    conn = get_conn()
+    cur = conn.cursor()
     
     # Recent orders
     cur.execute("""
@@ -1209,9 +1720,9 @@ def get_payment_stats():
     conn.close()
     
     return {
-        "total_orders": total_orders,
+        "total_orders": int(counters.get("payments", 0)),
         "by_status": by_status,
-        "total_revenue": revenue,
+        "total_revenue": counters.get("payments.revenue", 0),
         "recent_orders": recent
     }
 
@@ -1288,10 +1799,10 @@ def vacuum_database():
 def get_database_size():
     """Get database file size in MB"""
     
-    import os
+    db_path = _sqlite_path()
     
-    if os.path.exists(Config.DB_URL):
-        size_bytes = os.path.getsize(Config.DB_URL)
+    if os.path.exists(db_path):
+        size_bytes = os.path.getsize(db_path)
         size_mb = size_bytes / (1024 * 1024)
         return round(size_mb, 2)
     
@@ -1333,44 +1844,33 @@ def export_data_to_json(output_file="data_export.json"):
 # MIGRATION HELPER
 # =========================
 
-def migrate_to_postgres(postgres_url):
+def migrate_to_postgres(postgres_url, **options):
     """
     Migrate data from SQLite to PostgreSQL
     
     Args:
         postgres_url: PostgreSQL connection URL
+        **options: tables, reset, recopy, verify, batch_size, workers
+            (see backend.engines.migration_engine)
+    
+    Returns:
+        dict: Migration report (None on failure)
     
     Note: Requires psycopg2 library
     """
     
     try:
-        import psycopg2
-        from psycopg2.extras import Json
-        
-        # Export SQLite data
-        export_data = export_data_to_json("/tmp/migration_export.json")
-        
-        with open(export_data, 'r') as f:
-            data = json.load(f)
-        
-        # Connect to PostgreSQL
-        pg_conn = psycopg2.connect(postgres_url)
-        pg_cur = pg_conn.cursor()
-        
-        # Create tables in PostgreSQL (simplified - adjust as needed)
-        # ... (table creation SQL here)
-        
-        # Insert data
-        for table, rows in data.items():
-            for row in rows:
-                # Convert row to INSERT statement
-                # ... (insertion logic here)
-                pass
+        import psycopg2  # noqa: F401
+        from backend.engines.migration_engine import MigrationEngine
         
-        pg_conn.commit()
-        pg_conn.close()
+        engine = MigrationEngine(
+            _sqlite_path(),
+            postgres_url,
+            batch_size=options.pop("batch_size", None),
+            workers=options.pop("workers", None)
+        )
         
-        logger.info("✅ Migration to PostgreSQL completed")
+        return engine.run(**options)
         
     except ImportError:
         logger.error("❌ psycopg2 not installed. Run: pip install psycopg2-binary")
@@ -0,0 +1,500 @@
+"""
+Ephemeris Engine
+Computes sidereal charts locally, without Prokerala
+
+- Sun, Moon and the five visible planets from mean orbital elements with
+  the main lunar and Jupiter / Saturn perturbation terms (Schlyter's
+  low-precision method, about 1-2 arcminutes, plenty for sign,
+  nakshatra and pada)
+- Rahu / Ketu as the Moon's mean nodes
+- Lahiri or KP (Krishnamurti) ayanamsa
+- Lagna from local sidereal time; whole-sign houses as in the rasi chart
+- Nakshatra / pada, Vimshottari dasha, manglik and a few simple yogas
+
+Everything up to the longitudes is vectorized with NumPy, so a batch of
+thousands of charts costs a handful of array operations:
+
+    charts = compute_charts([(birth_utc, lat, lon), ...], system="LAHIRI")
+
+Charts have the same shape as the Prokerala ones built by astro_engine.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+# =========================
+# CONSTANTS
+# =========================
+
+SIGNS = [
+    "Aries", "Taurus", "Gemini", "Cancer", "Leo", "Virgo",
+    "Libra", "Scorpio", "Sagittarius", "Capricorn", "Aquarius", "Pisces"
+]
+
+NAKSHATRAS = [
+    "Ashwini", "Bharani", "Krittika", "Rohini", "Mrigashira", "Ardra",
+    "Punarvasu", "Pushya", "Ashlesha", "Magha", "Purva Phalguni", "Uttara Phalguni",
+    "Hasta", "Chitra", "Swati", "Vishakha", "Anuradha", "Jyeshtha",
+    "Mula", "Purva Ashadha", "Uttara Ashadha", "Shravana", "Dhanishta", "Shatabhisha",
+    "Purva Bhadrapada", "Uttara Bhadrapada", "Revati"
+]
+
+# Column order of the longitude arrays
+PLANETS = ["Sun", "Moon", "Mars", "Mercury", "Jupiter", "Venus", "Saturn", "Rahu", "Ketu"]
+
+NAKSHATRA_SPAN = 360 / 27
+PADA_SPAN = NAKSHATRA_SPAN / 4
+
+# Ayanamsa at J2000.0 (degrees); both advance with general precession
+AYANAMSA_J2000 = {
+    "LAHIRI": 23.857092,
+    "KP": 23.760856
+}
+
+# General precession in longitude, arcseconds per Julian century
+PRECESSION_RATE = 5029.0966
+PRECESSION_ACCEL = 1.11113
+
+# Days between the Unix epoch and Schlyter's day 0 (1999-12-31 00:00 UT)
+UNIX_TO_DAY0 = 10956.0
+
+# Vimshottari dasha: lords in order with their years
+DASHA_LORDS = ["Ketu", "Venus", "Sun", "Moon", "Mars", "Rahu", "Jupiter", "Saturn", "Mercury"]
+DASHA_YEARS = [7, 20, 6, 10, 7, 18, 16, 19, 17]
+DASHA_TOTAL_YEARS = 120
+YEAR_DAYS = 365.25
+
+MANGLIK_HOUSES = {1, 2, 4, 7, 8, 12}
+KENDRA_OFFSETS = {0, 3, 6, 9}
+
+# Orbital elements: (N, i, w, a, e, M) each as (value at day 0, rate per day)
+ELEMENTS = {
+    "Mercury": ((48.3313, 3.24587e-5), (7.0047, 5.00e-8), (29.1241, 1.01444e-5),
+                (0.387098, 0.0), (0.205635, 5.59e-10), (168.6562, 4.0923344368)),
+    "Venus": ((76.6799, 2.46590e-5), (3.3946, 2.75e-8), (54.8910, 1.38374e-5),
+              (0.723330, 0.0), (0.006773, -1.302e-9), (48.0052, 1.6021302244)),
+    "Mars": ((49.5574, 2.11081e-5), (1.8497, -1.78e-8), (286.5016, 2.92961e-5),
+             (1.523688, 0.0), (0.093405, 2.516e-9), (18.6021, 0.5240207766)),
+    "Jupiter": ((100.4542, 2.76854e-5), (1.3030, -1.557e-7), (273.8777, 1.64505e-5),
+                (5.20256, 0.0), (0.048498, 4.469e-9), (19.8950, 0.0830853001)),
+    "Saturn": ((113.6634, 2.38980e-5), (2.4886, -1.081e-7), (339.3939, 2.97661e-5),
+               (9.55475, 0.0), (0.055546, -9.499e-9), (316.9670, 0.0334442282)),
+}
+
+
+# =========================
+# ORBITS
+# =========================
+
+def _element(pair, d):
+    value, rate = pair
+    return value + rate * d
+
+
+def _kepler(M, e):
+    """Eccentric anomaly (radians) for mean anomaly M (radians)"""
+
+    E = M + e * np.sin(M) * (1.0 + e * np.cos(M))
+
+    for _ in range(5):
+        E = E - (E - e * np.sin(E) - M) / (1.0 - e * np.cos(E))
+
+    return E
+
+
+def _orbit(M_deg, e, a):
+    """(true anomaly in degrees, distance) from mean anomaly"""
+
+    E = _kepler(np.radians(M_deg), e)
+
+    xv = a * (np.cos(E) - e)
+    yv = a * np.sqrt(1.0 - e * e) * np.sin(E)
+
+    return np.degrees(np.arctan2(yv, xv)), np.hypot(xv, yv)
+
+
+def _ecliptic(N, i, w, v, r):
+    """Heliocentric (or geocentric, for the Moon) ecliptic x, y, z"""
+
+    N, i, u = np.radians(N), np.radians(i), np.radians(v + w)
+
+    x = r * (np.cos(N) * np.cos(u) - np.sin(N) * np.sin(u) * np.cos(i))
+    y = r * (np.sin(N) * np.cos(u) + np.cos(N) * np.sin(u) * np.cos(i))
+    z = r * np.sin(u) * np.sin(i)
+
+    return x, y, z
+
+
+def _sind(x):
+    return np.sin(np.radians(x))
+
+
+def _cosd(x):
+    return np.cos(np.radians(x))
+
+
+def _sun(d):
+    w = 282.9404 + 4.70935e-5 * d
+    e = 0.016709 - 1.151e-9 * d
+    M = 356.0470 + 0.9856002585 * d
+
+    v, r = _orbit(M, e, 1.0)
+    lon = v + w
+
+    return lon, r, M, w
+
+
+def _moon(d, Ms, ws):
+    N = 125.1228 - 0.0529538083 * d
+    w = 318.0634 + 0.1643573223 * d
+    M = 115.3654 + 13.0649929509 * d
+
+    v, r = _orbit(M, 0.054900, 60.2666)
+    x, y, _ = _ecliptic(N, 5.1454, w, v, r)
+
+    lon = np.degrees(np.arctan2(y, x))
+
+    # Largest perturbations (evection, variation, yearly equation, ...)
+    Ls = Ms + ws
+    Lm = M + w + N
+    D = Lm - Ls
+    F = Lm - N
+
+    lon = lon + (
+        -1.274 * _sind(M - 2 * D)
+        + 0.658 * _sind(2 * D)
+        - 0.186 * _sind(Ms)
+        - 0.059 * _sind(2 * M - 2 * D)
+        - 0.057 * _sind(M - 2 * D + Ms)
+        + 0.053 * _sind(M + 2 * D)
+        + 0.046 * _sind(2 * D - Ms)
+        + 0.041 * _sind(M - Ms)
+        - 0.035 * _sind(D)
+        - 0.031 * _sind(M + Ms)
+        - 0.015 * _sind(2 * F - 2 * D)
+        + 0.011 * _sind(M - 4 * D)
+    )
+
+    return lon, N
+
+
+def _planets(d, sun_lon, sun_r):
+    """Geocentric tropical longitudes of Mercury..Saturn"""
+
+    xs = sun_r * _cosd(sun_lon)
+    ys = sun_r * _sind(sun_lon)
+
+    Mj = _element(ELEMENTS["Jupiter"][5], d)
+    Msat = _element(ELEMENTS["Saturn"][5], d)
+
+    result = {}
+
+    for name, (N, i, w, a, e, M) in ELEMENTS.items():
+        N, i, w, e, M = (_element(p, d) for p in (N, i, w, e, M))
+
+        v, r = _orbit(M, e, a[0])
+        x, y, z = _ecliptic(N, i, w, v, r)
+
+        if name in ("Jupiter", "Saturn"):
+            lon = np.degrees(np.arctan2(y, x))
+            lat = np.arctan2(z, np.hypot(x, y))
+
+            # Great inequality and friends
+            if name == "Jupiter":
+                lon = lon + (
+                    -0.332 * _sind(2 * Mj - 5 * Msat - 67.6)
+                    - 0.056 * _sind(2 * Mj - 2 * Msat + 21)
+                    + 0.042 * _sind(3 * Mj - 5 * Msat + 21)
+                    - 0.036 * _sind(Mj - 2 * Msat)
+                    + 0.022 * _cosd(Mj - Msat)
+                    + 0.023 * _sind(2 * Mj - 3 * Msat + 52)
+                    - 0.016 * _sind(Mj - 5 * Msat - 69)
+                )
+            else:
+                lon = lon + (
+                    0.812 * _sind(2 * Mj - 5 * Msat - 67.6)
+                    - 0.229 * _cosd(2 * Mj - 4 * Msat - 2)
+                    + 0.119 * _sind(Mj - 2 * Msat - 3)
+                    + 0.046 * _sind(2 * Mj - 6 * Msat - 69)
+                    + 0.014 * _sind(Mj - 3 * Msat + 32)
+                )
+
+            x = r * np.cos(lat) * _cosd(lon)
+            y = r * np.cos(lat) * _sind(lon)
+
+        result[name] = np.degrees(np.arctan2(y + ys, x + xs))
+
+    return result
+
+
+# =========================
+# VECTORIZED CORE
+# =========================
+
+def ayanamsa(d, system="LAHIRI"):
+    """Ayanamsa in degrees for Schlyter day numbers `d`"""
+
+    base = AYANAMSA_J2000.get(system, AYANAMSA_J2000["LAHIRI"])
+
+    # Julian centuries from J2000.0 (day 1.5)
+    T = (np.asarray(d, dtype=float) - 1.5) / 36525.0
+
+    return base + (PRECESSION_RATE * T + PRECESSION_ACCEL * T * T) / 3600.0
+
+
+def _ascendant(d, lat, lon):
+    """Tropical ascendant for geographic latitude / east longitude"""
+
+    T = (d - 1.5) / 36525.0
+
+    gmst = 280.46061837 + 360.98564736629 * (d - 1.5) + 0.000387933 * T * T
+    ramc = np.radians(gmst + lon)
+
+    obliquity = np.radians(23.4393 - 3.563e-7 * d)
+    phi = np.radians(lat)
+
+    return np.degrees(np.arctan2(
+        np.cos(ramc),
+        -(np.sin(ramc) * np.cos(obliquity) + np.tan(phi) * np.sin(obliquity))
+    ))
+
+
+def compute_longitudes(timestamps, lats, lons, system="LAHIRI"):
+    """
+    Sidereal longitudes for a batch of births
+
+    Args:
+        timestamps: Birth instants as Unix seconds (UTC), array-like (N,)
+        lats: Latitudes, array-like (N,)
+        lons: East longitudes, array-like (N,)
+        system: "LAHIRI" or "KP"
+
+    Returns:
+        tuple: (planets (N, 9) in PLANETS order, ascendant (N,)), degrees
+               in [0, 360)
+    """
+
+    d = np.asarray(timestamps, dtype=float) / 86400.0 - UNIX_TO_DAY0
+    lats = np.asarray(lats, dtype=float)
+    lons = np.asarray(lons, dtype=float)
+
+    sun_lon, sun_r, Ms, ws = _sun(d)
+    moon_lon, node = _moon(d, Ms, ws)
+    planets = _planets(d, sun_lon, sun_r)
+
+    tropical = np.stack([
+        sun_lon,
+        moon_lon,
+        planets["Mars"],
+        planets["Mercury"],
+        planets["Jupiter"],
+        planets["Venus"],
+        planets["Saturn"],
+        node,
+        node + 180.0
+    ], axis=-1)
+
+    shift = ayanamsa(d, system)
+
+    sidereal = np.mod(tropical - shift[..., None], 360.0)
+    ascendant = np.mod(_ascendant(d, lats, lons) - shift, 360.0)
+
+    return sidereal, ascendant
+
+
+# =========================
+# CHART ASSEMBLY
+# =========================
+
+def vimshottari(moon_longitude, birth, now=None):
+    """
+    Vimshottari dasha at `now`
+
+    Returns:
+        dict: {"current": mahadasha, "upcoming": next 3 antardashas}, each
+              period {"planet", "start", "end"} with ISO dates
+    """
+
+    now = now or datetime.now(timezone.utc)
+
+    index = int(moon_longitude // NAKSHATRA_SPAN) % 27
+    lord = index % 9
+    elapsed = (moon_longitude % NAKSHATRA_SPAN) / NAKSHATRA_SPAN
+
+    # The first mahadasha started before birth by the part already run
+    start = birth - timedelta(days=elapsed * DASHA_YEARS[lord] * YEAR_DAYS)
+    end = start + timedelta(days=DASHA_YEARS[lord] * YEAR_DAYS)
+
+    while end <= now:
+        lord = (lord + 1) % 9
+        start, end = end, end + timedelta(days=DASHA_YEARS[lord] * YEAR_DAYS)
+
+    upcoming = []
+    sub_start = start
+
+    # Antardashas of the current mahadasha that have not ended yet
+    for step in range(18):
+        sub = (lord + step) % 9
+        sub_end = sub_start + timedelta(
+            days=DASHA_YEARS[lord] * DASHA_YEARS[sub] / DASHA_TOTAL_YEARS * YEAR_DAYS
+        )
+
+        if sub_end > now:
+            upcoming.append({
+                "planet": DASHA_LORDS[sub],
+                "start": sub_start.date().isoformat(),
+                "end": sub_end.date().isoformat()
+            })
+
+            if len(upcoming) == 4:
+                break
+
+        sub_start = sub_end
+
+    return {
+        "current": {
+            "planet": DASHA_LORDS[lord],
+            "start": start.date().isoformat(),
+            "end": end.date().isoformat()
+        },
+        # The running antardasha is upcoming[0]
+        "upcoming": upcoming[1:4]
+    }
+
+
+def _yogas(sign_of):
+    yogas = []
+
+    if (sign_of["Jupiter"] - sign_of["Moon"]) % 12 in KENDRA_OFFSETS:
+        yogas.append({
+            "name": "Gajakesari Yoga",
+            "description": "Jupiter in a kendra from the Moon"
+        })
+
+    if sign_of["Sun"] == sign_of["Mercury"]:
+        yogas.append({
+            "name": "Budhaditya Yoga",
+            "description": "Sun and Mercury in the same sign"
+        })
+
+    if (sign_of["Moon"] - sign_of["Mars"]) % 12 == 0:
+        yogas.append({
+            "name": "Chandra Mangala Yoga",
+            "description": "Moon and Mars in the same sign"
+        })
+
+    return yogas
+
+
+def _chart(row, signs, naks, padas, lagna_index, birth, now):
+    sign_of = dict(zip(PLANETS, signs.tolist()))
+    planets = []
+
+    for n, name in enumerate(PLANETS):
+        planets.append({
+            "name": name,
+            "sign": SIGNS[signs[n]],
+            "house": int((signs[n] - lagna_index) % 12) + 1,
+            "degree": round(float(row[n] % 30), 2),
+            "nakshatra": NAKSHATRAS[naks[n]]
+        })
+
+    moon = PLANETS.index("Moon")
+    dasha = vimshottari(float(row[moon]), birth, now)
+
+    mars_house = (sign_of["Mars"] - lagna_index) % 12 + 1
+
+    return {
+        "lagna": SIGNS[lagna_index],
+        "moon_sign": SIGNS[sign_of["Moon"]],
+        "sun_sign": SIGNS[sign_of["Sun"]],
+        "current_dasha": dasha["current"]["planet"],
+        "planets": planets,
+        "dasha_timeline": dasha,
+        "nakshatra": NAKSHATRAS[naks[moon]],
+        "pada": int(padas[moon]),
+        "moon_rasi": SIGNS[sign_of["Moon"]],
+        "sun_rasi": SIGNS[sign_of["Sun"]],
+        "yogas": _yogas(sign_of),
+        "manglik": mars_house in MANGLIK_HOUSES
+    }
+
+
+def compute_charts(births, system="LAHIRI", now=None):
+    """
+    Charts for a batch of births
+
+    Args:
+        births: Iterable of (birth datetime, lat, lon); naive datetimes
+                are taken as UTC
+        system: "LAHIRI" or "KP"
+        now: Reference instant for the running dasha (default: now)
+
+    Returns:
+        list: Charts ({"lagna", "moon_sign", "sun_sign", "current_dasha",
+              "planets", "dasha_timeline", "nakshatra", "pada",
+              "moon_rasi", "sun_rasi", "yogas", "manglik"})
+    """
+
+    births = [
+        (b if b.tzinfo else b.replace(tzinfo=timezone.utc), lat, lon)
+        for b, lat, lon in births
+    ]
+
+    if not births:
+        return []
+
+    now = now or datetime.now(timezone.utc)
+
+    timestamps = [b.timestamp() for b, _, _ in births]
+    lats = [lat for _, lat, _ in births]
+    lons = [lon for _, _, lon in births]
+
+    longitudes, ascendants = compute_longitudes(timestamps, lats, lons, system)
+
+    # Sign / nakshatra / pada indexes for the whole batch at once
+    signs = (longitudes // 30).astype(int) % 12
+    naks = (longitudes // NAKSHATRA_SPAN).astype(int) % 27
+    padas = ((longitudes % NAKSHATRA_SPAN) // PADA_SPAN).astype(int) + 1
+    lagnas = (ascendants // 30).astype(int) % 12
+
+    return [
+        _chart(longitudes[n], signs[n], naks[n], padas[n], int(lagnas[n]), births[n][0], now)
+        for n in range(len(births))
+    ]
+
+
+def compute_chart(birth, lat, lon, system="LAHIRI", now=None):
+    """Chart for a single birth (see compute_charts)"""
+
+    return compute_charts([(birth, lat, lon)], system, now)[0]
+
+
+def compare_charts(local, remote):
+    """
+    Differences between a local chart and a Prokerala one
+
+    Returns:
+        list: Human-readable mismatches (empty if they agree)
+    """
+
+    mismatches = []
+
+    for field in ("lagna", "moon_sign", "sun_sign", "nakshatra"):
+        if remote.get(field) and local.get(field) != remote.get(field):
+            mismatches.append(f"{field}: {local.get(field)} != {remote.get(field)}")
+
+    remote_planets = {p.get("name"): p for p in remote.get("planets", [])}
+
+    for planet in local.get("planets", []):
+        other = remote_planets.get(planet["name"])
+
+        if other and other.get("sign") and other.get("sign") != planet["sign"]:
+            mismatches.append(f"{planet['name']}: {planet['sign']} != {other.get('sign')}")
+
+    return mismatches
@@ -14,11 +14,19 @@ from backend.engines.db_engine import (
     get_session, save_session, clear_session, get_or_create_user,
     log_message, log_question, grant_qna_pack, use_qna_credit,
     get_qna_credits, mark_kundali_purchased, has_kundali_access,
-    mark_milan_purchased, has_milan_access
+    mark_milan_purchased, has_milan_access, log_api_usage
 )
 
-from backend.engines.astro_engine import get_kundali_cached
+from backend.config import Config
+from backend.utils.resilience import upstream_available, UpstreamUnavailable
+from backend.engines.astro_engine import get_kundali_cached, peek_kundali
+from backend.engines.chart_engine import attach_chart, resolve_chart
+from backend.engines.kundali_job_engine import (
+    PENDING_STEP, CHART_FIELDS, chart_person, start_chart_job, pending_reply, is_stale
+)
 from backend.engines.ai_engine import ask_ai
+from backend.engines.ai_stream_engine import get_ai_executor, submit_question
+from backend.engines.answer_cache_engine import get_cached_answer
 from backend.engines.payment_engine import create_order, check_payment_status
 from backend.engines.milan_engine import calculate_gun_milan, format_milan_report
 
@@ -212,6 +220,80 @@ def reset(phone):
     save_session(phone, "MENU", {"lang": "EN", "preview_used": False})
 
 
+# =========================
+# CHART STEPS
+# =========================
+
+def complete_chart(data, field, chart, busy=False):
+    """
+    Next step and reply once the chart for a place step is known
+    
+    Shared by the inline path and the deferred chart job.
+    
+    Args:
+        data: Session data (modified in place)
+        field: "kundali", "boy_kundali" or "girl_kundali"
+        chart: Computed chart, or None if it could not be computed
+        busy: Prokerala rejected the call (not a bad birthplace)
+    
+    Returns:
+        tuple: (next_step, reply)
+    """
+    lang = data.get("lang", "EN")
+    
+    if busy:
+        retry_step = CHART_FIELDS[field][1]
+        return retry_step, ERROR_MESSAGES["CHART_BUSY"].get(lang, ERROR_MESSAGES["CHART_BUSY"]["EN"])
+    
+    if not chart:
+        retry_step = CHART_FIELDS[field][1]
+        return retry_step, ERROR_MESSAGES["PLACE_NOT_FOUND"].get(lang, ERROR_MESSAGES["PLACE_NOT_FOUND"]["EN"]) + "\n\n" + PROMPTS["ASK_PLACE"].get(lang, PROMPTS["ASK_PLACE"]["EN"])
+    
+    attach_chart(data, chart, field)
+    
+    if field == "boy_kundali":
+        # Now collect girl's details
+        progress = get_progress_bar("ASK_NAME", lang, "GIRL")
+        return "MILAN_GIRL_NAME", "✅ Boy's details saved!\n\n" + progress + PROMPTS["ASK_NAME"].get(lang, PROMPTS["ASK_NAME"]["EN"])
+    
+    if field == "girl_kundali":
+        # Show both confirmations
+        boy_confirm = format_confirmation_details(data, lang, "BOY")
+        girl_confirm = format_confirmation_details(data, lang, "GIRL")
+        
+        return "MILAN_CONFIRM", f"👦 *Boy's Details:*\n{boy_confirm}\n\n👧 *Girl's Details:*\n{girl_confirm}"
+    
+    return "CONFIRM_DETAILS", format_confirmation_details(data, lang)
+
+
+def resolve_chart_step(phone, data, field):
+    """
+    Attach the chart for a place step
+    
+    Cached charts are attached inline. Otherwise (with KUNDALI_ASYNC) the
+    chart is computed by a background job and the result pushed to the
+    user, so the webhook never waits on geocoding / Prokerala.
+    """
+    person = chart_person(phone, data, field)
+    chart = peek_kundali(person)
+    
+    if chart is None:
+        if Config.KUNDALI_ASYNC:
+            return start_chart_job(phone, data, field)
+        
+        try:
+            chart = get_kundali_cached(person)
+        except UpstreamUnavailable:
+            next_step, reply = complete_chart(data, field, None, busy=True)
+            save_session(phone, next_step, data)
+            return reply
+    
+    next_step, reply = complete_chart(data, field, chart)
+    save_session(phone, next_step, data)
+    
+    return reply
+
+
 # =========================
 # MAIN FSM PROCESSOR
 # =========================
@@ -241,6 +323,15 @@ def process_message(phone, msg):
         if response:
             return response
     
+    # ================= CHART BEING CALCULATED =================
+    
+    if step == PENDING_STEP:
+        # Job lost (worker restart) - schedule it again
+        if is_stale(data):
+            return start_chart_job(phone, data, data["pending_job"]["field"])
+        
+        return pending_reply(data)
+    
     # ================= MENU =================
     
     if step == "MENU":
@@ -345,16 +436,7 @@ def process_message(phone, msg):
         data["place"] = msg
         
         logger.info(f"🔮 Generating kundali for {phone}: {msg}")
-        kundali = get_kundali_cached(data)
-        
-        if not kundali:
-            return ERROR_MESSAGES["PLACE_NOT_FOUND"].get(lang, ERROR_MESSAGES["PLACE_NOT_FOUND"]["EN"]) + "\n\n" + PROMPTS["ASK_PLACE"].get(lang, PROMPTS["ASK_PLACE"]["EN"])
-        
-        data["kundali"] = kundali
-        save_session(phone, "CONFIRM_DETAILS", data)
-        
-        confirmation = format_confirmation_details(data, lang)
-        return confirmation
+        return resolve_chart_step(phone, data, "kundali")
     
     # ================= MILAN: BOY'S DETAILS =================
     
@@ -396,26 +478,7 @@ def process_message(phone, msg):
         data["boy_place"] = msg
         
         # Generate boy's kundali
-        boy_data = {
-            "name": data["boy_name"],
-            "dob": data["boy_dob"],
-            "time": data["boy_time"],
-            "place": data["boy_place"],
-            "astro_system": data.get("astro_system", "LAHIRI")
-        }
-        
-        boy_kundali = get_kundali_cached(boy_data)
-        
-        if not boy_kundali:
-            return ERROR_MESSAGES["PLACE_NOT_FOUND"].get(lang, ERROR_MESSAGES["PLACE_NOT_FOUND"]["EN"])
-        
-        data["boy_kundali"] = boy_kundali
-        
-        # Now collect girl's details
-        save_session(phone, "MILAN_GIRL_NAME", data)
-        
-        progress = get_progress_bar("ASK_NAME", lang, "GIRL")
-        return "✅ Boy's details saved!\n\n" + progress + PROMPTS["ASK_NAME"].get(lang, PROMPTS["ASK_NAME"]["EN"])
+        return resolve_chart_step(phone, data, "boy_kundali")
     
     # ================= MILAN: GIRL'S DETAILS =================
     
@@ -457,28 +520,7 @@ def process_message(phone, msg):
         data["girl_place"] = msg
         
         # Generate girl's kundali
-        girl_data = {
-            "name": data["girl_name"],
-            "dob": data["girl_dob"],
-            "time": data["girl_time"],
-            "place": data["girl_place"],
-            "astro_system": data.get("astro_system", "LAHIRI")
-        }
-        
-        girl_kundali = get_kundali_cached(girl_data)
-        
-        if not girl_kundali:
-            return ERROR_MESSAGES["PLACE_NOT_FOUND"].get(lang, ERROR_MESSAGES["PLACE_NOT_FOUND"]["EN"])
-        
-        data["girl_kundali"] = girl_kundali
-        
-        # Show both confirmations
-        save_session(phone, "MILAN_CONFIRM", data)
-        
-        boy_confirm = format_confirmation_details(data, lang, "BOY")
-        girl_confirm = format_confirmation_details(data, lang, "GIRL")
-        
-        return f"👦 *Boy's Details:*\n{boy_confirm}\n\n👧 *Girl's Details:*\n{girl_confirm}"
+        return resolve_chart_step(phone, data, "girl_kundali")
     
     # ================= MILAN CONFIRMATION =================
     
@@ -488,7 +530,10 @@ def process_message(phone, msg):
             # Check if already purchased
             if has_milan_access(phone):
                 # Calculate Gun Milan
-                milan_result = calculate_gun_milan(data["boy_kundali"], data["girl_kundali"])
+                milan_result = calculate_gun_milan(
+                    resolve_chart(data, "boy_kundali"),
+                    resolve_chart(data, "girl_kundali")
+                )
                 
                 if milan_result:
                     report = format_milan_report(milan_result, lang)
@@ -561,7 +606,10 @@ def process_message(phone, msg):
             mark_milan_purchased(phone)
             
             # Calculate Gun Milan
-            milan_result = calculate_gun_milan(data["boy_kundali"], data["girl_kundali"])
+            milan_result = calculate_gun_milan(
+                resolve_chart(data, "boy_kundali"),
+                resolve_chart(data, "girl_kundali")
+            )
             
             if milan_result:
                 report = format_milan_report(milan_result, lang)
@@ -587,17 +635,52 @@ def process_message(phone, msg):
                     return ERROR_MESSAGES["PAYMENT_SYSTEM_ERROR"].get(lang, ERROR_MESSAGES["PAYMENT_SYSTEM_ERROR"]["EN"])
                 return PAYMENT_MENU.get(lang, PAYMENT_MENU["EN"]).format(link=order_link)
         
-        use_qna_credit(phone)
-        remaining = credits - 1
+        # Streamed answers are looked up here so a cached one goes out
+        # inline; the synchronous path checks inside ask_ai
+        cached = get_cached_answer(msg, data) if Config.AI_STREAMING else None
+        
+        # OpenAI down: answer right away and keep the credit
+        if not cached and not upstream_available("openai"):
+            return ERROR_MESSAGES["AI_BUSY"].get(lang, ERROR_MESSAGES["AI_BUSY"]["EN"]) + "\n\n" + QNA_MENU["CONTINUE"].get(lang, QNA_MENU["CONTINUE"]["EN"])
+        
+        if Config.AI_STREAMING and not cached:
+            rejected = get_ai_executor().accepts(phone)
+            
+            if rejected == "user":
+                return ERROR_MESSAGES["AI_IN_PROGRESS"].get(lang, ERROR_MESSAGES["AI_IN_PROGRESS"]["EN"])
+            
+            if rejected:
+                return ERROR_MESSAGES["AI_BUSY"].get(lang, ERROR_MESSAGES["AI_BUSY"]["EN"]) + "\n\n" + QNA_MENU["CONTINUE"].get(lang, QNA_MENU["CONTINUE"]["EN"])
+        
+        # A parallel question may have spent the last credit meanwhile
+        if not use_qna_credit(phone):
+            order_link = create_order(phone, "QNA")
+            if not order_link:
+                return ERROR_MESSAGES["PAYMENT_SYSTEM_ERROR"].get(lang, ERROR_MESSAGES["PAYMENT_SYSTEM_ERROR"]["EN"])
+            return PAYMENT_MENU.get(lang, PAYMENT_MENU["EN"]).format(link=order_link)
+        
+        remaining = get_qna_credits(phone)
         
         log_question(phone, msg)
         
+        credits_text = QNA_MENU["REMAINING"].get(lang, QNA_MENU["REMAINING"]["EN"]).format(remaining=remaining)
+        footer = credits_text + "\n\n" + QNA_MENU["CONTINUE"].get(lang, QNA_MENU["CONTINUE"]["EN"])
+        
+        if cached:
+            log_api_usage(phone, "OPENAI_CACHE", 0)
+            return cached + "\n\n" + footer
+        
+        if Config.AI_STREAMING:
+            # Answer is generated off the web thread and pushed in parts
+            logger.info(f"🤖 Queueing Q&A for {phone}")
+            submit_question(phone, msg, data, footer)
+            
+            return QNA_MENU["THINKING"].get(lang, QNA_MENU["THINKING"]["EN"])
+        
         logger.info(f"🤖 Processing Q&A for {phone}")
         answer = ask_ai(phone, msg, data)
         
-        credits_text = QNA_MENU["REMAINING"].get(lang, QNA_MENU["REMAINING"]["EN"]).format(remaining=remaining)
-        
-        return answer + "\n\n" + credits_text + "\n\n" + QNA_MENU["CONTINUE"].get(lang, QNA_MENU["CONTINUE"]["EN"])
+        return answer + "\n\n" + footer
     
     # ================= FALLBACK =================
     
@@ -0,0 +1,217 @@
+"""
+Deferred Kundali Engine
+Moves chart computation out of the Twilio webhook
+
+When a birthplace arrives and the chart is not cached yet, the FSM parks
+the session in KUNDALI_PENDING and answers right away. The chart is then
+computed by a background job:
+
+1. The job is enqueued only after the webhook's unit of work commits, so
+   it never sees (or races) an uncommitted pending session
+2. It computes the chart (geocoding + Prokerala, coalesced per chart)
+3. It advances the session with compare-and-set - if the user restarted
+   or moved on meanwhile, the result is dropped instead of clobbering
+   the newer state
+4. It pushes the next message through the Twilio REST API
+
+Jobs run on the in-process worker queue (KUNDALI_JOB_BACKEND="thread")
+or on Celery ("celery").
+"""
+
+import time
+import uuid
+import json
+import logging
+
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+PENDING_STEP = "KUNDALI_PENDING"
+
+# Session field -> (prefix of the birth details in session data, step to
+# return to if the chart can't be computed)
+CHART_FIELDS = {
+    "kundali": ("", "ASK_PLACE"),
+    "boy_kundali": ("boy_", "MILAN_BOY_PLACE"),
+    "girl_kundali": ("girl_", "MILAN_GIRL_PLACE"),
+}
+
+# Attempts to advance the session when it changes under us
+CAS_ATTEMPTS = 3
+
+
+# =========================
+# JOB SETUP
+# =========================
+
+def chart_person(phone, data, field):
+    """Birth details for the chart stored under `field`"""
+
+    prefix, _ = CHART_FIELDS[field]
+
+    return {
+        "phone": phone,
+        "name": data.get(f"{prefix}name"),
+        "dob": data.get(f"{prefix}dob"),
+        "time": data.get(f"{prefix}time"),
+        "place": data.get(f"{prefix}place"),
+        "astro_system": data.get("astro_system", "LAHIRI")
+    }
+
+
+def start_chart_job(phone, data, field):
+    """
+    Park the session in KUNDALI_PENDING and schedule the chart
+
+    Must be called from the FSM inside the webhook's unit of work; the
+    session is saved here.
+
+    Returns:
+        str: Immediate reply for the webhook
+    """
+
+    from backend.engines.db_engine import save_session, current_unit_of_work
+
+    job = {
+        "job_id": uuid.uuid4().hex,
+        "phone": phone,
+        "field": field,
+        "person": chart_person(phone, data, field)
+    }
+
+    data["pending_job"] = {
+        "job_id": job["job_id"],
+        "field": field,
+        "started_at": time.time()
+    }
+
+    save_session(phone, PENDING_STEP, data)
+
+    uow = current_unit_of_work()
+
+    if uow is not None:
+        # Dropped with the rest of the request if it rolls back
+        uow.on_commit(lambda: enqueue_chart_job(job))
+    else:
+        enqueue_chart_job(job)
+
+    logger.info(f"⏳ Chart deferred for {phone} ({field}, job {job['job_id']})")
+
+    return pending_reply(data)
+
+
+def pending_reply(data):
+    from backend.utils.text_content import LOADING_MESSAGES
+
+    lang = data.get("lang", "EN")
+
+    return "\n".join(LOADING_MESSAGES.get(lang, LOADING_MESSAGES["EN"]))
+
+
+def is_stale(data):
+    """True if the pending job has run past KUNDALI_JOB_TIMEOUT_SECONDS"""
+
+    pending = data.get("pending_job") or {}
+
+    return time.time() - pending.get("started_at", 0) > Config.KUNDALI_JOB_TIMEOUT_SECONDS
+
+
+def enqueue_chart_job(job):
+    """Hand a job to the configured backend"""
+
+    if Config.KUNDALI_JOB_BACKEND == "celery":
+        try:
+            from worker.kundali import generate_chart
+
+            generate_chart.delay(job)
+            return
+        except Exception as e:
+            logger.warning(f"⚠️ Celery unavailable, running chart job in-process: {e}")
+
+    from worker.worker import enqueue_chart
+
+    if enqueue_chart(job) is None:
+        # Session stays pending; is_stale() lets the user retry
+        logger.error(f"❌ Chart job {job['job_id']} could not be queued")
+
+
+# =========================
+# JOB EXECUTION
+# =========================
+
+def run_chart_job(job):
+    """
+    Compute the chart, advance the session and push the reply
+
+    Returns:
+        bool: True if the user was sent the result
+    """
+
+    from backend.engines.astro_engine import get_kundali_cached
+    from backend.engines.fsm_engine import complete_chart
+    from backend.engines.session_engine import load_session_snapshot, compare_and_store_session
+    from backend.utils.resilience import UpstreamUnavailable
+
+    phone = job["phone"]
+    started = time.monotonic()
+    busy = False
+
+    try:
+        chart = get_kundali_cached(job["person"])
+    except UpstreamUnavailable as e:
+        logger.warning(f"🔌 Chart job {job['job_id']} rejected: {e}")
+        chart, busy = None, True
+    except Exception:
+        logger.exception(f"❌ Chart job {job['job_id']} failed")
+        chart = None
+
+    for _ in range(CAS_ATTEMPTS):
+        snapshot = load_session_snapshot(phone)
+
+        if snapshot is None:
+            logger.info(f"🗑️ Session gone, chart job {job['job_id']} dropped")
+            return False
+
+        step, data_json = snapshot
+        data = json.loads(data_json)
+        pending = data.get("pending_job") or {}
+
+        if step != PENDING_STEP or pending.get("job_id") != job["job_id"]:
+            logger.info(f"↩️ Session moved on, chart job {job['job_id']} dropped")
+            return False
+
+        data.pop("pending_job")
+        next_step, reply = complete_chart(data, job["field"], chart, busy)
+
+        if compare_and_store_session(phone, snapshot, next_step, data):
+            break
+    else:
+        logger.warning(f"⚠️ Could not advance session for chart job {job['job_id']}")
+        return False
+
+    duration = time.monotonic() - started
+    logger.info(f"✅ Chart job {job['job_id']} done in {duration:.1f}s → {next_step}")
+
+    return push_message(phone, reply)
+
+
+def push_message(phone, text):
+    """Send a WhatsApp message outside the webhook reply"""
+
+    from backend.services.http_client import get_twilio_client
+
+    to_number = phone if phone.startswith("whatsapp:") else f"whatsapp:{phone}"
+
+    try:
+        get_twilio_client().messages.create(
+            from_=Config.TWILIO_WHATSAPP_NUMBER,
+            to=to_number,
+            body=text[:1600]
+        )
+        return True
+
+    except Exception as e:
+        logger.error(f"❌ Push to {phone} failed: {e}")
+        return False
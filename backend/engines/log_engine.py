@@ -0,0 +1,335 @@
+"""
+Write-behind Log Sink
+Buffers message, question and API-usage log rows in memory and writes
+them to SQLite in batches from a background flusher thread.
+
+Features:
+- Bounded in-memory ring buffer (one per process)
+- Size-based and time-based flush triggers
+- executemany() per table, one transaction per batch
+- Backpressure: producers wait briefly when the buffer is full, then drop
+- Failed flushes (e.g. SQLITE_BUSY) retried with backoff before a batch
+  is counted as dropped
+- Guaranteed flush on interpreter shutdown
+- Counters for submitted / flushed / dropped / lagging records
+"""
+
+import os
+import time
+import atexit
+import logging
+import threading
+from collections import deque
+
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+# =========================
+# SUPPORTED TABLES
+# =========================
+
+LOG_TABLES = {
+    "message_logs": """
+        INSERT INTO message_logs(phone, message, created_at)
+        VALUES (?, ?, ?)
+    """,
+    "questions_log": """
+        INSERT INTO questions_log(phone, question, created_at)
+        VALUES (?, ?, ?)
+    """,
+    "api_usage": """
+        INSERT INTO api_usage(phone, api_name, cost, created_at)
+        VALUES (?, ?, ?, ?)
+    """
+}
+
+
+def utc_timestamp():
+    """Current time in the same format SQLite uses for CURRENT_TIMESTAMP"""
+
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+
+
+# =========================
+# LOG SINK
+# =========================
+
+class LogSink:
+    """
+    Buffered, write-behind sink for append-only log tables
+
+    Rows are timestamped when submitted, so batching never changes the
+    recorded created_at. Rows are not part of the request's unit of work:
+    they are written even if the request itself rolls back.
+    """
+
+    def __init__(
+        self,
+        conn_factory,
+        capacity=10000,
+        batch_size=500,
+        flush_interval=1.0,
+        block_timeout=0.05,
+        lag_warning=5.0,
+        retries=3,
+        retry_backoff=0.1
+    ):
+        self._conn_factory = conn_factory
+        self.capacity = capacity
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.block_timeout = block_timeout
+        self.lag_warning = lag_warning
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._buffer = deque()
+        self._thread = None
+        self._pid = None
+        self._stopping = False
+
+        self._stats = {
+            "submitted": 0,
+            "flushed": 0,
+            "dropped": 0,
+            "blocked": 0,
+            "lagging": 0,
+            "batches": 0,
+            "flush_errors": 0,
+            "flush_retries": 0,
+            "last_lag_ms": 0.0,
+            "max_lag_ms": 0.0
+        }
+
+        atexit.register(self.shutdown)
+
+    # ---------- PRODUCER SIDE ----------
+
+    def submit(self, table, row):
+        """
+        Queue one row for a log table
+
+        Args:
+            table: One of LOG_TABLES
+            row: Column values (created_at last)
+
+        Returns:
+            bool: False if the row was dropped because the buffer stayed full
+        """
+
+        if table not in LOG_TABLES:
+            raise ValueError(f"Unsupported log table: {table}")
+
+        with self._cond:
+            self._ensure_flusher()
+            self._stats["submitted"] += 1
+
+            if len(self._buffer) >= self.capacity:
+                self._stats["blocked"] += 1
+                self._cond.notify_all()
+
+                deadline = time.monotonic() + self.block_timeout
+
+                while len(self._buffer) >= self.capacity:
+                    remaining = deadline - time.monotonic()
+
+                    if remaining <= 0:
+                        self._stats["dropped"] += 1
+
+                        # Don't flood the app log while saturated
+                        if self._stats["dropped"] % 1000 == 1:
+                            logger.warning(f"⚠️ Log sink full, dropping rows ({self._stats['dropped']} so far)")
+
+                        return False
+
+                    self._cond.wait(remaining)
+
+            self._buffer.append((time.monotonic(), table, row))
+
+            if len(self._buffer) >= self.batch_size:
+                self._cond.notify_all()
+
+        return True
+
+    def _ensure_flusher(self):
+        # Called with self._cond held
+        pid = os.getpid()
+
+        if self._pid != pid:
+            # Forked child: the parent owns (and will flush) the inherited rows
+            self._buffer.clear()
+            self._thread = None
+            self._pid = pid
+
+        if self._thread is None and not self._stopping:
+            self._thread = threading.Thread(
+                target=self._run,
+                name="log-sink-flusher",
+                daemon=True
+            )
+            self._thread.start()
+
+    # ---------- FLUSHER SIDE ----------
+
+    def _run(self):
+        logger.info("⚙️ Log sink flusher started")
+
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._buffer) < self.batch_size:
+                    self._cond.wait(self.flush_interval)
+
+                batch = self._drain()
+                stopping = self._stopping
+
+            if batch:
+                self._write(batch)
+
+            if stopping:
+                break
+
+    def _drain(self):
+        # Called with self._cond held
+        batch = list(self._buffer)
+        self._buffer.clear()
+
+        # Wake producers waiting on a full buffer
+        self._cond.notify_all()
+
+        return batch
+
+    def _write(self, batch):
+        now = time.monotonic()
+        lag = now - batch[0][0]
+
+        grouped = {}
+        lagging = 0
+
+        for enqueued_at, table, row in batch:
+            grouped.setdefault(table, []).append(row)
+
+            if now - enqueued_at > self.lag_warning:
+                lagging += 1
+
+        flushed, dropped, failed, retried = 0, len(batch), True, 0
+
+        with self._write_lock:
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    # Writer contention is usually gone within a second
+                    time.sleep(self.retry_backoff * (2 ** (attempt - 1)))
+                    retried += 1
+
+                try:
+                    self._insert(grouped)
+                except Exception as e:
+                    if attempt < self.retries:
+                        logger.warning(f"⚠️ Log sink flush failed ({len(batch)} rows), retrying: {e}")
+                    else:
+                        logger.error(f"❌ Log sink flush failed ({len(batch)} rows), dropping: {e}")
+                    continue
+
+                flushed, dropped, failed = len(batch), 0, False
+                break
+
+        with self._cond:
+            self._stats["flushed"] += flushed
+            self._stats["dropped"] += dropped
+            self._stats["lagging"] += lagging
+            self._stats["batches"] += 1
+            self._stats["last_lag_ms"] = round(lag * 1000, 2)
+            self._stats["max_lag_ms"] = max(self._stats["max_lag_ms"], round(lag * 1000, 2))
+
+            self._stats["flush_retries"] += retried
+
+            if failed:
+                self._stats["flush_errors"] += 1
+
+    def _insert(self, grouped):
+        # One transaction for the whole batch; rolled back if it fails
+        conn = self._conn_factory()
+
+        try:
+            for table, rows in grouped.items():
+                conn.executemany(LOG_TABLES[table], rows)
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    # ---------- CONTROL ----------
+
+    def flush(self):
+        """Synchronously write everything buffered so far"""
+
+        with self._cond:
+            batch = self._drain()
+
+        if batch:
+            self._write(batch)
+
+    def shutdown(self, timeout=5.0):
+        """Stop the flusher and write any remaining rows"""
+
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            thread = self._thread
+
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout)
+
+        # Anything submitted after the flusher exited
+        self.flush()
+
+    def stats(self):
+        """
+        Sink counters for health checks
+
+        Returns:
+            dict: Submitted, flushed, dropped, lagging and pending counts
+        """
+
+        with self._cond:
+            stats = dict(self._stats)
+            stats["pending"] = len(self._buffer)
+            stats["capacity"] = self.capacity
+
+        return stats
+
+
+# =========================
+# SINGLETON
+# =========================
+
+_log_sink = None
+_log_sink_lock = threading.Lock()
+
+
+def get_log_sink() -> LogSink:
+    """Get the process-wide log sink"""
+
+    global _log_sink
+
+    if _log_sink is None:
+        with _log_sink_lock:
+            if _log_sink is None:
+                from backend.engines.db_engine import get_conn
+
+                _log_sink = LogSink(
+                    get_conn,
+                    capacity=Config.LOG_SINK_CAPACITY,
+                    batch_size=Config.LOG_SINK_BATCH_SIZE,
+                    flush_interval=Config.LOG_SINK_FLUSH_INTERVAL_SECONDS,
+                    block_timeout=Config.LOG_SINK_BLOCK_TIMEOUT_MS / 1000,
+                    retries=Config.LOG_SINK_FLUSH_RETRIES
+                )
+
+    return _log_sink
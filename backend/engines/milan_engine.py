@@ -2,10 +2,16 @@
 Kundali Milan (Gun Milan) Engine
 Complete implementation of Ashtakoota system for marriage compatibility
 36 points across 8 parameters (Gunas)
+
+Every kuta is also precompiled into a 27x27 nakshatra or 12x12 rasi
+score matrix (boy ordinal x girl ordinal), which MatchPool uses to rank
+thousands of candidates at once.
 """
 
 import logging
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
 
@@ -393,6 +399,203 @@ def calculate_nadi_kuta(boy_nakshatra, girl_nakshatra):
     return 0
 
 
+# =========================
+# LOOKUP MATRICES
+# =========================
+
+SIGNS = ["Aries", "Taurus", "Gemini", "Cancer", "Leo", "Virgo",
+         "Libra", "Scorpio", "Sagittarius", "Capricorn", "Aquarius", "Pisces"]
+
+NAKSHATRA_INDEX = {name: i for i, name in enumerate(NAKSHATRAS)}
+SIGN_INDEX = {name: i for i, name in enumerate(SIGNS)}
+
+# Kuta name -> (maximum, description)
+KUTAS = {
+    "Varna": (1, "Spiritual compatibility & ego"),
+    "Vashya": (2, "Mutual attraction & control"),
+    "Tara": (3, "Health & longevity"),
+    "Yoni": (4, "Sexual compatibility & intimacy"),
+    "Graha Maitri": (5, "Mental compatibility & understanding"),
+    "Gana": (6, "Temperament & nature"),
+    "Bhakoot": (7, "Love & family welfare"),
+    "Nadi": (8, "Health & progeny (CRITICAL)")
+}
+
+# Scores are stored in half points so the matrices stay integer
+KUTA_SCALE = 2
+
+
+def _build_matrix(names, score):
+    return np.array(
+        [[round(score(boy, girl) * KUTA_SCALE) for girl in names] for boy in names],
+        dtype=np.int16
+    )
+
+
+# Kuta name -> (matrix, "nakshatra" or "rasi" axis)
+KUTA_MATRICES = {
+    "Varna": (_build_matrix(NAKSHATRAS, calculate_varna_kuta), "nakshatra"),
+    "Vashya": (_build_matrix(NAKSHATRAS, calculate_vashya_kuta), "nakshatra"),
+    "Tara": (_build_matrix(NAKSHATRAS, calculate_tara_kuta), "nakshatra"),
+    "Yoni": (_build_matrix(NAKSHATRAS, calculate_yoni_kuta), "nakshatra"),
+    "Graha Maitri": (_build_matrix(SIGNS, calculate_graha_maitri), "rasi"),
+    "Gana": (_build_matrix(NAKSHATRAS, calculate_gana_kuta), "nakshatra"),
+    "Bhakoot": (_build_matrix(SIGNS, calculate_bhakoot_kuta), "rasi"),
+    "Nadi": (_build_matrix(NAKSHATRAS, calculate_nadi_kuta), "nakshatra")
+}
+
+# The six nakshatra-axis kutas (Varna, Vashya, Tara, Yoni, Gana, Nadi)
+# summed over the 27x27 grid, and the two rasi-axis kutas (Graha Maitri,
+# Bhakoot) over the 12x12 grid; a pair's total is one cell of each
+NAKSHATRA_TOTAL = sum(m for m, axis in KUTA_MATRICES.values() if axis == "nakshatra")
+RASI_TOTAL = sum(m for m, axis in KUTA_MATRICES.values() if axis == "rasi")
+
+
+def kuta_scores(boy_nakshatra, girl_nakshatra, boy_moon_sign, girl_moon_sign):
+    """
+    Points for each kuta
+
+    Matrix lookups; names outside the tables fall back to the kuta
+    functions and their defaults.
+
+    Returns:
+        dict: {kuta name: points obtained}
+    """
+
+    functions = {
+        "Varna": calculate_varna_kuta,
+        "Vashya": calculate_vashya_kuta,
+        "Tara": calculate_tara_kuta,
+        "Yoni": calculate_yoni_kuta,
+        "Graha Maitri": calculate_graha_maitri,
+        "Gana": calculate_gana_kuta,
+        "Bhakoot": calculate_bhakoot_kuta,
+        "Nadi": calculate_nadi_kuta
+    }
+
+    nakshatras = (NAKSHATRA_INDEX.get(boy_nakshatra), NAKSHATRA_INDEX.get(girl_nakshatra))
+    signs = (SIGN_INDEX.get(boy_moon_sign), SIGN_INDEX.get(girl_moon_sign))
+
+    scores = {}
+
+    for name, (matrix, axis) in KUTA_MATRICES.items():
+        boy, girl = nakshatras if axis == "nakshatra" else signs
+
+        if boy is None or girl is None:
+            if axis == "nakshatra":
+                scores[name] = functions[name](boy_nakshatra, girl_nakshatra)
+            else:
+                scores[name] = functions[name](boy_moon_sign, girl_moon_sign)
+        else:
+            points = matrix[boy, girl] / KUTA_SCALE
+            scores[name] = int(points) if points == int(points) else float(points)
+
+    return scores
+
+
+# =========================
+# BATCH MATCHING
+# =========================
+
+class MatchPool:
+    """
+    Pool of candidate profiles encoded for fast ranking
+
+    Build once (e.g. when the profile pool changes) and reuse: ranking a
+    profile against the pool is a few NumPy gathers plus a partial sort.
+
+    Args:
+        profiles: Candidate dicts with "nakshatra" and "moon_sign" (any
+                  other keys are passed through in the results)
+    """
+
+    def __init__(self, profiles):
+        self.profiles = list(profiles)
+
+        nakshatras = np.array(
+            [NAKSHATRA_INDEX.get(p.get("nakshatra"), -1) for p in self.profiles], dtype=np.int16
+        )
+        signs = np.array(
+            [SIGN_INDEX.get(p.get("moon_sign"), -1) for p in self.profiles], dtype=np.int16
+        )
+
+        # Profiles without a usable nakshatra / moon sign can't be ranked
+        self.positions = np.flatnonzero((nakshatras >= 0) & (signs >= 0))
+        self.nakshatras = nakshatras[self.positions]
+        self.signs = signs[self.positions]
+
+        skipped = len(self.profiles) - len(self.positions)
+
+        if skipped:
+            logger.warning(f"⚠️ {skipped} profiles without nakshatra / moon sign left out of the match pool")
+
+    def __len__(self):
+        return len(self.positions)
+
+    def top_matches(self, profile, k=10, seeker="boy", min_score=0):
+        """
+        Best matches for `profile` in the pool
+
+        Args:
+            profile: Kundali (or dict) with "nakshatra" and "moon_sign"
+            k: Number of matches to return
+            seeker: "boy" if `profile` is the boy's, "girl" otherwise
+            min_score: Leave out matches below this total
+
+        Returns:
+            list: {"profile", "total_score", "percentage", "scores"} by
+                  descending total, scores being {kuta name: points}
+        """
+
+        nakshatra = NAKSHATRA_INDEX.get(profile.get("nakshatra"))
+        sign = SIGN_INDEX.get(profile.get("moon_sign"))
+
+        if nakshatra is None or sign is None or not len(self):
+            return []
+
+        # Boy is always the row index
+        if seeker == "boy":
+            totals = NAKSHATRA_TOTAL[nakshatra, self.nakshatras] + RASI_TOTAL[sign, self.signs]
+        else:
+            totals = NAKSHATRA_TOTAL[self.nakshatras, nakshatra] + RASI_TOTAL[self.signs, sign]
+
+        k = min(k, len(totals))
+
+        # Partial sort for the top k, then order just those (ties: pool order)
+        top = np.argpartition(-totals, k - 1)[:k]
+        top = top[np.lexsort((top, -totals[top]))]
+
+        matches = []
+
+        for n in top:
+            total = totals[n] / KUTA_SCALE
+
+            if total < min_score:
+                break
+
+            scores = {}
+
+            for name, (matrix, axis) in KUTA_MATRICES.items():
+                own, other = (nakshatra, self.nakshatras[n]) if axis == "nakshatra" else (sign, self.signs[n])
+                points = (matrix[own, other] if seeker == "boy" else matrix[other, own]) / KUTA_SCALE
+                scores[name] = float(points)
+
+            matches.append({
+                "profile": self.profiles[self.positions[n]],
+                "total_score": float(total),
+                "percentage": round(total / 36 * 100, 1),
+                "scores": scores
+            })
+
+        return matches
+
+
+def find_matches(profile, candidates, k=10, seeker="boy", min_score=0):
+    """One-off ranking of `candidates` (see MatchPool.top_matches)"""
+
+    return MatchPool(candidates).top_matches(profile, k=k, seeker=seeker, min_score=min_score)
+
+
 # =========================
 # MAIN GUN MILAN CALCULATION
 # =========================
@@ -417,47 +620,15 @@ def calculate_gun_milan(boy_kundali, girl_kundali):
         girl_moon_sign = girl_kundali.get("moon_sign", "")
         
         # Calculate each Kuta
+        obtained = kuta_scores(boy_nakshatra, girl_nakshatra, boy_moon_sign, girl_moon_sign)
+        
         scores = {
-            "Varna": {
-                "obtained": calculate_varna_kuta(boy_nakshatra, girl_nakshatra),
-                "maximum": 1,
-                "description": "Spiritual compatibility & ego"
-            },
-            "Vashya": {
-                "obtained": calculate_vashya_kuta(boy_nakshatra, girl_nakshatra),
-                "maximum": 2,
-                "description": "Mutual attraction & control"
-            },
-            "Tara": {
-                "obtained": calculate_tara_kuta(boy_nakshatra, girl_nakshatra),
-                "maximum": 3,
-                "description": "Health & longevity"
-            },
-            "Yoni": {
-                "obtained": calculate_yoni_kuta(boy_nakshatra, girl_nakshatra),
-                "maximum": 4,
-                "description": "Sexual compatibility & intimacy"
-            },
-            "Graha Maitri": {
-                "obtained": calculate_graha_maitri(boy_moon_sign, girl_moon_sign),
-                "maximum": 5,
-                "description": "Mental compatibility & understanding"
-            },
-            "Gana": {
-                "obtained": calculate_gana_kuta(boy_nakshatra, girl_nakshatra),
-                "maximum": 6,
-                "description": "Temperament & nature"
-            },
-            "Bhakoot": {
-                "obtained": calculate_bhakoot_kuta(boy_moon_sign, girl_moon_sign),
-                "maximum": 7,
-                "description": "Love & family welfare"
-            },
-            "Nadi": {
-                "obtained": calculate_nadi_kuta(boy_nakshatra, girl_nakshatra),
-                "maximum": 8,
-                "description": "Health & progeny (CRITICAL)"
+            name: {
+                "obtained": obtained[name],
+                "maximum": maximum,
+                "description": description
             }
+            for name, (maximum, description) in KUTAS.items()
         }
         
         # Calculate total
@@ -9,20 +9,25 @@ import hmac
 import hashlib
 import razorpay
 from datetime import datetime, timedelta
-from twilio.rest import Client
 from backend.config import Config
 from backend.engines.db_engine import get_conn
+from backend.utils.rate_limiter import allow
+from backend.services.http_client import get_razorpay_client, get_twilio_client
 
 logger = logging.getLogger(__name__)
 
 # Initialize Twilio Client for proactive notifications
-twilio_client = Client(Config.TWILIO_ACCOUNT_SID, Config.TWILIO_AUTH_TOKEN)
+twilio_client = get_twilio_client()
 
 
 # =========================
 # RAZORPAY CLIENT INIT
 # =========================
 
+# None when Razorpay keys are not configured
+razorpay_client = get_razorpay_client()
+
+
 def update_payment_status(order_id, status, payment_id=None, error_message=None):
     """Updates DB and triggers the WhatsApp bot immediately on success"""
     conn = get_conn()
@@ -109,6 +114,10 @@ def create_order(phone, product_type="KUNDALI"):
         logger.error("Razorpay client not initialized")
         return None
     
+    # Each call creates a real Razorpay order
+    if not allow("payment_order", phone):
+        return None
+    
     # Get product price
     amount = PRODUCT_PRICES.get(product_type, 200)
     
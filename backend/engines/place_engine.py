@@ -0,0 +1,452 @@
+"""
+Place Resolution Engine
+Resolves birthplaces offline from the bundled gazetteer
+
+- data/gazetteer.tsv: Indian and world cities with aliases ("Bombay"),
+  state / country codes, coordinates and IANA timezone
+- Normalized-name trie for exact, alias and prefix lookups
+- Bounded edit-distance search over the trie for typos ("Banglore")
+- Qualifiers after a comma narrow the match ("Pune, MH", "Surrey, BC")
+- UTC offset for the birth instant from the IANA database (zoneinfo),
+  so historical offsets (e.g. IST +06:30 during 1942-45) are correct
+
+Only exact (or alias) matches, and prefix / typo matches confirmed by a
+qualifier, are trusted outright. Any other near match could be a real town
+the gazetteer lacks ("Bhiwani" is not Bhiwandi), so Nominatim is asked
+first and the near match is only used when Nominatim has no answer.
+Nominatim answers go through the place cache.
+"""
+
+import os
+import re
+import math
+import logging
+import threading
+import unicodedata
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+GAZETTEER_PATH = os.path.join(BASE_DIR, "data", "gazetteer.tsv")
+
+DEFAULT_TIMEZONE = "Asia/Kolkata"
+
+# Nominatim answers are cached for 30 days (places don't move)
+PLACE_CACHE_TTL_SECONDS = 30 * 24 * 3600
+
+# Names at least this long may be matched with two typos, shorter ones
+# with one ("Barmer" must not become Ajmer)
+FUZZY_TWO_EDITS_MIN_LENGTH = 8
+
+# Words dropped before matching ("Pune city", "Mumbai, India")
+NOISE_WORDS = {"city", "district", "dist", "town", "village", "india", "bharat", "the"}
+
+COUNTRY_NAMES = {
+    "india": "IN", "nepal": "NP", "bangladesh": "BD", "pakistan": "PK",
+    "sri lanka": "LK", "bhutan": "BT", "maldives": "MV", "uae": "AE",
+    "united arab emirates": "AE", "oman": "OM", "qatar": "QA", "kuwait": "KW",
+    "saudi arabia": "SA", "bahrain": "BH", "singapore": "SG", "malaysia": "MY",
+    "thailand": "TH", "indonesia": "ID", "china": "CN", "japan": "JP",
+    "usa": "US", "us": "US", "united states": "US", "america": "US",
+    "uk": "GB", "united kingdom": "GB", "england": "GB", "canada": "CA",
+    "australia": "AU", "new zealand": "NZ", "germany": "DE", "france": "FR",
+    "south africa": "ZA", "kenya": "KE", "mauritius": "MU",
+}
+
+
+# =========================
+# NORMALIZATION
+# =========================
+
+def normalize(text):
+    """
+    Canonical form used for matching
+
+    "  Zürich " -> "zurich", "Pimpri-Chinchwad" -> "pimpri chinchwad"
+    """
+
+    text = unicodedata.normalize("NFKD", text or "")
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[^a-z0-9\u0900-\u0DFF]+", " ", text.lower())
+
+    return " ".join(text.split())
+
+
+def _split_query(text):
+    """'Pune, MH' -> ('pune', ['mh']); noise words dropped"""
+
+    parts = [normalize(p) for p in re.split(r"[,/]", text or "")]
+    parts = [p for p in parts if p]
+
+    if not parts:
+        return "", []
+
+    name = " ".join(w for w in parts[0].split() if w not in NOISE_WORDS) or parts[0]
+    qualifiers = [q for q in parts[1:] if q not in NOISE_WORDS]
+
+    return name, qualifiers
+
+
+# =========================
+# TRIE
+# =========================
+
+class _Node:
+    __slots__ = ("children", "places")
+
+    def __init__(self):
+        self.children = {}
+        self.places = []
+
+
+class PlaceTrie:
+    """Character trie of normalized names and aliases"""
+
+    def __init__(self):
+        self.root = _Node()
+
+    def insert(self, key, place_id):
+        node = self.root
+
+        for ch in key:
+            node = node.children.setdefault(ch, _Node())
+
+        if place_id not in node.places:
+            node.places.append(place_id)
+
+    def exact(self, key):
+        node = self._walk(key)
+        return list(node.places) if node else []
+
+    def prefix(self, key, limit=20):
+        """Place ids of all names starting with `key`"""
+
+        node = self._walk(key)
+
+        if node is None:
+            return []
+
+        found, stack = [], [node]
+
+        while stack and len(found) < limit:
+            node = stack.pop()
+            found.extend(node.places)
+            stack.extend(node.children.values())
+
+        return found[:limit]
+
+    def fuzzy(self, key, max_distance):
+        """
+        Names within `max_distance` edits of `key`
+
+        Levenshtein rows are computed while walking the trie, and any
+        branch whose best cell already exceeds the bound is pruned.
+
+        Returns:
+            list: (distance, place_id)
+        """
+
+        results = []
+        first_row = list(range(len(key) + 1))
+
+        for ch, child in self.root.children.items():
+            self._fuzzy(child, ch, key, first_row, max_distance, results)
+
+        return results
+
+    def _fuzzy(self, node, ch, key, previous_row, max_distance, results):
+        row = [previous_row[0] + 1]
+
+        for i in range(1, len(key) + 1):
+            row.append(min(
+                row[i - 1] + 1,
+                previous_row[i] + 1,
+                previous_row[i - 1] + (key[i - 1] != ch)
+            ))
+
+        if row[-1] <= max_distance and node.places:
+            results.extend((row[-1], place_id) for place_id in node.places)
+
+        if min(row) <= max_distance:
+            for next_ch, child in node.children.items():
+                self._fuzzy(child, next_ch, key, row, max_distance, results)
+
+    def _walk(self, key):
+        node = self.root
+
+        for ch in key:
+            node = node.children.get(ch)
+
+            if node is None:
+                return None
+
+        return node
+
+
+# =========================
+# GAZETTEER
+# =========================
+
+class Gazetteer:
+    """In-memory gazetteer loaded from data/gazetteer.tsv"""
+
+    def __init__(self, path=GAZETTEER_PATH):
+        self.places = []
+        self.trie = PlaceTrie()
+
+        self._load(path)
+
+    def _load(self, path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip() or line.startswith("#"):
+                    continue
+
+                name, aliases, region, region_code, country, lat, lon, tz, population = \
+                    line.rstrip("\n").split("\t")
+
+                place = {
+                    "name": name,
+                    "region": region,
+                    "region_code": region_code,
+                    "country": country,
+                    "lat": float(lat),
+                    "lon": float(lon),
+                    "timezone": tz,
+                    "population": int(population or 0),
+                    # Everything a qualifier may match
+                    "qualifiers": {normalize(region), normalize(region_code), normalize(country)}
+                }
+
+                place_id = len(self.places)
+                self.places.append(place)
+
+                for key in [name] + [a for a in aliases.split("|") if a]:
+                    self.trie.insert(normalize(key), place_id)
+
+        logger.info(f"🗺️ Gazetteer loaded: {len(self.places)} places")
+
+    def lookup(self, text):
+        """
+        Best match for free-text place input
+
+        Returns:
+            dict: Place with "match" ("exact", "prefix" or "fuzzy") and
+                  "confirmed" (exact, or a near match whose qualifier
+                  agrees), or None
+        """
+
+        name, qualifiers = _split_query(text)
+
+        if len(name) < 2:
+            return None
+
+        candidates = [(0, i) for i in self.trie.exact(name)]
+        match = "exact"
+
+        if not candidates and len(name) >= 4:
+            candidates = [(0, i) for i in self.trie.prefix(name)]
+            match = "prefix"
+
+        if not candidates:
+            candidates = self.trie.fuzzy(name, 2 if len(name) >= FUZZY_TWO_EDITS_MIN_LENGTH else 1)
+            match = "fuzzy"
+
+        if not candidates:
+            return None
+
+        confirmed = match == "exact"
+
+        if qualifiers:
+            wanted = {COUNTRY_NAMES.get(q, q).lower() for q in qualifiers}
+            qualified = [c for c in candidates if wanted & self.places[c[1]]["qualifiers"]]
+
+            # An unknown qualifier ("Pune, Hadapsar") doesn't rule out the city
+            candidates = qualified or candidates
+            confirmed = confirmed or bool(qualified)
+
+        # Closest spelling first, then the bigger city
+        distance, place_id = min(candidates, key=lambda c: (c[0], -self.places[c[1]]["population"]))
+
+        place = dict(self.places[place_id])
+        place.pop("qualifiers")
+        place["match"] = match
+        place["distance"] = distance
+        place["confirmed"] = confirmed
+
+        return place
+
+    def nearest(self, lat, lon):
+        """Closest gazetteer place (used to pick a timezone for geocoded places)"""
+
+        def haversine(place):
+            d_lat = math.radians(place["lat"] - lat)
+            d_lon = math.radians(place["lon"] - lon)
+            a = (
+                math.sin(d_lat / 2) ** 2
+                + math.cos(math.radians(lat)) * math.cos(math.radians(place["lat"])) * math.sin(d_lon / 2) ** 2
+            )
+            return a
+
+        return min(self.places, key=haversine)
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer():
+    global _gazetteer
+
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer()
+
+    return _gazetteer
+
+
+# =========================
+# TIMEZONE
+# =========================
+
+def _parse_local(dob, time_str):
+    """DD-MM-YYYY + 'HH:MM AM' / 'HH:MM' -> naive datetime (None if unparseable)"""
+
+    try:
+        day, month, year = (int(p) for p in dob.split("-"))
+
+        time_str = time_str.strip().upper()
+        meridiem = "PM" if "PM" in time_str else "AM" if "AM" in time_str else None
+
+        hours, minutes = (int(p) for p in time_str.replace("AM", "").replace("PM", "").strip().split(":")[:2])
+
+        if meridiem == "PM" and hours != 12:
+            hours += 12
+        elif meridiem == "AM" and hours == 12:
+            hours = 0
+
+        return datetime(year, month, day, hours, minutes)
+
+    except (ValueError, AttributeError):
+        return None
+
+
+def format_offset(offset):
+    """timedelta -> '+05:30' (rounded to the minute)"""
+
+    minutes = round(offset.total_seconds() / 60)
+    sign = "+" if minutes >= 0 else "-"
+    hours, minutes = divmod(abs(minutes), 60)
+
+    return f"{sign}{hours:02d}:{minutes:02d}"
+
+
+def utc_offset(timezone, dob=None, time_str=None):
+    """
+    UTC offset in effect at the birth instant
+
+    Args:
+        timezone: IANA timezone name
+        dob: DD-MM-YYYY (optional)
+        time_str: Birth time (optional)
+
+    Returns:
+        str: Offset like '+05:30' (current offset if the date is unknown)
+    """
+
+    tz = ZoneInfo(timezone)
+    local = _parse_local(dob, time_str) if dob and time_str else None
+
+    if local is None:
+        local = datetime.now(tz).replace(tzinfo=None)
+
+    return format_offset(local.replace(tzinfo=tz).utcoffset() or timedelta(0))
+
+
+# =========================
+# RESOLUTION
+# =========================
+
+def _geocode_fallback(place):
+    from backend.engines.db_engine import get_place_cache, set_place_cache
+    from backend.services.geocode import geocode_city
+
+    key = normalize(place)
+    cached = get_place_cache(key)
+
+    if cached is not None:
+        return cached or None
+
+    try:
+        geo = geocode_city(place)
+    except Exception as e:
+        logger.warning(f"⚠️ Geocoding failed for {place}: {e}")
+        return None
+
+    if not geo:
+        # Remember misses too, but not for as long
+        set_place_cache(key, {}, ttl_seconds=24 * 3600)
+        return None
+
+    geo["timezone"] = get_gazetteer().nearest(geo["lat"], geo["lon"])["timezone"]
+    set_place_cache(key, geo, ttl_seconds=PLACE_CACHE_TTL_SECONDS)
+
+    return geo
+
+
+def resolve_place(place, dob=None, time_str=None):
+    """
+    Resolve a birthplace to coordinates and UTC offset
+
+    Args:
+        place: Free-text place ("Bombay", "pune, MH")
+        dob: DD-MM-YYYY, for the historical offset
+        time_str: Birth time
+
+    Returns:
+        dict: {"lat", "lon", "display", "timezone", "utc_offset", "source"}
+              or None if the place is unknown
+    """
+
+    match = get_gazetteer().lookup(place)
+    geo = None
+
+    # An unconfirmed near match may be a different town: ask Nominatim first
+    if not match or not match["confirmed"]:
+        geo = _geocode_fallback(place)
+
+    if geo:
+        result = {
+            "lat": geo["lat"],
+            "lon": geo["lon"],
+            "display": geo.get("display"),
+            "timezone": geo.get("timezone") or DEFAULT_TIMEZONE,
+            "source": "nominatim"
+        }
+
+    elif match:
+        region = match["region"] if match["region"] != match["name"] else ""
+        display = ", ".join(p for p in (match["name"], region) if p)
+        result = {
+            "lat": match["lat"],
+            "lon": match["lon"],
+            "display": display,
+            "timezone": match["timezone"],
+            "source": "gazetteer"
+        }
+
+        if not match["confirmed"]:
+            logger.warning(f"⚠️ '{place}' not geocoded, using {match['match']} match {display}")
+        elif match["match"] != "exact":
+            logger.info(f"🔎 '{place}' matched {display} ({match['match']})")
+
+    else:
+        return None
+
+    result["utc_offset"] = utc_offset(result["timezone"], dob, time_str)
+
+    return result
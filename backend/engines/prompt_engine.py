@@ -0,0 +1,432 @@
+"""
+Prompt Engine
+Assembles the AI user prompt from precompiled, per-chart context blocks
+
+- A chart's context (core placements, planet / house lord / aspect lines,
+  yogas, dasha timeline, key months) is rendered once and kept in a
+  bounded in-process LRU keyed by chart fingerprint, together with the
+  token count of every piece
+- Sections are picked and ordered by question type: planets, lords and
+  aspects touching the RULE_FOCUS houses go first, the rest of the chart
+  is low-value filler
+- Sections are added in priority order while they fit PROMPT_TOKEN_BUDGET;
+  the core placements, dasha, analysis focus and the question are always
+  sent
+- Daily transits and the month calendar are rendered once per day
+
+Tokens are counted with tiktoken (in requirements.txt); if it can't be
+loaded, a local estimate that errs on the high side is used instead.
+"""
+
+import re
+import logging
+import datetime
+import threading
+from collections import OrderedDict
+
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+# =========================
+# TOKEN COUNTING
+# =========================
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("o200k_base")
+except Exception:
+    _encoding = None
+
+# Latin words, single digits, anything else one character at a time
+_PIECE_RE = re.compile(r"[A-Za-z]+|\d|[^\sA-Za-z\d]")
+
+
+def count_tokens(text):
+    """
+    Tokens `text` costs in the prompt
+
+    Without tiktoken: a Latin word is a token per 4 letters, every digit,
+    symbol or non-Latin character is one token.
+    """
+
+    if not text:
+        return 0
+
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+
+    tokens = 0
+
+    for piece in _PIECE_RE.findall(text):
+        tokens += (len(piece) + 3) // 4 if piece[0].isalpha() and piece.isascii() else 1
+
+    return tokens
+
+
+# =========================
+# QUESTION FOCUS
+# =========================
+
+# Houses and planets each question type is read from (see RULE_FOCUS);
+# None means the whole chart
+FOCUS = {
+    "CAREER": {"houses": [10, 6], "planets": ["Sun", "Saturn", "Jupiter"]},
+    "MARRIAGE": {"houses": [7], "planets": ["Venus", "Moon", "Mars"]},
+    "FINANCE": {"houses": [2, 11], "planets": ["Jupiter", "Venus"]},
+    "HEALTH": {"houses": [6, 8], "planets": ["Moon", "Mars"]},
+    "GENERAL": {"houses": None, "planets": None},
+}
+
+# Optional sections, most valuable first; trimmed from the end
+SECTION_PRIORITY = {
+    "CAREER": ["focus_planets", "focus_lords", "key_months", "transits", "focus_aspects",
+               "yogas", "calendar", "other_planets", "other_lords", "other_aspects", "manglik"],
+    "MARRIAGE": ["focus_planets", "focus_lords", "manglik", "key_months", "transits",
+                 "focus_aspects", "yogas", "calendar", "other_planets", "other_lords", "other_aspects"],
+    "FINANCE": ["focus_planets", "focus_lords", "yogas", "key_months", "transits",
+                "focus_aspects", "calendar", "other_planets", "other_lords", "other_aspects", "manglik"],
+    "HEALTH": ["focus_planets", "focus_lords", "key_months", "transits", "focus_aspects",
+               "calendar", "other_planets", "yogas", "other_lords", "other_aspects", "manglik"],
+    "GENERAL": ["focus_planets", "yogas", "focus_lords", "key_months", "transits",
+                "calendar", "focus_aspects", "manglik"],
+}
+
+# Order sections appear in the prompt, regardless of priority
+LAYOUT = [
+    ("client", "CLIENT DETAILS"),
+    ("core", "CORE CHART"),
+    ("focus_planets", "PLANETS"),
+    ("other_planets", "OTHER PLANETS"),
+    ("focus_lords", "HOUSE LORDS"),
+    ("other_lords", "OTHER HOUSE LORDS"),
+    ("focus_aspects", "ASPECTS"),
+    ("other_aspects", "OTHER ASPECTS"),
+    ("yogas", "YOGAS"),
+    ("manglik", "MANGLIK"),
+    ("dasha", "DASHA + ANTARDASHA"),
+    ("key_months", "IMPORTANT UPCOMING MONTHS"),
+    ("transits", "CURRENT TRANSITS"),
+    ("calendar", "MONTH CALENDAR"),
+    ("focus", "ANALYSIS FOCUS"),
+    ("question", "USER QUESTION"),
+]
+
+REQUIRED_SECTIONS = ("client", "core", "dasha", "focus", "question")
+
+
+# =========================
+# CHART CONTEXT
+# =========================
+
+class ChartContext:
+    """
+    A chart rendered into prompt pieces, each paired with its token count
+
+    Attributes:
+        core, yogas, manglik, dasha, key_months: (text, tokens)
+        planets: [(name, house, text, tokens)]
+        lords: [(house, text, tokens)]
+        aspects: [(to_house, planet, text, tokens)]
+    """
+
+    def __init__(self, kundali):
+        from backend.engines.ai_engine import (
+            format_planets, format_house_lords, format_aspects,
+            format_dasha_timeline, extract_key_months
+        )
+
+        def piece(text):
+            return text, count_tokens(text)
+
+        self.core = piece(
+            f"Ascendant: {kundali.get('lagna')}\n"
+            f"Sun Sign: {kundali.get('sun_sign')}\n"
+            f"Moon Sign: {kundali.get('moon_sign')}\n"
+            f"Nakshatra: {kundali.get('nakshatra')} (Pada {kundali.get('pada')})"
+        )
+
+        self.planets = [
+            (p.get("name"), _house(p.get("house")), *piece(format_planets([p])))
+            for p in kundali.get("planets", [])
+        ]
+
+        self.lords = [
+            (_house(h), *piece(format_house_lords({h: lord})))
+            for h, lord in (kundali.get("house_lords") or {}).items()
+        ]
+
+        self.aspects = [
+            (_house(a.get("to_house")), a.get("planet"), *piece(format_aspects([a])))
+            for a in kundali.get("aspects", [])
+        ]
+
+        yogas = kundali.get("yogas", [])
+        self.yogas = piece("\n".join(y["name"] for y in yogas) if yogas else "None")
+
+        self.manglik = piece(str(kundali.get("manglik")))
+
+        dasha_timeline = kundali.get("dasha_timeline", {})
+        self.dasha = piece(format_dasha_timeline(dasha_timeline).strip())
+        self.key_months = piece(extract_key_months(dasha_timeline))
+
+    def sections(self, qtype, also=()):
+        """
+        Chart sections for a question type: {name: (text, tokens)}
+
+        Houses and planets of the secondary types in `also` count as
+        focus too.
+        """
+
+        focus = FOCUS.get(qtype, FOCUS["GENERAL"])
+        houses, planets = focus["houses"], focus["planets"]
+
+        if houses is not None:
+            houses, planets = list(houses), list(planets)
+
+            for extra in also:
+                extra_focus = FOCUS.get(extra, FOCUS["GENERAL"])
+
+                if extra_focus["houses"] is not None:
+                    houses += extra_focus["houses"]
+                    planets += extra_focus["planets"]
+
+        def in_focus_planet(name, house):
+            if houses is None:
+                return True
+            return name in planets or house in houses
+
+        def join(lines):
+            if not lines:
+                return None
+            return "\n".join(text for text, _ in lines), sum(tokens for _, tokens in lines)
+
+        focus_planets, other_planets = [], []
+
+        for name, house, text, tokens in self.planets:
+            (focus_planets if in_focus_planet(name, house) else other_planets).append((text, tokens))
+
+        focus_lords, other_lords = [], []
+
+        for house, text, tokens in self.lords:
+            (focus_lords if houses is None or house in houses else other_lords).append((text, tokens))
+
+        focus_aspects, other_aspects = [], []
+
+        for to_house, planet, text, tokens in self.aspects:
+            relevant = houses is None or to_house in houses or planet in planets
+            (focus_aspects if relevant else other_aspects).append((text, tokens))
+
+        sections = {
+            "core": self.core,
+            "focus_planets": join(focus_planets) or ("None", 1),
+            "other_planets": join(other_planets),
+            "focus_lords": join(focus_lords) or ("None", 1),
+            "other_lords": join(other_lords),
+            "focus_aspects": join(focus_aspects) or ("None", 1),
+            "other_aspects": join(other_aspects),
+            "yogas": self.yogas,
+            "manglik": self.manglik,
+            "dasha": self.dasha,
+            "key_months": self.key_months
+        }
+
+        return {name: value for name, value in sections.items() if value is not None}
+
+
+def _house(value):
+    # House numbers turn into strings once a chart went through JSON
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+# =========================
+# CONTEXT CACHE
+# =========================
+
+_contexts = OrderedDict()
+_contexts_lock = threading.Lock()
+
+_stats = {
+    "context_hits": 0,
+    "context_builds": 0,
+    "prompts": 0,
+    "prompt_tokens": 0,
+    "trimmed_sections": 0,
+    "trimmed_tokens": 0
+}
+
+
+def _count(field, amount=1):
+    with _contexts_lock:
+        _stats[field] += amount
+
+
+def get_chart_context(data, field="kundali"):
+    """
+    Compiled context of the chart a session points at
+
+    Looked up by the session's chart reference, so a cached context never
+    touches the chart store.
+
+    Returns:
+        ChartContext
+    """
+
+    chart_key = data.get(f"{field}_ref") or (data.get(field) or {}).get("chart_key")
+
+    if chart_key:
+        with _contexts_lock:
+            context = _contexts.get(chart_key)
+
+            if context is not None:
+                _contexts.move_to_end(chart_key)
+                _stats["context_hits"] += 1
+                return context
+
+    from backend.engines.chart_engine import resolve_chart
+
+    context = ChartContext(resolve_chart(data, field))
+    _count("context_builds")
+
+    if chart_key:
+        with _contexts_lock:
+            _contexts[chart_key] = context
+
+            while len(_contexts) > Config.PROMPT_CONTEXT_MAX_CHARTS:
+                _contexts.popitem(last=False)
+
+    return context
+
+
+# =========================
+# DAILY BLOCKS
+# =========================
+
+# date ISO -> {"transits": (text, tokens), "calendar": (text, tokens)}
+_daily = {}
+_daily_lock = threading.Lock()
+
+
+def _daily_sections():
+    from backend.engines.ai_engine import format_transits, build_month_calendar
+    from backend.engines.transit_engine import get_daily_transits
+
+    today = datetime.date.today().isoformat()
+    transits = get_daily_transits()
+
+    blocks = _daily.get(today)
+
+    # Transits may arrive after the first question of the day
+    if blocks is None or (transits and blocks["transits"][0] == "None"):
+        transits_text = format_transits(transits)
+        calendar_text = build_month_calendar()
+
+        blocks = {
+            "transits": (transits_text, count_tokens(transits_text)),
+            "calendar": (calendar_text, count_tokens(calendar_text))
+        }
+
+        with _daily_lock:
+            _daily.clear()
+            _daily[today] = blocks
+
+    return blocks
+
+
+# =========================
+# ASSEMBLY
+# =========================
+
+def _render(sections):
+    parts = []
+
+    for name, title in LAYOUT:
+        if name in sections:
+            parts.append(f"{title}\n{sections[name][0]}")
+
+    return "\n\n".join(parts)
+
+
+def build_user_prompt(question, data, qtype, budget=None, also=()):
+    """
+    User prompt for a question, trimmed to the token budget
+
+    Args:
+        question: User's question
+        data: Session data (birth details, chart reference)
+        qtype: Main question type (classify_question)
+        budget: Token ceiling (default: PROMPT_TOKEN_BUDGET)
+        also: Secondary question types whose houses / planets to include
+
+    Returns:
+        str: Prompt text
+    """
+
+    from backend.engines.ai_engine import RULE_FOCUS
+
+    budget = Config.PROMPT_TOKEN_BUDGET if budget is None else budget
+
+    available = get_chart_context(data).sections(qtype, also)
+    available.update(_daily_sections())
+
+    client = (
+        f"Name: {data.get('name')}\n"
+        f"DOB: {data.get('dob')} {data.get('time')}\n"
+        f"Place: {data.get('place')}"
+    )
+    focus = RULE_FOCUS.get(qtype, RULE_FOCUS["GENERAL"])
+
+    available["client"] = (client, count_tokens(client))
+    available["focus"] = (focus, count_tokens(focus))
+    available["question"] = (question, count_tokens(question))
+
+    chosen = {name: available[name] for name in REQUIRED_SECTIONS}
+
+    # Each section also costs its title line and separators
+    used = sum(tokens + 4 for _, tokens in chosen.values())
+
+    trimmed, trimmed_tokens = 0, 0
+
+    for name in SECTION_PRIORITY.get(qtype, SECTION_PRIORITY["GENERAL"]):
+        section = available.get(name)
+
+        if section is None:
+            continue
+
+        cost = section[1] + 4
+
+        if used + cost <= budget:
+            chosen[name] = section
+            used += cost
+        else:
+            trimmed += 1
+            trimmed_tokens += cost
+
+    with _contexts_lock:
+        _stats["prompts"] += 1
+        _stats["prompt_tokens"] += used
+        _stats["trimmed_sections"] += trimmed
+        _stats["trimmed_tokens"] += trimmed_tokens
+
+    if trimmed:
+        logger.debug(f"✂️ Prompt trimmed by {trimmed} sections ({trimmed_tokens} tokens) for {qtype}")
+
+    return _render(chosen)
+
+
+def get_prompt_stats():
+    """Context cache usage and prompt sizes, for health checks"""
+
+    with _contexts_lock:
+        stats = dict(_stats)
+        stats["contexts"] = len(_contexts)
+
+    prompts = stats["prompts"]
+    stats["avg_prompt_tokens"] = round(stats["prompt_tokens"] / prompts, 1) if prompts else None
+    stats["tokenizer"] = "tiktoken" if _encoding is not None else "estimate"
+
+    return stats
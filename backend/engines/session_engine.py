@@ -0,0 +1,410 @@
+"""
+FSM Session Store
+Sits behind db_engine.get_session / save_session / clear_session
+
+Backends:
+- Redis hashes on REDIS_SESSION_DB with a sliding TTL (preferred)
+- The SQLite `sessions` table (fallback when Redis is not reachable)
+
+Features:
+- Dirty-checking: a save whose step + data hash matches what the same
+  unit of work loaded is skipped
+- Expiry handled by the store (Redis TTL / lazy expiry on read) instead of
+  a periodic DELETE scan
+- Writes made inside a unit of work only become visible after it commits
+- Compare-and-set for background jobs that advance a session
+"""
+
+import json
+import hashlib
+import logging
+
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def session_digest(step, data_json):
+    """Content hash used to detect unchanged sessions"""
+
+    return hashlib.blake2b(f"{step}\x00{data_json}".encode(), digest_size=16).hexdigest()
+
+
+# =========================
+# SQLITE BACKEND
+# =========================
+
+class SQLiteSessionStore:
+    """Sessions in the `sessions` table of bot.db"""
+
+    name = "sqlite"
+
+    def load(self, phone):
+        """
+        Returns:
+            (step, data_json, age_seconds) or None if missing / expired
+        """
+
+        from backend.engines.db_engine import get_conn
+
+        conn = get_conn()
+        cur = conn.cursor()
+
+        cur.execute("""
+        SELECT step, data,
+               CAST((julianday('now') - julianday(updated_at)) * 86400 AS INTEGER) AS age
+        FROM sessions
+        WHERE phone=?
+        """, (phone,))
+
+        row = cur.fetchone()
+
+        conn.close()
+
+        if not row:
+            return None
+
+        age = row["age"] or 0
+
+        # Lazy expiry - purge_expired() removes the row later
+        if age >= Config.SESSION_TTL_HOURS * 3600:
+            return None
+
+        return row["step"], row["data"] or "{}", age
+
+    def save(self, phone, step, data_json):
+        from backend.engines.db_engine import _write
+
+        # Staged on the active unit of work, if any
+        _write("""
+        INSERT INTO sessions(phone, step, data, updated_at)
+        VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(phone) DO UPDATE SET
+            step=excluded.step,
+            data=excluded.data,
+            updated_at=CURRENT_TIMESTAMP
+        """, (phone, step, data_json))
+
+    def delete(self, phone):
+        from backend.engines.db_engine import _write
+
+        _write("DELETE FROM sessions WHERE phone=?", (phone,))
+
+    def compare_and_save(self, phone, expected, step, data_json):
+        """Write only if the row still holds `expected` (step, data_json)"""
+
+        from backend.engines.db_engine import get_conn
+
+        conn = get_conn()
+
+        try:
+            cur = conn.execute("""
+            UPDATE sessions
+            SET step=?, data=?, updated_at=CURRENT_TIMESTAMP
+            WHERE phone=? AND step=? AND data=?
+            """, (step, data_json, phone, expected[0], expected[1]))
+
+            conn.commit()
+
+            return cur.rowcount == 1
+        finally:
+            conn.close()
+
+    def purge_expired(self):
+        """Delete sessions idle for longer than SESSION_TTL_HOURS"""
+
+        from backend.engines.db_engine import get_conn
+
+        conn = get_conn()
+        cur = conn.cursor()
+
+        cur.execute("""
+        DELETE FROM sessions
+        WHERE updated_at < datetime('now', ?)
+        """, (f"-{Config.SESSION_TTL_HOURS} hours",))
+
+        deleted = cur.rowcount
+        conn.commit()
+        conn.close()
+
+        return deleted
+
+
+# =========================
+# REDIS BACKEND
+# =========================
+
+class RedisSessionStore:
+    """Sessions as Redis hashes: session:<phone> -> {step, data}"""
+
+    name = "redis"
+    prefix = "session:"
+
+    def __init__(self, client):
+        self.client = client
+
+    def _ttl(self):
+        return Config.SESSION_TTL_HOURS * 3600
+
+    def load(self, phone):
+        key = self.prefix + phone
+
+        # Reading the session slides its TTL, even if the save is skipped
+        pipe = self.client.pipeline(transaction=False)
+        pipe.hgetall(key)
+        pipe.expire(key, self._ttl())
+        fields, _ = pipe.execute()
+
+        if not fields:
+            return None
+
+        return fields.get("step"), fields.get("data") or "{}", 0
+
+    def save(self, phone, step, data_json):
+        key = self.prefix + phone
+
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hset(key, mapping={"step": step, "data": data_json})
+        pipe.expire(key, self._ttl())
+        pipe.execute()
+
+    def delete(self, phone):
+        self.client.delete(self.prefix + phone)
+
+    def compare_and_save(self, phone, expected, step, data_json):
+        import redis
+
+        key = self.prefix + phone
+
+        with self.client.pipeline(transaction=True) as pipe:
+            try:
+                pipe.watch(key)
+                fields = pipe.hgetall(key)
+
+                if (fields.get("step"), fields.get("data")) != tuple(expected):
+                    pipe.unwatch()
+                    return False
+
+                pipe.multi()
+                pipe.hset(key, mapping={"step": step, "data": data_json})
+                pipe.expire(key, self._ttl())
+                pipe.execute()
+
+                return True
+
+            except redis.WatchError:
+                return False
+
+    def purge_expired(self):
+        # Redis expires keys on its own
+        return 0
+
+
+# =========================
+# BACKEND SELECTION
+# =========================
+
+def get_session_store():
+    """
+    Session store for this call
+
+    SESSION_BACKEND "auto" uses Redis when reachable and falls back to
+    SQLite; "sqlite" / "redis" force one backend.
+    """
+
+    if Config.SESSION_BACKEND in ("auto", "redis"):
+        from backend.utils.redis_client import get_redis
+
+        client = get_redis(Config.REDIS_SESSION_DB)
+
+        if client is not None:
+            return RedisSessionStore(client)
+
+    return SQLiteSessionStore()
+
+
+def _call(store, method, *args):
+    """Run a store method, degrading to SQLite if Redis fails mid-call"""
+
+    try:
+        return getattr(store, method)(*args)
+
+    except Exception as e:
+        if store.name != "redis":
+            raise
+
+        from backend.utils.redis_client import mark_redis_down
+
+        logger.warning(f"⚠️ Redis session {method} failed, using SQLite: {e}")
+        mark_redis_down(Config.REDIS_SESSION_DB)
+
+        return getattr(SQLiteSessionStore(), method)(*args)
+
+
+# =========================
+# SESSION API
+# =========================
+
+def load_session(phone):
+    """
+    Load a session, honouring writes staged on the current unit of work
+
+    Returns:
+        dict: {"phone", "step", "data"} or None
+    """
+
+    from backend.engines.db_engine import current_unit_of_work
+
+    uow = current_unit_of_work()
+
+    if uow is not None and phone in uow.sessions:
+        staged = uow.sessions[phone]
+
+        if staged is None:
+            return None
+
+        step, data_json = staged
+        return {"phone": phone, "step": step, "data": json.loads(data_json)}
+
+    row = _call(get_session_store(), "load", phone)
+
+    if row is None:
+        return None
+
+    step, data_json, age = row
+
+    if uow is not None:
+        # SQLite only refreshes updated_at on write, so an old row is
+        # rewritten even if unchanged to keep the session alive
+        if age < Config.SESSION_TTL_HOURS * 3600 / 2:
+            uow.session_digests[phone] = session_digest(step, data_json)
+
+    return {"phone": phone, "step": step, "data": json.loads(data_json)}
+
+
+def store_session(phone, step, data):
+    """
+    Save a session, skipping the write if nothing changed
+
+    Returns:
+        bool: False if the write was skipped
+    """
+
+    from backend.engines.db_engine import current_unit_of_work
+
+    data_json = json.dumps(data)
+    digest = session_digest(step, data_json)
+
+    uow = current_unit_of_work()
+
+    if uow is not None:
+        uow.sessions[phone] = (step, data_json)
+
+        if uow.session_digests.get(phone) == digest:
+            logger.debug(f"📝 Session unchanged, write skipped: {phone}")
+            return False
+
+        uow.session_digests[phone] = digest
+
+    store = get_session_store()
+
+    if store.name == "redis" and uow is not None:
+        _publish_on_commit(uow, store, phone)
+    else:
+        _call(store, "save", phone, step, data_json)
+
+    logger.debug(f"📝 Session saved: {phone} → {step}")
+
+    return True
+
+
+def delete_session(phone):
+    """Delete a session"""
+
+    from backend.engines.db_engine import current_unit_of_work
+
+    uow = current_unit_of_work()
+    store = get_session_store()
+
+    if uow is not None:
+        uow.sessions[phone] = None
+        uow.session_digests.pop(phone, None)
+
+    if store.name == "redis" and uow is not None:
+        _publish_on_commit(uow, store, phone)
+    else:
+        _call(store, "delete", phone)
+
+    logger.info(f"🗑️ Session cleared: {phone}")
+
+
+def _publish_on_commit(uow, store, phone):
+    """
+    Write a session's final state to Redis once the unit of work commits
+
+    Registered once per phone, so several transitions in one request cost
+    a single Redis round-trip. A rolled-back request publishes nothing.
+    """
+
+    if phone in uow.session_publish:
+        return
+
+    uow.session_publish.add(phone)
+
+    # discard() rebinds uow.sessions, so keep a reference to this request's map
+    staged_sessions = uow.sessions
+
+    def publish():
+        staged = staged_sessions.get(phone)
+
+        try:
+            if staged is None:
+                _call(store, "delete", phone)
+            else:
+                _call(store, "save", phone, *staged)
+
+        except Exception:
+            logger.exception(f"❌ Session publish failed: {phone}")
+
+    uow.on_commit(publish)
+
+
+def load_session_snapshot(phone):
+    """
+    Read a session straight from the store (no unit-of-work overlay)
+
+    Returns:
+        tuple: (step, data_json) to pass to compare_and_store_session, or None
+    """
+
+    row = _call(get_session_store(), "load", phone)
+
+    return (row[0], row[1]) if row else None
+
+
+def compare_and_store_session(phone, expected, step, data):
+    """
+    Advance a session only if nobody changed it since it was read
+
+    For background jobs: a user message handled in the meantime makes the
+    write fail instead of being overwritten.
+
+    Args:
+        expected: (step, data_json) from load_session_snapshot()
+
+    Returns:
+        bool: True if the session was written
+    """
+
+    return _call(get_session_store(), "compare_and_save", phone, expected, step, json.dumps(data))
+
+
+def purge_expired_sessions():
+    """
+    Remove expired sessions from the active store
+
+    Returns:
+        int: Number of sessions deleted (always 0 for Redis)
+    """
+
+    return _call(get_session_store(), "purge_expired")
@@ -0,0 +1,440 @@
+"""
+Incremental Statistics
+Counters behind db_engine.get_*_stats and the admin dashboard
+
+Every counter lives in `stat_counters` as (metric, bucket, value), where
+bucket is 'all' or a UTC day ('YYYY-MM-DD'). SQLite triggers keep the
+counters up to date in the same transaction as the write that changes
+them, so reads are a handful of primary-key lookups regardless of how
+large the underlying tables grow.
+
+Metrics:
+- users                      new users (all + day of created_at)
+- users.last_active          users whose last_active falls on that day
+- purchases, purchases:<P>   purchases (all + day / all per product)
+- milan, milan.score,
+  milan.rating:<R>           Milan calculations, score sum, ratings
+- payments, payments.status:<S>,
+  payments.revenue           orders, orders per status, SUCCESS amount
+- api.calls:<API>, api.cost:<API>
+- messages, questions        log rows (all + day)
+
+Usage:
+    python -m backend.engines.stats_engine backfill
+"""
+
+import sys
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# =========================
+# SCHEMA
+# =========================
+
+COUNTERS_TABLE = """
+CREATE TABLE IF NOT EXISTS stat_counters (
+    metric TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    value REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (metric, bucket)
+) WITHOUT ROWID
+"""
+
+
+def _bump(metric, bucket, value="1"):
+    """Trigger statement adding `value` to one counter (SQL expressions)"""
+
+    return f"""
+        INSERT INTO stat_counters(metric, bucket, value)
+        VALUES ({metric}, {bucket}, {value})
+        ON CONFLICT(metric, bucket) DO UPDATE SET value = value + excluded.value;"""
+
+
+def _day(column):
+    return f"COALESCE(date({column}), date('now'))"
+
+
+ALL = "'all'"
+
+# name -> (trigger header, [statements])
+TRIGGERS = {
+    "trg_stats_users_insert": (
+        "AFTER INSERT ON users",
+        [
+            _bump("'users'", ALL),
+            _bump("'users'", _day("NEW.created_at")),
+            _bump("'users.last_active'", _day("NEW.last_active")),
+        ]
+    ),
+    "trg_stats_users_active": (
+        "AFTER UPDATE OF last_active ON users "
+        "WHEN date(OLD.last_active) IS NOT date(NEW.last_active)",
+        [
+            _bump("'users.last_active'", _day("OLD.last_active"), "-1"),
+            _bump("'users.last_active'", _day("NEW.last_active")),
+        ]
+    ),
+    "trg_stats_users_delete": (
+        "AFTER DELETE ON users",
+        [
+            _bump("'users'", ALL, "-1"),
+            _bump("'users'", _day("OLD.created_at"), "-1"),
+            _bump("'users.last_active'", _day("OLD.last_active"), "-1"),
+        ]
+    ),
+    "trg_stats_purchases_insert": (
+        "AFTER INSERT ON purchases",
+        [
+            _bump("'purchases'", ALL),
+            _bump("'purchases'", _day("NEW.purchased_at")),
+            _bump("'purchases:' || NEW.product", ALL),
+        ]
+    ),
+    "trg_stats_milan_insert": (
+        "AFTER INSERT ON milan_calculations",
+        [
+            _bump("'milan'", ALL),
+            _bump("'milan.score'", ALL, "NEW.total_score"),
+            _bump("'milan.rating:' || COALESCE(NEW.rating, 'UNKNOWN')", ALL),
+        ]
+    ),
+    "trg_stats_payments_insert": (
+        "AFTER INSERT ON payment_orders",
+        [
+            _bump("'payments'", ALL),
+            _bump("'payments.status:' || COALESCE(NEW.status, 'UNKNOWN')", ALL),
+            _bump("'payments.revenue'", ALL, "CASE WHEN NEW.status = 'SUCCESS' THEN NEW.amount ELSE 0 END"),
+            _bump("'payments.revenue'", _day("NEW.created_at"), "CASE WHEN NEW.status = 'SUCCESS' THEN NEW.amount ELSE 0 END"),
+        ]
+    ),
+    "trg_stats_payments_status": (
+        "AFTER UPDATE OF status ON payment_orders "
+        "WHEN OLD.status IS NOT NEW.status",
+        [
+            _bump("'payments.status:' || COALESCE(OLD.status, 'UNKNOWN')", ALL, "-1"),
+            _bump("'payments.status:' || COALESCE(NEW.status, 'UNKNOWN')", ALL),
+            _bump(
+                "'payments.revenue'", ALL,
+                "(CASE WHEN NEW.status = 'SUCCESS' THEN NEW.amount ELSE 0 END)"
+                " - (CASE WHEN OLD.status = 'SUCCESS' THEN OLD.amount ELSE 0 END)"
+            ),
+            _bump(
+                "'payments.revenue'", _day("NEW.created_at"),
+                "(CASE WHEN NEW.status = 'SUCCESS' THEN NEW.amount ELSE 0 END)"
+                " - (CASE WHEN OLD.status = 'SUCCESS' THEN OLD.amount ELSE 0 END)"
+            ),
+        ]
+    ),
+    "trg_stats_api_usage_insert": (
+        "AFTER INSERT ON api_usage",
+        [
+            _bump("'api.calls:' || NEW.api_name", ALL),
+            _bump("'api.calls:' || NEW.api_name", _day("NEW.created_at")),
+            _bump("'api.cost:' || NEW.api_name", ALL, "COALESCE(NEW.cost, 0)"),
+            _bump("'api.cost:' || NEW.api_name", _day("NEW.created_at"), "COALESCE(NEW.cost, 0)"),
+        ]
+    ),
+    "trg_stats_messages_insert": (
+        "AFTER INSERT ON message_logs",
+        [
+            _bump("'messages'", ALL),
+            _bump("'messages'", _day("NEW.created_at")),
+        ]
+    ),
+    # cleanup_old_data() prunes old message logs
+    "trg_stats_messages_delete": (
+        "AFTER DELETE ON message_logs",
+        [
+            _bump("'messages'", ALL, "-1"),
+            _bump("'messages'", _day("OLD.created_at"), "-1"),
+        ]
+    ),
+    "trg_stats_questions_insert": (
+        "AFTER INSERT ON questions_log",
+        [
+            _bump("'questions'", ALL),
+            _bump("'questions'", _day("NEW.created_at")),
+        ]
+    ),
+}
+
+
+# Recomputes every counter from the source tables
+BACKFILL = [
+    "DELETE FROM stat_counters",
+    """
+    INSERT INTO stat_counters(metric, bucket, value)
+    SELECT 'users', 'all', COUNT(*) FROM users
+    """,
+    """
+    INSERT INTO stat_counters(metric, bucket, value)
+    SELECT 'users', COALESCE(date(created_at), date('now')), COUNT(*) FROM users GROUP BY 2
+    """,
+    """
+    INSERT INTO stat_counters(metric, bucket, value)
+    SELECT 'users.last_active', COALESCE(date(last_active), date('now')), COUNT(*) FROM users GROUP BY 2
+    """,
+    """
+    INSERT INTO stat_counters(metric, bucket, value)
+    SELECT 'purchases', 'all', COUNT(*) FROM purchases
+    """,
+    """
+    INSERT INTO stat_counters(metric, bucket, value)
+    SELECT 'purchases', COALESCE(date(purchased_at), date('now')), COUNT(*) FROM purchases GROUP BY 2
+    """,
+    """
+    INSERT INTO stat_counters(metric, bucket, value)
+    SELECT 'purchases:' || product, 'all', COUNT(*) FROM purchases GROUP BY product
+    """,
+    """
+    INSERT INTO stat_counters(metric, bucket, value)
+    SELECT 'milan', 'all', COUNT(*) FROM milan_calculations
+    """,
+    """
+    INSERT INTO stat_counters(metric, bucket, value)
+    SELECT 'milan.score', 'all', COALESCE(SUM(total_score), 0) FROM milan_calculations
+    """,
+    """
+    INSERT INTO stat_counters(metric, bucket, value)
+    SELECT 'milan.rating:' || COALESCE(rating, 'UNKNOWN'), 'all', COUNT(*)
+    FROM milan_calculations GROUP BY 1
+    """,
+    """
+    INSERT INTO stat_counters(metric, bucket, value)
+    SELECT 'payments', 'all', COUNT(*) FROM payment_orders
+    """,
+    """
+    INSERT INTO stat_counters(metric, bucket, value)
+    SELECT 'payments.status:' || COALESCE(status, 'UNKNOWN'), 'all', COUNT(*)
+    FROM payment_orders GROUP BY 1
+    """,
+    """
+    INSERT INTO stat_counters(metric, bucket, value)
+    SELECT 'payments.revenue', 'all', COALESCE(SUM(amount), 0)
+    FROM payment_orders WHERE status = 'SUCCESS'
+    """,
+    """
+    INSERT INTO stat_counters(metric, bucket, value)
+    SELECT 'payments.revenue', COALESCE(date(created_at), date('now')), SUM(amount)
+    FROM payment_orders WHERE status = 'SUCCESS' GROUP BY 2
+    """,
+    """
+    INSERT INTO stat_counters(metric, bucket, value)
+    SELECT 'api.calls:' || api_name, 'all', COUNT(*) FROM api_usage GROUP BY api_name
+    """,
+    """
+    INSERT INTO stat_counters(metric, bucket, value)
+    SELECT 'api.calls:' || api_name, COALESCE(date(created_at), date('now')), COUNT(*)
+    FROM api_usage GROUP BY 1, 2
+    """,
+    """
+    INSERT INTO stat_counters(metric, bucket, value)
+    SELECT 'api.cost:' || api_name, 'all', COALESCE(SUM(cost), 0) FROM api_usage GROUP BY api_name
+    """,
+    """
+    INSERT INTO stat_counters(metric, bucket, value)
+    SELECT 'api.cost:' || api_name, COALESCE(date(created_at), date('now')), COALESCE(SUM(cost), 0)
+    FROM api_usage GROUP BY 1, 2
+    """,
+    """
+    INSERT INTO stat_counters(metric, bucket, value)
+    SELECT 'messages', 'all', COUNT(*) FROM message_logs
+    """,
+    """
+    INSERT INTO stat_counters(metric, bucket, value)
+    SELECT 'messages', COALESCE(date(created_at), date('now')), COUNT(*) FROM message_logs GROUP BY 2
+    """,
+    """
+    INSERT INTO stat_counters(metric, bucket, value)
+    SELECT 'questions', 'all', COUNT(*) FROM questions_log
+    """,
+    """
+    INSERT INTO stat_counters(metric, bucket, value)
+    SELECT 'questions', COALESCE(date(created_at), date('now')), COUNT(*) FROM questions_log GROUP BY 2
+    """,
+]
+
+
+# =========================
+# INSTALL / BACKFILL
+# =========================
+
+def install_stat_counters(conn, backfill=None):
+    """
+    Create the counters table and (re)create its triggers
+
+    Triggers and the optional backfill run in one IMMEDIATE transaction,
+    so no write can slip in between the recount and the first trigger.
+
+    Args:
+        conn: Open database connection (source tables must exist)
+        backfill: Recount everything; defaults to True only when the
+            counters table is new
+    """
+
+    cur = conn.cursor()
+
+    if backfill is None:
+        cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='stat_counters'")
+        backfill = cur.fetchone() is None
+
+    conn.commit()
+    cur.execute("BEGIN IMMEDIATE")
+
+    try:
+        cur.execute(COUNTERS_TABLE)
+
+        for name, (header, statements) in TRIGGERS.items():
+            cur.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cur.execute(f"CREATE TRIGGER {name} {header} BEGIN {''.join(statements)} END")
+
+        if backfill:
+            for sql in BACKFILL:
+                cur.execute(sql)
+
+        conn.commit()
+
+    except Exception:
+        conn.rollback()
+        raise
+
+    if backfill:
+        logger.info("📊 Stat counters backfilled")
+
+
+def backfill_counters():
+    """Recount every counter from the source tables"""
+
+    from backend.engines.db_engine import get_conn
+
+    conn = get_conn()
+
+    try:
+        install_stat_counters(conn, backfill=True)
+    finally:
+        conn.close()
+
+
+# =========================
+# READS
+# =========================
+
+def get_counters(metrics=None, prefix=None, bucket="all"):
+    """
+    Read counters for one bucket
+
+    Args:
+        metrics: Exact metric names
+        prefix: Metric name prefix, e.g. 'purchases:'
+        bucket: 'all' or a 'YYYY-MM-DD' day
+
+    Returns:
+        dict: metric -> value (missing metrics are absent)
+    """
+
+    from backend.engines.db_engine import get_conn
+
+    conn = get_conn()
+    cur = conn.cursor()
+
+    if prefix is not None:
+        # Range scan on the primary key instead of LIKE
+        cur.execute("""
+        SELECT metric, value FROM stat_counters
+        WHERE metric >= ? AND metric < ? AND bucket = ?
+        """, (prefix, prefix + "\uffff", bucket))
+    else:
+        placeholders = ",".join("?" * len(metrics))
+        cur.execute(f"""
+        SELECT metric, value FROM stat_counters
+        WHERE metric IN ({placeholders}) AND bucket = ?
+        """, (*metrics, bucket))
+
+    counters = {row["metric"]: row["value"] for row in cur.fetchall()}
+
+    conn.close()
+
+    return counters
+
+
+def get_counter(metric, bucket="all"):
+    """Single counter value (0 if never incremented)"""
+
+    return get_counters([metric], bucket=bucket).get(metric, 0)
+
+
+def get_daily_series(metric=None, prefix=None, days=None):
+    """
+    Per-day values of a metric (or every metric under a prefix)
+
+    Args:
+        days: Only the last N days (including today); None for all
+
+    Returns:
+        list: (metric, day, value) tuples ordered by metric, day
+    """
+
+    from backend.engines.db_engine import get_conn
+
+    conn = get_conn()
+    cur = conn.cursor()
+
+    if prefix is not None:
+        where, params = "metric >= ? AND metric < ?", [prefix, prefix + "\uffff"]
+    else:
+        where, params = "metric = ?", [metric]
+
+    if days is not None:
+        where += " AND bucket >= date('now', ?)"
+        params.append(f"-{int(days) - 1} days")
+
+    # 'all' sorts after every 'YYYY-MM-DD' bucket
+    cur.execute(f"""
+    SELECT metric, bucket, value FROM stat_counters
+    WHERE {where} AND bucket < 'all'
+    ORDER BY metric, bucket
+    """, params)
+
+    series = [(row["metric"], row["bucket"], row["value"]) for row in cur.fetchall()]
+
+    conn.close()
+
+    return series
+
+
+def sum_days(metric=None, prefix=None, days=7):
+    """
+    Sum of a metric's day buckets over the last N days
+
+    Returns:
+        float, or dict metric -> float when prefix is given
+    """
+
+    series = get_daily_series(metric, prefix, days)
+
+    if prefix is None:
+        return sum(value for _, _, value in series)
+
+    totals = {}
+
+    for name, _, value in series:
+        totals[name] = totals.get(name, 0) + value
+
+    return totals
+
+
+# =========================
+# CLI
+# =========================
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    if sys.argv[1:] == ["backfill"]:
+        backfill_counters()
+        print("✅ Stat counters backfilled")
+    else:
+        print("Usage: python -m backend.engines.stats_engine backfill")
+        sys.exit(1)
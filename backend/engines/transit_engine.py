@@ -1,35 +1,132 @@
+"""
+Transit Engine
+Daily planetary transits, precomputed and served from memory
+
+- precompute_transits() (Celery beat) fetches today plus the next
+  TRANSIT_PRECOMPUTE_DAYS days and stores them in the kundali cache
+- Each process serves transits from an immutable in-memory snapshot,
+  rebuilt from the cache when the day rolls over; the QnA hot path never
+  waits on Prokerala unless nothing was precomputed
+- get_transit_range() answers arbitrary date ranges (future-dated
+  questions) from the same store
+
+Transits are geocentric sidereal positions, so they are computed for one
+reference point: noon IST at Ujjain, the traditional meridian of Indian
+astronomy.
+"""
+
+import time
 import logging
 import datetime
-from backend.services.prokerala import get_prokerala_data
-from backend.engines.db_engine import get_kundali_cache, save_kundali_cache
+import threading
+from types import MappingProxyType
+
+from backend.config import Config
+from backend.services.prokerala import combine_datetime, get_kundali_data
+from backend.engines.db_engine import get_kundali_cache, peek_kundali_cache, save_kundali_cache
+from backend.utils.singleflight import get_flight, SingleFlightTimeout
+from backend.utils.resilience import UpstreamUnavailable
 
 logger = logging.getLogger(__name__)
 
 TRANSIT_KEY = "DAILY_TRANSIT"
 
+# Reference point for transit charts
+REFERENCE_LAT = 23.1765
+REFERENCE_LON = 75.7885
+REFERENCE_TIME = "12:00 PM"
+REFERENCE_OFFSET = "+05:30"
 
-def get_daily_transits():
+# Don't rebuild the snapshot from the cache more often than this
+SNAPSHOT_RELOAD_SECONDS = 60
 
-    today = datetime.date.today().isoformat()
 
-    cache_key = f"{TRANSIT_KEY}_{today}"
+# =========================
+# SNAPSHOT
+# =========================
 
-    cached = get_kundali_cache(cache_key)
+# date ISO -> tuple of read-only transit entries; replaced, never mutated
+_snapshot = MappingProxyType({})
+_snapshot_lock = threading.Lock()
+_snapshot_loaded_at = 0.0
 
-    if cached:
-        logger.info("⚡ Transit cache hit")
-        return cached
 
-    # Use noon time (safe for transits)
-    time_str = "12:00 PM"
+def _cache_key(day):
+    return f"{TRANSIT_KEY}_{day.isoformat()}"
+
+
+def _freeze(transits):
+    return tuple(MappingProxyType(dict(t)) for t in transits)
+
+
+def _publish(entries):
+    """Swap in a new snapshot with `entries` merged over the current one"""
+
+    global _snapshot, _snapshot_loaded_at
+
+    with _snapshot_lock:
+        today = datetime.date.today().isoformat()
+
+        merged = {d: t for d, t in _snapshot.items() if d >= today}
+        merged.update(entries)
+
+        _snapshot = MappingProxyType(merged)
+        _snapshot_loaded_at = time.monotonic()
+
+
+def load_snapshot(days=None):
+    """
+    Rebuild the snapshot from the durable cache
+
+    Args:
+        days: Days ahead to load (default: TRANSIT_PRECOMPUTE_DAYS)
+
+    Returns:
+        int: Days found in the cache
+    """
+
+    days = Config.TRANSIT_PRECOMPUTE_DAYS if days is None else days
+    today = datetime.date.today()
+
+    entries = {}
+
+    for offset in range(days + 1):
+        day = today + datetime.timedelta(days=offset)
+        cached = get_kundali_cache(_cache_key(day))
+
+        if cached:
+            entries[day.isoformat()] = _freeze(cached)
+
+    _publish(entries)
+
+    return len(entries)
+
+
+def get_snapshot_stats():
+    """Days held in memory, for health checks"""
+
+    snapshot = _snapshot
+
+    return {
+        "days": sorted(snapshot.keys()),
+        "age_seconds": round(time.monotonic() - _snapshot_loaded_at, 1) if _snapshot_loaded_at else None
+    }
+
+
+# =========================
+# FETCH
+# =========================
+
+def _fetch_transits(day):
+    """Fetch one day's transits from Prokerala"""
+
+    datetime_str = combine_datetime(day.strftime("%d-%m-%Y"), REFERENCE_TIME, REFERENCE_OFFSET)
 
     try:
-        transit_data = get_prokerala_data(
-            dob=today,
-            time_str=time_str,
-            latitude=0,
-            longitude=0
-        )
+        transit_data = get_kundali_data(datetime_str, REFERENCE_LAT, REFERENCE_LON)
+    except UpstreamUnavailable as e:
+        logger.warning(f"🔌 Transit fetch skipped: {e}")
+        return None
     except Exception:
         logger.exception("❌ Transit fetch failed")
         return None
@@ -48,8 +145,158 @@ def get_daily_transits():
             "degree": p.get("degree")
         })
 
-    save_kundali_cache(cache_key, transits)
+    # Keep each day until it has passed
+    ttl = max(1, (day - datetime.date.today()).days + 2) * 86400
+    save_kundali_cache(_cache_key(day), transits, ttl_seconds=ttl)
 
-    logger.info("🌍 Daily transit cached")
+    logger.info(f"🌍 Transits cached for {day.isoformat()}")
 
     return transits
+
+
+def _load_or_fetch(day):
+    """Cache, then a coalesced live fetch"""
+
+    cache_key = _cache_key(day)
+
+    cached = get_kundali_cache(cache_key)
+
+    if cached:
+        return cached
+
+    try:
+        return get_flight("transit").do(
+            cache_key,
+            lambda: _fetch_transits(day),
+            peek=lambda: peek_kundali_cache(cache_key)
+        )
+    except SingleFlightTimeout:
+        logger.warning(f"⏳ Gave up waiting for transits of {day.isoformat()}")
+        return None
+
+
+def precompute_transits(days=None):
+    """
+    Fetch today plus the next `days` days (only those not cached yet)
+
+    Returns:
+        dict: {"fetched", "cached", "failed"} day counts
+    """
+
+    days = Config.TRANSIT_PRECOMPUTE_DAYS if days is None else days
+    today = datetime.date.today()
+
+    result = {"fetched": 0, "cached": 0, "failed": 0}
+    entries = {}
+
+    for offset in range(days + 1):
+        day = today + datetime.timedelta(days=offset)
+
+        transits = get_kundali_cache(_cache_key(day))
+
+        if transits:
+            result["cached"] += 1
+        else:
+            transits = _fetch_transits(day)
+            result["fetched" if transits else "failed"] += 1
+
+        if transits:
+            entries[day.isoformat()] = _freeze(transits)
+
+    _publish(entries)
+
+    logger.info(f"🌍 Transits precomputed: {result}")
+
+    return result
+
+
+# =========================
+# PUBLIC API
+# =========================
+
+def get_transits(day, fetch=True):
+    """
+    Transits for one day
+
+    Args:
+        day: datetime.date
+        fetch: Fall back to a live fetch if nothing is stored
+
+    Returns:
+        tuple: Read-only transit entries ({"name", "sign", "degree"}) or None
+    """
+
+    key = day.isoformat()
+    transits = _snapshot.get(key)
+
+    if transits is not None:
+        return transits
+
+    # Day rolled over or this process started after the precompute
+    if time.monotonic() - _snapshot_loaded_at > SNAPSHOT_RELOAD_SECONDS:
+        load_snapshot()
+        transits = _snapshot.get(key)
+
+        if transits is not None:
+            return transits
+
+    if not fetch:
+        return None
+
+    fetched = _load_or_fetch(day)
+
+    if not fetched:
+        return None
+
+    frozen = _freeze(fetched)
+    _publish({key: frozen})
+
+    return frozen
+
+
+def get_transit_range(start, end, fetch=False):
+    """
+    Transits for every day in [start, end]
+
+    Args:
+        start: datetime.date
+        end: datetime.date (inclusive)
+        fetch: Fetch days that were not precomputed
+
+    Returns:
+        dict: {date ISO: transits}; days without data are omitted
+    """
+
+    if end < start:
+        start, end = end, start
+
+    span = (end - start).days + 1
+
+    if span > Config.TRANSIT_MAX_RANGE_DAYS:
+        raise ValueError(f"Transit range limited to {Config.TRANSIT_MAX_RANGE_DAYS} days")
+
+    result = {}
+
+    for offset in range(span):
+        day = start + datetime.timedelta(days=offset)
+        transits = _snapshot.get(day.isoformat())
+
+        if transits is None:
+            cached = get_kundali_cache(_cache_key(day))
+
+            if cached:
+                transits = _freeze(cached)
+            elif fetch:
+                fetched = _load_or_fetch(day)
+                transits = _freeze(fetched) if fetched else None
+
+        if transits is not None:
+            result[day.isoformat()] = transits
+
+    return result
+
+
+def get_daily_transits():
+    """Today's transits (QnA hot path)"""
+
+    return get_transits(datetime.date.today())
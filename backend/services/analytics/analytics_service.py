@@ -6,7 +6,6 @@ Revenue tracking, conversion funnel, and business metrics
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List
-import sqlite3
 
 logger = logging.getLogger(__name__)
 
@@ -21,11 +20,28 @@ class AnalyticsService:
     - Payment success rate
     - Product-wise breakdowns
     - User LTV
+    
+    Reads the materialized rollups (see rollup_service), which the
+    refresh_rollups task keeps up to date. Day windows are whole UTC
+    days: today plus the previous N-1 days.
     """
     
     def __init__(self, session=None):
         self.session = session
     
+    def _connect(self):
+        from backend.engines.db_engine import get_conn
+        from backend.services.analytics.rollup_service import ensure_rollups_fresh
+        
+        ensure_rollups_fresh()
+        
+        return get_conn()
+    
+    @staticmethod
+    def _since(days: int) -> str:
+        """First day (YYYY-MM-DD, UTC) of an N-day window ending today"""
+        return (datetime.utcnow() - timedelta(days=max(days, 1) - 1)).strftime("%Y-%m-%d")
+    
     def get_revenue_summary(self, days: int = 30) -> Dict:
         """
         Get revenue summary for last N days
@@ -36,24 +52,19 @@ class AnalyticsService:
         Returns:
             dict: Revenue summary
         """
-        from backend.engines.db_engine import get_conn
-        
         try:
-            start_date = datetime.now() - timedelta(days=days)
-            
-            conn = get_conn()
+            conn = self._connect()
             cursor = conn.cursor()
             
             # Total revenue
             cursor.execute("""
                 SELECT 
-                    COUNT(*) as order_count,
-                    SUM(amount) as total_revenue,
-                    AVG(amount) as avg_order_value
-                FROM payment_orders
+                    SUM(orders) as order_count,
+                    SUM(amount) as total_revenue
+                FROM order_daily_rollup
                 WHERE status = 'SUCCESS'
-                AND created_at >= ?
-            """, (start_date,))
+                AND day >= ?
+            """, (self._since(days),))
             
             summary = cursor.fetchone()
             
@@ -61,39 +72,42 @@ class AnalyticsService:
             cursor.execute("""
                 SELECT 
                     product_type,
-                    COUNT(*) as count,
+                    SUM(orders) as count,
                     SUM(amount) as revenue
-                FROM payment_orders
+                FROM order_daily_rollup
                 WHERE status = 'SUCCESS'
-                AND created_at >= ?
+                AND day >= ?
                 GROUP BY product_type
-            """, (start_date,))
+            """, (self._since(days),))
             
             by_product = cursor.fetchall()
             
             # Daily revenue (last 7 days)
             cursor.execute("""
                 SELECT 
-                    DATE(created_at) as date,
-                    COUNT(*) as orders,
+                    day as date,
+                    SUM(orders) as orders,
                     SUM(amount) as revenue
-                FROM payment_orders
+                FROM order_daily_rollup
                 WHERE status = 'SUCCESS'
-                AND created_at >= ?
-                GROUP BY DATE(created_at)
-                ORDER BY date DESC
+                AND day >= ?
+                GROUP BY day
+                ORDER BY day DESC
                 LIMIT 7
-            """, (datetime.now() - timedelta(days=7),))
+            """, (self._since(7),))
             
             daily_revenue = cursor.fetchall()
             
             conn.close()
             
+            order_count = summary["order_count"] or 0
+            total_revenue = float(summary["total_revenue"] or 0)
+            
             return {
                 "period_days": days,
-                "total_revenue": float(summary["total_revenue"] or 0),
-                "order_count": summary["order_count"] or 0,
-                "avg_order_value": float(summary["avg_order_value"] or 0),
+                "total_revenue": total_revenue,
+                "order_count": order_count,
+                "avg_order_value": total_revenue / order_count if order_count else 0.0,
                 "by_product": [
                     {
                         "product": row["product_type"],
@@ -116,6 +130,43 @@ class AnalyticsService:
             logger.error(f"❌ Error getting revenue summary: {e}")
             return {}
     
+    def get_day_revenue(self, day: str) -> Dict:
+        """
+        Revenue of one whole UTC day
+        
+        Args:
+            day: Day as YYYY-MM-DD (UTC)
+        
+        Returns:
+            dict: {"day", "total_revenue", "order_count"}
+        """
+        try:
+            conn = self._connect()
+            cursor = conn.cursor()
+            
+            cursor.execute("""
+                SELECT 
+                    SUM(orders) as order_count,
+                    SUM(amount) as total_revenue
+                FROM order_daily_rollup
+                WHERE status = 'SUCCESS'
+                AND day = ?
+            """, (day,))
+            
+            row = cursor.fetchone()
+            
+            conn.close()
+            
+            return {
+                "day": day,
+                "total_revenue": float(row["total_revenue"] or 0),
+                "order_count": row["order_count"] or 0
+            }
+        
+        except Exception as e:
+            logger.error(f"❌ Error getting revenue for {day}: {e}")
+            return {}
+    
     def get_mrr(self) -> float:
         """
         Calculate Monthly Recurring Revenue (MRR)
@@ -125,20 +176,16 @@ class AnalyticsService:
         Returns:
             float: MRR in INR
         """
-        from backend.engines.db_engine import get_conn
-        
         try:
-            start_date = datetime.now() - timedelta(days=30)
-            
-            conn = get_conn()
+            conn = self._connect()
             cursor = conn.cursor()
             
             cursor.execute("""
                 SELECT SUM(amount) as revenue
-                FROM payment_orders
+                FROM order_daily_rollup
                 WHERE status = 'SUCCESS'
-                AND created_at >= ?
-            """, (start_date,))
+                AND day >= ?
+            """, (self._since(30),))
             
             result = cursor.fetchone()
             conn.close()
@@ -160,40 +207,26 @@ class AnalyticsService:
         Returns:
             dict: Funnel data (viewed → initiated → paid)
         """
-        from backend.engines.db_engine import get_conn
-        
         try:
-            conn = get_conn()
+            conn = self._connect()
             cursor = conn.cursor()
             
-            # Orders initiated
-            cursor.execute("""
-                SELECT COUNT(*) as count
-                FROM payment_orders
-                WHERE created_at >= date('now', '-30 days')
-            """)
-            initiated = cursor.fetchone()["count"]
-            
-            # Orders paid
             cursor.execute("""
-                SELECT COUNT(*) as count
-                FROM payment_orders
-                WHERE status = 'SUCCESS'
-                AND created_at >= date('now', '-30 days')
-            """)
-            paid = cursor.fetchone()["count"]
-            
-            # Orders failed
-            cursor.execute("""
-                SELECT COUNT(*) as count
-                FROM payment_orders
-                WHERE status = 'FAILED'
-                AND created_at >= date('now', '-30 days')
-            """)
-            failed = cursor.fetchone()["count"]
+                SELECT 
+                    SUM(orders) as initiated,
+                    SUM(CASE WHEN status = 'SUCCESS' THEN orders ELSE 0 END) as paid,
+                    SUM(CASE WHEN status = 'FAILED' THEN orders ELSE 0 END) as failed
+                FROM order_daily_rollup
+                WHERE day >= ?
+            """, (self._since(30),))
             
+            result = cursor.fetchone()
             conn.close()
             
+            initiated = result["initiated"] or 0
+            paid = result["paid"] or 0
+            failed = result["failed"] or 0
+            
             # Calculate conversion rate
             conversion_rate = (paid / initiated * 100) if initiated > 0 else 0
             
@@ -220,22 +253,18 @@ class AnalyticsService:
         Returns:
             dict: Success rate metrics
         """
-        from backend.engines.db_engine import get_conn
-        
         try:
-            start_date = datetime.now() - timedelta(days=days)
-            
-            conn = get_conn()
+            conn = self._connect()
             cursor = conn.cursor()
             
             cursor.execute("""
                 SELECT 
                     status,
-                    COUNT(*) as count
-                FROM payment_orders
-                WHERE created_at >= ?
+                    SUM(orders) as count
+                FROM order_daily_rollup
+                WHERE day >= ?
                 GROUP BY status
-            """, (start_date,))
+            """, (self._since(days),))
             
             status_counts = {row["status"]: row["count"] for row in cursor.fetchall()}
             
@@ -247,15 +276,13 @@ class AnalyticsService:
             cursor.execute("""
                 SELECT 
                     error_code,
-                    COUNT(*) as count
-                FROM payment_orders
-                WHERE status = 'FAILED'
-                AND created_at >= ?
-                AND error_code IS NOT NULL
+                    SUM(failures) as count
+                FROM order_failure_daily_rollup
+                WHERE day >= ?
                 GROUP BY error_code
                 ORDER BY count DESC
                 LIMIT 5
-            """, (start_date,))
+            """, (self._since(days),))
             
             failure_reasons = cursor.fetchall()
             
@@ -290,36 +317,27 @@ class AnalyticsService:
         Returns:
             dict: LTV metrics
         """
-        from backend.engines.db_engine import get_conn
-        
         try:
-            conn = get_conn()
+            conn = self._connect()
             cursor = conn.cursor()
             
             if phone:
                 # Specific user LTV
                 cursor.execute("""
-                    SELECT 
-                        phone,
-                        COUNT(*) as order_count,
-                        SUM(amount) as total_spent,
-                        AVG(amount) as avg_order_value,
-                        MIN(created_at) as first_order,
-                        MAX(created_at) as last_order
-                    FROM payment_orders
-                    WHERE status = 'SUCCESS'
-                    AND phone = ?
-                    GROUP BY phone
+                    SELECT phone, order_count, total_spent, first_order, last_order
+                    FROM customer_rollup
+                    WHERE phone = ?
                 """, (phone,))
                 
                 result = cursor.fetchone()
+                conn.close()
                 
                 if result:
                     return {
                         "phone": result["phone"],
                         "ltv": float(result["total_spent"]),
                         "order_count": result["order_count"],
-                        "avg_order_value": float(result["avg_order_value"]),
+                        "avg_order_value": float(result["total_spent"]) / result["order_count"],
                         "first_order": result["first_order"],
                         "last_order": result["last_order"]
                     }
@@ -330,17 +348,10 @@ class AnalyticsService:
                 # Average LTV across all users
                 cursor.execute("""
                     SELECT 
-                        AVG(user_ltv) as avg_ltv,
-                        MAX(user_ltv) as max_ltv,
-                        MIN(user_ltv) as min_ltv
-                    FROM (
-                        SELECT 
-                            phone,
-                            SUM(amount) as user_ltv
-                        FROM payment_orders
-                        WHERE status = 'SUCCESS'
-                        GROUP BY phone
-                    )
+                        AVG(total_spent) as avg_ltv,
+                        MAX(total_spent) as max_ltv,
+                        MIN(total_spent) as min_ltv
+                    FROM customer_rollup
                 """)
                 
                 result = cursor.fetchone()
@@ -366,21 +377,13 @@ class AnalyticsService:
         Returns:
             list: Top customers
         """
-        from backend.engines.db_engine import get_conn
-        
         try:
-            conn = get_conn()
+            conn = self._connect()
             cursor = conn.cursor()
             
             cursor.execute("""
-                SELECT 
-                    phone,
-                    COUNT(*) as order_count,
-                    SUM(amount) as total_spent,
-                    MAX(created_at) as last_order
-                FROM payment_orders
-                WHERE status = 'SUCCESS'
-                GROUP BY phone
+                SELECT phone, order_count, total_spent, last_order
+                FROM customer_rollup
                 ORDER BY total_spent DESC
                 LIMIT ?
             """, (limit,))
@@ -409,13 +412,16 @@ class AnalyticsService:
         Returns:
             dict: All key metrics for admin dashboard
         """
+        from backend.services.analytics.rollup_service import get_rollup_state
+        
         return {
             "revenue_summary": self.get_revenue_summary(days=30),
             "mrr": self.get_mrr(),
             "conversion_funnel": self.get_conversion_funnel(),
             "success_rate": self.get_payment_success_rate(days=7),
             "average_ltv": self.get_user_ltv(),
-            "top_customers": self.get_top_customers(limit=10)
+            "top_customers": self.get_top_customers(limit=10),
+            "rollups": get_rollup_state()
         }
 
 
@@ -0,0 +1,284 @@
+"""
+Rollup Service
+Materialized daily fact tables behind AnalyticsService
+
+Tables:
+- order_daily_rollup: orders and amount per (day, product_type, status)
+- order_failure_daily_rollup: failed orders per (day, error code)
+- customer_rollup: per-phone totals of successful orders, with the
+  cohort month of the customer's first successful order
+- rollup_state: high-water mark of the last refresh
+
+Refresh is incremental: only orders created or updated since the
+high-water mark are looked at, and the days / phones they touch are
+recomputed from payment_orders. Recomputing is idempotent, so the scan
+starts a little before the mark to pick up late-committed rows.
+"""
+
+import time
+import logging
+import threading
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+ROLLUP_NAME = "payment_orders"
+
+# Re-scan this far behind the high-water mark (late commits, clock skew)
+OVERLAP_SECONDS = 300
+
+# Same expression as the idx_payment_orders_touched index
+TOUCHED_AT = "COALESCE(updated_at, created_at)"
+
+# Set once this process has seen the rollups built (ensure_rollups_fresh)
+_rollups_ready = False
+_rollups_ready_lock = threading.Lock()
+
+
+# =========================
+# SCHEMA
+# =========================
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS order_daily_rollup (
+        day TEXT NOT NULL,
+        product_type TEXT NOT NULL,
+        status TEXT NOT NULL,
+        orders INTEGER NOT NULL,
+        amount REAL NOT NULL,
+        PRIMARY KEY (day, product_type, status)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS order_failure_daily_rollup (
+        day TEXT NOT NULL,
+        error_code TEXT NOT NULL,
+        failures INTEGER NOT NULL,
+        PRIMARY KEY (day, error_code)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS customer_rollup (
+        phone TEXT PRIMARY KEY,
+        order_count INTEGER NOT NULL,
+        total_spent REAL NOT NULL,
+        first_order TIMESTAMP,
+        last_order TIMESTAMP,
+        cohort_month TEXT
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rollup_state (
+        name TEXT PRIMARY KEY,
+        high_water_mark TIMESTAMP,
+        refreshed_at TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_customer_rollup_spent ON customer_rollup(total_spent DESC)",
+    "CREATE INDEX IF NOT EXISTS idx_customer_rollup_cohort ON customer_rollup(cohort_month)",
+    f"CREATE INDEX IF NOT EXISTS idx_payment_orders_touched ON payment_orders({TOUCHED_AT})",
+]
+
+
+def ensure_rollup_tables(conn):
+    """Create rollup tables and indexes if missing"""
+
+    for sql in SCHEMA:
+        conn.execute(sql)
+
+    conn.commit()
+
+
+def _error_code_column(conn):
+    """
+    Column holding the failure reason
+
+    The SQLAlchemy Order model adds error_code; the legacy schema only
+    has error_message.
+    """
+
+    columns = {row["name"] for row in conn.execute("PRAGMA table_info(payment_orders)")}
+
+    return "error_code" if "error_code" in columns else "error_message"
+
+
+# =========================
+# REFRESH
+# =========================
+
+def refresh_rollups(full: bool = False) -> Dict:
+    """
+    Bring the rollup tables up to date
+
+    Args:
+        full: Ignore the high-water mark and rebuild everything
+
+    Returns:
+        dict: Days / customers recomputed and the new high-water mark
+    """
+
+    from backend.engines.db_engine import get_conn
+
+    started = time.monotonic()
+
+    conn = get_conn()
+
+    try:
+        ensure_rollup_tables(conn)
+
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+
+        cur.execute("SELECT high_water_mark FROM rollup_state WHERE name=?", (ROLLUP_NAME,))
+        row = cur.fetchone()
+
+        hwm = None if full or row is None else row["high_water_mark"]
+
+        if hwm is None:
+            since_sql, since_params = "", ()
+
+            cur.execute("DELETE FROM order_daily_rollup")
+            cur.execute("DELETE FROM order_failure_daily_rollup")
+            cur.execute("DELETE FROM customer_rollup")
+        else:
+            since_sql = f"WHERE {TOUCHED_AT} >= datetime(?, ?)"
+            since_params = (hwm, f"-{OVERLAP_SECONDS} seconds")
+
+        cur.execute(f"SELECT MAX({TOUCHED_AT}) AS mark FROM payment_orders {since_sql}", since_params)
+        new_hwm = cur.fetchone()["mark"] or hwm
+
+        cur.execute(f"SELECT DISTINCT date(created_at) AS day FROM payment_orders {since_sql}", since_params)
+        days = [r["day"] for r in cur.fetchall() if r["day"]]
+
+        cur.execute(f"SELECT DISTINCT phone FROM payment_orders {since_sql}", since_params)
+        phones = [r["phone"] for r in cur.fetchall()]
+
+        error_column = _error_code_column(conn)
+
+        for day in days:
+            _refresh_day(cur, day, error_column)
+
+        for phone in phones:
+            _refresh_customer(cur, phone)
+
+        cur.execute("""
+        INSERT INTO rollup_state(name, high_water_mark, refreshed_at)
+        VALUES (?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(name) DO UPDATE SET
+            high_water_mark=excluded.high_water_mark,
+            refreshed_at=excluded.refreshed_at
+        """, (ROLLUP_NAME, new_hwm))
+
+        conn.commit()
+
+    except Exception:
+        conn.rollback()
+        raise
+
+    finally:
+        conn.close()
+
+    result = {
+        "full": hwm is None,
+        "days": len(days),
+        "customers": len(phones),
+        "high_water_mark": new_hwm,
+        "duration_ms": round((time.monotonic() - started) * 1000, 2)
+    }
+
+    logger.info(f"📊 Rollups refreshed: {result['days']} days, {result['customers']} customers")
+
+    return result
+
+
+def _refresh_day(cur, day, error_column):
+    # Range on created_at so the index is used
+    day_range = "created_at >= ? AND created_at < date(?, '+1 day')"
+
+    cur.execute("DELETE FROM order_daily_rollup WHERE day=?", (day,))
+    cur.execute(f"""
+    INSERT INTO order_daily_rollup(day, product_type, status, orders, amount)
+    SELECT ?, product_type, COALESCE(status, 'UNKNOWN'), COUNT(*), COALESCE(SUM(amount), 0)
+    FROM payment_orders
+    WHERE {day_range}
+    GROUP BY product_type, COALESCE(status, 'UNKNOWN')
+    """, (day, day, day))
+
+    cur.execute("DELETE FROM order_failure_daily_rollup WHERE day=?", (day,))
+    cur.execute(f"""
+    INSERT INTO order_failure_daily_rollup(day, error_code, failures)
+    SELECT ?, {error_column}, COUNT(*)
+    FROM payment_orders
+    WHERE {day_range}
+    AND status = 'FAILED'
+    AND {error_column} IS NOT NULL
+    GROUP BY {error_column}
+    """, (day, day, day))
+
+
+def _refresh_customer(cur, phone):
+    cur.execute("DELETE FROM customer_rollup WHERE phone=?", (phone,))
+    cur.execute("""
+    INSERT INTO customer_rollup(phone, order_count, total_spent, first_order, last_order, cohort_month)
+    SELECT phone, COUNT(*), SUM(amount), MIN(created_at), MAX(created_at), strftime('%Y-%m', MIN(created_at))
+    FROM payment_orders
+    WHERE phone = ? AND status = 'SUCCESS'
+    GROUP BY phone
+    """, (phone,))
+
+
+def ensure_rollups_fresh():
+    """
+    Build the rollups on first use, before the periodic task has run
+
+    Checked once per process; afterwards the periodic refresh keeps them
+    current.
+    """
+
+    global _rollups_ready
+
+    if _rollups_ready:
+        return
+
+    from backend.engines.db_engine import get_conn
+
+    with _rollups_ready_lock:
+        if _rollups_ready:
+            return
+
+        conn = get_conn()
+
+        try:
+            ensure_rollup_tables(conn)
+
+            row = conn.execute(
+                "SELECT 1 FROM rollup_state WHERE name=?", (ROLLUP_NAME,)
+            ).fetchone()
+        finally:
+            conn.close()
+
+        if row is None:
+            refresh_rollups(full=True)
+
+        _rollups_ready = True
+
+
+def get_rollup_state() -> Dict:
+    """High-water mark and last refresh time"""
+
+    from backend.engines.db_engine import get_conn
+
+    conn = get_conn()
+
+    try:
+        ensure_rollup_tables(conn)
+
+        row = conn.execute(
+            "SELECT high_water_mark, refreshed_at FROM rollup_state WHERE name=?", (ROLLUP_NAME,)
+        ).fetchone()
+    finally:
+        conn.close()
+
+    return dict(row) if row else {"high_water_mark": None, "refreshed_at": None}
@@ -1,4 +1,4 @@
-import requests
+from backend.services.http_client import get_session
 
 def geocode_city(city):
     url = "https://nominatim.openstreetmap.org/search"
@@ -11,7 +11,7 @@ def geocode_city(city):
         "User-Agent": "BoloAstro/1.0"
     }
 
-    r = requests.get(url, params=params, headers=headers, timeout=10)
+    r = get_session("nominatim").get(url, params=params, headers=headers)
     r.raise_for_status()
 
     data = r.json()
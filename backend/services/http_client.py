@@ -0,0 +1,271 @@
+"""
+Outbound HTTP Client
+One pooled, keep-alive requests.Session per upstream
+
+Each upstream gets its own connection pool size, connect/read timeouts
+and retry budget. Idempotent requests (and requests that never reached
+the server) are retried on connection errors and 429/502/503/504 with
+full-jitter exponential backoff. Every attempt is timed into a latency
+histogram keyed by upstream and status code.
+
+Usage:
+    from backend.services.http_client import get_session
+
+    response = get_session("nominatim").get(url, params=params)
+
+Razorpay and Twilio SDK clients are built on the same sessions through
+get_razorpay_client() / get_twilio_client().
+"""
+
+import time
+import random
+import logging
+import threading
+from bisect import bisect_left
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+# =========================
+# UPSTREAMS
+# =========================
+
+# pool: connections kept alive per host
+# connect / read: timeouts in seconds
+# retries: extra attempts for retryable requests
+UPSTREAMS = {
+    "prokerala": {"pool": 20, "connect": 3.05, "read": Config.PROKERALA_TIMEOUT_SECONDS,
+                  "retries": Config.PROKERALA_MAX_RETRIES},
+    "nominatim": {"pool": 4, "connect": 3.05, "read": 10, "retries": 2},
+    "razorpay": {"pool": 10, "connect": 3.05, "read": 15, "retries": 2},
+    "twilio": {"pool": 10, "connect": 3.05, "read": 10, "retries": 2},
+    "default": {"pool": 10, "connect": 3.05, "read": 10, "retries": 1},
+}
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUSES = {429, 502, 503, 504}
+
+BACKOFF_BASE_SECONDS = 0.25
+BACKOFF_MAX_SECONDS = 4.0
+
+# Latency histogram bucket upper bounds (ms); the last bucket is +inf
+LATENCY_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+
+# =========================
+# METRICS
+# =========================
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def _observe(upstream, status, elapsed_ms):
+    key = (upstream, str(status))
+
+    with _metrics_lock:
+        entry = _metrics.get(key)
+
+        if entry is None:
+            entry = _metrics[key] = {
+                "count": 0,
+                "total_ms": 0.0,
+                "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1)
+            }
+
+        entry["count"] += 1
+        entry["total_ms"] += elapsed_ms
+        entry["buckets"][bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+
+def get_http_stats():
+    """
+    Latency histograms per upstream and status
+
+    Returns:
+        dict: {upstream: {status: {"count", "avg_ms", "buckets"}}}
+              status is the HTTP code or "error" for failed connections
+    """
+
+    labels = [f"le_{b}" for b in LATENCY_BUCKETS_MS] + ["inf"]
+    stats = {}
+
+    with _metrics_lock:
+        for (upstream, status), entry in _metrics.items():
+            stats.setdefault(upstream, {})[status] = {
+                "count": entry["count"],
+                "avg_ms": round(entry["total_ms"] / entry["count"], 1),
+                "buckets": dict(zip(labels, entry["buckets"]))
+            }
+
+    return stats
+
+
+# =========================
+# SESSION
+# =========================
+
+class UpstreamSession(requests.Session):
+    """
+    requests.Session with default timeouts, retries and metrics
+
+    Instrumentation lives in send() so SDKs that prepare and send
+    requests themselves (Twilio) get it too.
+    """
+
+    def __init__(self, upstream, pool, connect, read, retries):
+        super().__init__()
+
+        self.upstream = upstream
+        self.timeout = (connect, read)
+        self.retries = retries
+
+        adapter = HTTPAdapter(pool_connections=pool, pool_maxsize=pool, max_retries=0)
+
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+
+        idempotent = request.method in IDEMPOTENT_METHODS
+        attempt = 0
+
+        while True:
+            started = time.monotonic()
+
+            try:
+                response = super().send(request, **kwargs)
+
+            except requests.ConnectionError as e:
+                _observe(self.upstream, "error", (time.monotonic() - started) * 1000)
+
+                # A connect timeout means the request never left; safe for POST too
+                retryable = idempotent or isinstance(e, requests.ConnectTimeout)
+
+                if not retryable or attempt >= self.retries:
+                    raise
+
+                delay = self._backoff(attempt)
+                logger.warning(f"⚠️ {self.upstream} {request.method} failed ({e}), retrying in {delay:.2f}s")
+
+            except requests.Timeout:
+                _observe(self.upstream, "error", (time.monotonic() - started) * 1000)
+
+                if not idempotent or attempt >= self.retries:
+                    raise
+
+                delay = self._backoff(attempt)
+                logger.warning(f"⚠️ {self.upstream} {request.method} timed out, retrying in {delay:.2f}s")
+
+            else:
+                _observe(self.upstream, response.status_code, (time.monotonic() - started) * 1000)
+
+                if (
+                    response.status_code not in RETRY_STATUSES
+                    or not idempotent
+                    or attempt >= self.retries
+                ):
+                    return response
+
+                delay = self._retry_after(response) or self._backoff(attempt)
+                logger.warning(
+                    f"⚠️ {self.upstream} {request.method} returned {response.status_code}, "
+                    f"retrying in {delay:.2f}s"
+                )
+                response.close()
+
+            attempt += 1
+            time.sleep(delay)
+
+    def _backoff(self, attempt):
+        # Full jitter: spreads retries from many workers apart
+        return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** attempt)))
+
+    def _retry_after(self, response):
+        try:
+            value = float(response.headers.get("Retry-After", ""))
+        except ValueError:
+            return None
+
+        return min(value, BACKOFF_MAX_SECONDS)
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(upstream, retries=None):
+    """
+    Get the shared session for an upstream
+
+    Args:
+        upstream: "prokerala", "nominatim", "razorpay", "twilio" (any other
+            name gets the "default" settings)
+        retries: Override the upstream's retry budget; retries=0 is for
+            calls made through an UpstreamGuard, whose timeout and
+            breaker must see single attempts
+
+    Returns:
+        UpstreamSession
+    """
+
+    key = (upstream, retries)
+    session = _sessions.get(key)
+
+    if session is not None:
+        return session
+
+    with _sessions_lock:
+        session = _sessions.get(key)
+
+        if session is None:
+            settings = dict(UPSTREAMS.get(upstream, UPSTREAMS["default"]))
+
+            if retries is not None:
+                settings["retries"] = retries
+
+            session = _sessions[key] = UpstreamSession(upstream, **settings)
+
+    return session
+
+
+# =========================
+# SDK CLIENTS
+# =========================
+
+def get_razorpay_client():
+    """
+    Razorpay client on the shared "razorpay" session
+
+    Returns:
+        razorpay.Client or None if keys are not configured
+    """
+
+    if not Config.RAZORPAY_KEY_ID or not Config.RAZORPAY_KEY_SECRET:
+        return None
+
+    import razorpay
+
+    return razorpay.Client(
+        session=get_session("razorpay"),
+        auth=(Config.RAZORPAY_KEY_ID, Config.RAZORPAY_KEY_SECRET)
+    )
+
+
+def get_twilio_client():
+    """Twilio REST client on the shared "twilio" session"""
+
+    from twilio.rest import Client
+    from twilio.http.http_client import TwilioHttpClient
+
+    http_client = TwilioHttpClient(pool_connections=False)
+    http_client.session = get_session("twilio")
+
+    return Client(Config.TWILIO_ACCOUNT_SID, Config.TWILIO_AUTH_TOKEN, http_client=http_client)
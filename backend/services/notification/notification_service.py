@@ -5,7 +5,6 @@ Sends WhatsApp notifications to users
 
 import logging
 from typing import Optional
-from twilio.rest import Client
 
 logger = logging.getLogger(__name__)
 
@@ -25,10 +24,9 @@ class NotificationService:
         """Initialize Twilio client"""
         from backend.config import Config
         
-        self.client = Client(
-            Config.TWILIO_ACCOUNT_SID,
-            Config.TWILIO_AUTH_TOKEN
-        )
+        from backend.services.http_client import get_twilio_client
+        
+        self.client = get_twilio_client()
         self.from_number = Config.TWILIO_WHATSAPP_NUMBER
     
     def send_payment_success(
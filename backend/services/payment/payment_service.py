@@ -6,7 +6,6 @@ Handles all payment-related business logic
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, Optional, List
-import razorpay
 
 logger = logging.getLogger(__name__)
 
@@ -28,11 +27,9 @@ class PaymentService:
         """
         self.session = session
         
-        # Initialize Razorpay client
-        from backend.config import Config
-        self.razorpay_client = razorpay.Client(
-            auth=(Config.RAZORPAY_KEY_ID, Config.RAZORPAY_KEY_SECRET)
-        )
+        # Initialize Razorpay client (pooled shared session)
+        from backend.services.http_client import get_razorpay_client
+        self.razorpay_client = get_razorpay_client()
     
     def create_payment_order(
         self,
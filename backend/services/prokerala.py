@@ -1,42 +1,22 @@
 import re
-import requests
 import logging
 from datetime import datetime
 from backend.config import Config
+from backend.services.prokerala_token import get_token_manager
+from backend.services.http_client import get_session
+from backend.utils.resilience import get_guard, UpstreamUnavailable, CircuitOpenError
 
 logger = logging.getLogger(__name__)
 
 
 def get_access_token():
-    """Get access token from Prokerala API"""
-    try:
-        logger.info("🔄 Generating new Prokerala access token...")
-        url = "https://api.prokerala.com/token"
-        
-        payload = {
-            "client_id": Config.PROKERALA_CLIENT_ID,
-            "client_secret": Config.PROKERALA_CLIENT_SECRET,
-            "grant_type": "client_credentials"
-        }
-        
-        headers = {
-            "Content-Type": "application/x-www-form-urlencoded"
-        }
-        
-        response = requests.post(url, data=payload, headers=headers, timeout=10)
-        
-        if response.status_code == 200:
-            data = response.json()
-            token = data.get('access_token')
-            logger.info("✅ Prokerala token generated")
-            return token
-        else:
-            logger.error(f"❌ Failed to get token: {response.status_code} - {response.text}")
-            return None
-    
-    except Exception as e:
-        logger.error(f"❌ Error getting token: {e}")
-        return None
+    """
+    Get access token from Prokerala API
+
+    Served from the shared token cache; the token endpoint is only hit
+    when the cached token is close to expiry.
+    """
+    return get_token_manager().get_token()
 
 
 def fix_datetime_for_sandbox(datetime_str: str) -> str:
@@ -61,13 +41,14 @@ def fix_datetime_for_sandbox(datetime_str: str) -> str:
     return datetime_str
 
 
-def combine_datetime(dob: str, time_str: str) -> str:
+def combine_datetime(dob: str, time_str: str, utc_offset: str = "+05:30") -> str:
     """
     Combine date and time into ISO datetime format
     
     Args:
         dob: Date in DD-MM-YYYY format (e.g., "15-08-1990")
         time_str: Time in HH:MM AM/PM format (e.g., "09:30 AM")
+        utc_offset: Offset at the birthplace (place_engine.resolve_place)
     
     Returns:
         ISO datetime string (e.g., "1990-08-15T09:30:00+05:30")
@@ -96,7 +77,7 @@ def combine_datetime(dob: str, time_str: str) -> str:
             hours, minutes = map(int, time_str.split(':'))
         
         # Create ISO format: YYYY-MM-DDTHH:MM:SS+05:30
-        iso_datetime = f"{year}-{month}-{day}T{hours:02d}:{minutes:02d}:00+05:30"
+        iso_datetime = f"{year}-{month}-{day}T{hours:02d}:{minutes:02d}:00{utc_offset}"
         
         return iso_datetime
     
@@ -117,24 +98,25 @@ def get_kundali_data(datetime_str, lat, lon):
     
     Returns:
         dict: Kundali data from Prokerala
+    
+    Raises:
+        UpstreamUnavailable: Circuit open or bulkhead full (Prokerala
+            busy, not a problem with the birth details)
     """
     logger.info(f"🌌 Prokerala request -> {datetime_str}")
     
     # FIX: Handle sandbox mode
     datetime_str = fix_datetime_for_sandbox(datetime_str)
     
+    guard = get_guard("prokerala")
+    
+    # Fail fast while Prokerala is down instead of waiting out timeouts
+    if not guard.available():
+        logger.warning("🔌 Prokerala circuit open, skipping request")
+        raise CircuitOpenError("prokerala circuit open")
+    
     try:
-        token = get_access_token()
-        
-        if not token:
-            logger.error("❌ Could not obtain access token")
-            return None
-        
         url = "https://api.prokerala.com/v2/astrology/kundli"
-        headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        }
         
         params = {
             "ayanamsa": 1,
@@ -143,7 +125,35 @@ def get_kundali_data(datetime_str, lat, lon):
             "chart_type": "rasi"
         }
         
-        response = requests.get(url, headers=headers, params=params, timeout=10)
+        manager = get_token_manager()
+        
+        # Second attempt only after a 401 (revoked / expired token)
+        for _ in range(2):
+            token = manager.get_token()
+            
+            if not token:
+                logger.error("❌ Could not obtain access token")
+                return None
+            
+            headers = {
+                "Authorization": f"Bearer {token}",
+                "Content-Type": "application/json"
+            }
+            
+            # Single attempt: the guard's timeout and breaker own retries
+            session = get_session("prokerala", retries=0)
+            
+            response = guard.call(
+                lambda timeout: session.get(
+                    url, headers=headers, params=params, timeout=(session.timeout[0], timeout)
+                ),
+                is_failure=lambda r: r.status_code >= 500 or r.status_code == 429
+            )
+            
+            if response.status_code != 401:
+                break
+            
+            manager.invalidate(token)
         
         if response.status_code == 200:
             logger.info("✅ Prokerala kundali data received")
@@ -152,6 +162,11 @@ def get_kundali_data(datetime_str, lat, lon):
             logger.error(f"❌ Prokerala API error {response.status_code}: {response.text}")
             return None
     
+    except UpstreamUnavailable as e:
+        # Not a data problem: callers tell the user to retry shortly
+        logger.warning(f"🔌 Prokerala request rejected: {e}")
+        raise
+    
     except Exception as e:
         logger.error(f"❌ Prokerala API exception: {e}")
         return None
@@ -173,7 +188,7 @@ def get_prokerala_data(**kwargs):
         lon = kwargs.get('longitude') or kwargs.get('lon')
         
         # Combine date and time
-        datetime_str = combine_datetime(dob, time_str)
+        datetime_str = combine_datetime(dob, time_str, kwargs.get('utc_offset') or "+05:30")
         
         if not datetime_str:
             return None
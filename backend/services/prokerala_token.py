@@ -0,0 +1,411 @@
+"""
+Prokerala Token Manager
+Caches the OAuth bearer token until shortly before it expires
+
+- Token reused until PROKERALA_TOKEN_REFRESH_MARGIN_SECONDS before expiry
+- Refreshed in the background once inside PROKERALA_TOKEN_PREFETCH_SECONDS,
+  so requests normally never wait on the token endpoint
+- Single-flight: concurrent refreshes in a process collapse into one, and
+  across gunicorn / Celery processes a Redis lock (or, without Redis, a
+  file lock) lets one process fetch while the others pick up its token
+- invalidate() drops a token the API rejected with 401
+"""
+
+import os
+import json
+import time
+import fcntl
+import logging
+import tempfile
+import threading
+
+from backend.config import Config
+from backend.services.http_client import get_session
+from backend.utils.redis_client import get_redis, mark_redis_down
+
+logger = logging.getLogger(__name__)
+
+
+TOKEN_URL = "https://api.prokerala.com/token"
+
+REDIS_TOKEN_KEY = "prokerala:token"
+REDIS_LOCK_KEY = "prokerala:token:lock"
+LOCK_TIMEOUT_SECONDS = 15
+
+# How long a process waits for another one's refresh before fetching itself
+WAIT_FOR_PEER_SECONDS = 5
+
+TOKEN_FILE = os.path.join(tempfile.gettempdir(), "boloastro_prokerala_token.json")
+
+
+class TokenManager:
+    """Shared, expiry-aware Prokerala access token"""
+
+    def __init__(self):
+        self._token = None
+        self._expires_at = 0.0
+
+        # Guards the token fields only; never held across I/O
+        self._lock = threading.Lock()
+        # Single-flight: held for the whole shared read / peer wait / fetch
+        self._refresh_lock = threading.Lock()
+        # Held by the running background prefetch
+        self._prefetch_lock = threading.Lock()
+
+        self._stats = {
+            "hits": 0,
+            "shared": 0,
+            "refreshes": 0,
+            "prefetches": 0,
+            "invalidations": 0,
+            "failures": 0
+        }
+
+    # ---------- PUBLIC ----------
+
+    def get_token(self):
+        """
+        Get a valid access token
+
+        Returns:
+            str: Bearer token or None if the token endpoint failed
+        """
+
+        remaining = self._expires_at - time.time()
+
+        if self._token and remaining > Config.PROKERALA_TOKEN_REFRESH_MARGIN_SECONDS:
+            self._stats["hits"] += 1
+
+            if remaining < Config.PROKERALA_TOKEN_PREFETCH_SECONDS:
+                self._prefetch()
+
+            return self._token
+
+        return self._refresh(stale=self._token)
+
+    def invalidate(self, token):
+        """
+        Drop a token the API rejected
+
+        Only acts if `token` is still the current one, so a burst of 401s
+        for the same token triggers a single refresh.
+        """
+
+        with self._lock:
+            if token != self._token:
+                return
+
+            self._token = None
+            self._expires_at = 0.0
+            self._stats["invalidations"] += 1
+
+        shared = self._read_shared()
+
+        if shared and shared[0] == token:
+            self._delete_shared()
+
+        logger.warning("⚠️ Prokerala token rejected, refreshing")
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats["expires_in"] = max(0, round(self._expires_at - time.time())) if self._token else 0
+        return stats
+
+    # ---------- REFRESH ----------
+
+    def _prefetch(self):
+        # Never blocks the request thread: at most one prefetch at a time
+        if not self._prefetch_lock.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                self._stats["prefetches"] += 1
+                self._refresh(stale=self._token, force=True)
+            finally:
+                self._prefetch_lock.release()
+
+        threading.Thread(target=run, name="prokerala-token-prefetch", daemon=True).start()
+
+    def _refresh(self, stale=None, force=False):
+        """
+        Single-flight refresh
+
+        Args:
+            stale: Token the caller considers unusable
+            force: Fetch even if the current token is still valid (prefetch)
+
+        Only callers that need a new token queue on the refresh lock;
+        self._lock is taken just to read and adopt the result, so request
+        threads serving the current token never wait on the network.
+        """
+
+        with self._refresh_lock:
+            # Another thread refreshed while we waited for the lock
+            with self._lock:
+                token, expires_at = self._token, self._expires_at
+
+            if token and token != stale and self._usable(expires_at, force):
+                return token
+
+            shared = self._read_shared()
+
+            if shared and shared[0] != stale and self._usable(shared[1], force):
+                self._stats["shared"] += 1
+                return self._adopt(*shared)
+
+            with self._peer_lock() as acquired:
+                if not acquired:
+                    shared = self._wait_for_peer(stale)
+
+                    if shared:
+                        self._stats["shared"] += 1
+                        return self._adopt(*shared)
+
+                else:
+                    # The holder before us may have just published one
+                    shared = self._read_shared()
+
+                    if shared and shared[0] != stale and self._usable(shared[1], force):
+                        self._stats["shared"] += 1
+                        return self._adopt(*shared)
+
+                fetched = self._fetch()
+
+                if not fetched:
+                    self._stats["failures"] += 1
+
+                    # Keep serving a token that has not actually expired
+                    with self._lock:
+                        if self._token and self._expires_at > time.time():
+                            return self._token
+
+                    return None
+
+                self._stats["refreshes"] += 1
+                self._write_shared(*fetched)
+
+                return self._adopt(*fetched)
+
+    def _usable(self, expires_at, force=False):
+        window = (
+            Config.PROKERALA_TOKEN_PREFETCH_SECONDS if force
+            else Config.PROKERALA_TOKEN_REFRESH_MARGIN_SECONDS
+        )
+
+        return expires_at - time.time() > window
+
+    def _adopt(self, token, expires_at):
+        with self._lock:
+            self._token = token
+            self._expires_at = expires_at
+
+        return token
+
+    def _wait_for_peer(self, stale):
+        deadline = time.monotonic() + WAIT_FOR_PEER_SECONDS
+
+        while time.monotonic() < deadline:
+            time.sleep(0.1)
+
+            shared = self._read_shared()
+
+            if shared and shared[0] != stale and self._usable(shared[1]):
+                return shared
+
+        logger.warning("⚠️ Timed out waiting for Prokerala token refresh in another process")
+        return None
+
+    def _fetch(self):
+        """
+        Call the token endpoint
+
+        Returns:
+            tuple: (token, expires_at epoch seconds) or None
+        """
+
+        try:
+            logger.info("🔄 Generating new Prokerala access token...")
+
+            response = get_session("prokerala").post(
+                TOKEN_URL,
+                data={
+                    "client_id": Config.PROKERALA_CLIENT_ID,
+                    "client_secret": Config.PROKERALA_CLIENT_SECRET,
+                    "grant_type": "client_credentials"
+                },
+                headers={"Content-Type": "application/x-www-form-urlencoded"}
+            )
+
+            if response.status_code != 200:
+                logger.error(f"❌ Failed to get token: {response.status_code} - {response.text}")
+                return None
+
+            data = response.json()
+            token = data.get("access_token")
+
+            if not token:
+                logger.error("❌ Token response without access_token")
+                return None
+
+            expires_in = int(data.get("expires_in") or 3600)
+
+            logger.info(f"✅ Prokerala token generated (expires in {expires_in}s)")
+
+            return token, time.time() + expires_in
+
+        except Exception as e:
+            logger.error(f"❌ Error getting token: {e}")
+            return None
+
+    # ---------- SHARED STORE (Redis, else file) ----------
+
+    def _read_shared(self):
+        client = get_redis()
+
+        if client is not None:
+            try:
+                raw = client.get(REDIS_TOKEN_KEY)
+                return tuple(json.loads(raw)) if raw else None
+            except Exception as e:
+                logger.warning(f"⚠️ Redis token read failed: {e}")
+                mark_redis_down()
+
+        try:
+            with open(TOKEN_FILE) as f:
+                return tuple(json.load(f))
+        except (OSError, ValueError):
+            return None
+
+    def _write_shared(self, token, expires_at):
+        payload = json.dumps([token, expires_at])
+        ttl = int(expires_at - time.time())
+
+        if ttl <= 0:
+            return
+
+        client = get_redis()
+
+        if client is not None:
+            try:
+                client.set(REDIS_TOKEN_KEY, payload, ex=ttl)
+                return
+            except Exception as e:
+                logger.warning(f"⚠️ Redis token write failed: {e}")
+                mark_redis_down()
+
+        # Atomic replace; readers never see a partial file
+        tmp = f"{TOKEN_FILE}.{os.getpid()}"
+
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+
+            with os.fdopen(fd, "w") as f:
+                f.write(payload)
+
+            os.replace(tmp, TOKEN_FILE)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not write token file: {e}")
+
+    def _delete_shared(self):
+        client = get_redis()
+
+        if client is not None:
+            try:
+                client.delete(REDIS_TOKEN_KEY)
+                return
+            except Exception:
+                mark_redis_down()
+
+        try:
+            os.remove(TOKEN_FILE)
+        except OSError:
+            pass
+
+    def _peer_lock(self):
+        client = get_redis()
+
+        if client is not None:
+            return _RedisLock(client)
+
+        return _FileLock(TOKEN_FILE + ".lock")
+
+
+# =========================
+# CROSS-PROCESS LOCKS
+# =========================
+
+class _RedisLock:
+    """Non-blocking SET NX lock; yields whether it was acquired"""
+
+    def __init__(self, client):
+        self.client = client
+        self.value = f"{os.getpid()}:{threading.get_ident()}"
+        self.acquired = False
+
+    def __enter__(self):
+        try:
+            self.acquired = bool(self.client.set(
+                REDIS_LOCK_KEY, self.value, nx=True, ex=LOCK_TIMEOUT_SECONDS
+            ))
+        except Exception:
+            mark_redis_down()
+            # No coordination possible; fetch ourselves
+            self.acquired = True
+
+        return self.acquired
+
+    def __exit__(self, *exc):
+        if not self.acquired:
+            return False
+
+        try:
+            if self.client.get(REDIS_LOCK_KEY) == self.value:
+                self.client.delete(REDIS_LOCK_KEY)
+        except Exception:
+            pass
+
+        return False
+
+
+class _FileLock:
+    """Blocking flock; the waiter then finds the token in the file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+
+    def __enter__(self):
+        try:
+            self.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(self.fd, fcntl.LOCK_EX)
+        except OSError:
+            self.fd = None
+
+        return True
+
+    def __exit__(self, *exc):
+        if self.fd is not None:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+
+        return False
+
+
+# =========================
+# SINGLETON
+# =========================
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_token_manager():
+    global _manager
+
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                _manager = TokenManager()
+
+    return _manager
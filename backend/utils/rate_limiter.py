@@ -1,46 +1,300 @@
+"""
+Rate Limiter
+Token buckets shared by every process through Redis
+
+Each (policy, key) pair owns one bucket of `capacity` tokens refilled at
+`capacity / per_seconds` tokens a second; a request takes a token or is
+refused. Buckets are a two-field Redis hash updated atomically by a Lua
+script and expire once they would be full again, so memory is O(1) per
+active key.
+
+When Redis is unreachable (or RATE_LIMIT_BACKEND="local") the same
+buckets are kept in-process - limits then apply per worker until Redis
+is back. Idle local buckets are dropped the same way Redis expires them.
+
+Usage:
+    if not allow("whatsapp_message", phone):
+        ...
+
+    result = check("ai_question", phone)   # allowed / remaining / retry_after
+"""
+
+import math
 import time
 import logging
-from collections import defaultdict, deque
+import threading
+from collections import OrderedDict
+
+from backend.config import Config
+from backend.utils.redis_client import get_redis, mark_redis_down
 
 logger = logging.getLogger(__name__)
 
+
 # =========================
-# RATE LIMIT CONFIG
+# POLICIES
 # =========================
 
-MAX_REQUESTS = 10        # messages
-TIME_WINDOW = 60        # seconds
+# name -> (capacity, per_seconds): `capacity` requests at once, refilled
+# over `per_seconds`
+POLICIES = {
+    # Inbound WhatsApp messages per phone (/bot)
+    "whatsapp_message": (Config.RATE_LIMIT_MESSAGES, Config.RATE_LIMIT_MESSAGES_WINDOW_SECONDS),
+    # OpenAI calls per phone (Q&A product)
+    "ai_question": (1, Config.RATE_LIMIT_AI_COOLDOWN_SECONDS),
+    # Razorpay orders per phone (payment links)
+    "payment_order": (5, 600),
+    # HTTP endpoints per client IP (security.rate_limit default)
+    "http": (60, 60),
+}
 
+REDIS_KEY_PREFIX = "rl:"
 
-# =========================
-# STORAGE (IN MEMORY)
-# =========================
+# KEYS[1] bucket; ARGV: capacity, refill per second, now, cost
+# Returns {allowed, tokens left, seconds until a token is available}
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
 
-_user_requests = defaultdict(deque)
+local allowed = 0
+local retry_after = 0
+
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+
+return {allowed, tostring(tokens), tostring(retry_after)}
+"""
+
+
+def register_policy(name, capacity, per_seconds):
+    """Add (or resize) a named policy"""
+
+    POLICIES[name] = (capacity, per_seconds)
 
 
 # =========================
-# MAIN CHECK FUNCTION
+# LOCAL BUCKETS
 # =========================
 
-def is_rate_limited(user_id):
+class LocalBuckets:
     """
-    Returns True if user exceeded limit
+    In-process token buckets for one policy
+
+    Buckets are kept in least-recently-used order; since all buckets of a
+    policy refill at the same speed, the ones at the front are the first
+    to be full again and are dropped as soon as they are.
     """
 
-    now = time.time()
-    requests = _user_requests[user_id]
+    def __init__(self, capacity, per_seconds):
+        self.capacity = capacity
+        self.rate = capacity / per_seconds
+        self.full_after = per_seconds
+
+        # key -> [tokens, last update]
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, now, cost=1):
+        with self._lock:
+            self._expire(now)
+
+            bucket = self._buckets.get(key)
+
+            if bucket is None:
+                bucket = self._buckets[key] = [self.capacity, now]
+            else:
+                self._buckets.move_to_end(key)
+
+            tokens = min(self.capacity, bucket[0] + max(0.0, now - bucket[1]) * self.rate)
+
+            if tokens >= cost:
+                bucket[0], bucket[1] = tokens - cost, now
+                return True, bucket[0], 0.0
+
+            bucket[0], bucket[1] = tokens, now
+            return False, tokens, (cost - tokens) / self.rate
+
+    def _expire(self, now):
+        # Called with self._lock held
+        while self._buckets:
+            key, (_, updated) = next(iter(self._buckets.items()))
+
+            if now - updated < self.full_after:
+                return
+
+            del self._buckets[key]
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+# =========================
+# LIMITER
+# =========================
+
+class RateLimiter:
+    """Token-bucket limiter over Redis with an in-process fallback"""
+
+    def __init__(self):
+        self._local = {}
+        self._scripts = {}
+        self._lock = threading.Lock()
+
+        # policy -> counters
+        self._stats = {}
+
+    def check(self, policy, key, cost=1):
+        """
+        Take `cost` tokens from the bucket of `key` under `policy`
+
+        Returns:
+            dict: {"allowed", "remaining", "retry_after"} (seconds)
+
+        Raises:
+            KeyError: Unknown policy
+        """
+
+        capacity, per_seconds = POLICIES[policy]
+        now = time.time()
+
+        result = None
+
+        if Config.RATE_LIMIT_BACKEND != "local":
+            result = self._check_redis(policy, key, capacity, per_seconds, now, cost)
+
+        backend = "redis"
 
-    # Remove old timestamps
-    while requests and now - requests[0] > TIME_WINDOW:
-        requests.popleft()
+        if result is None:
+            backend = "local"
+            result = self._bucket(policy, capacity, per_seconds).take(key, now, cost)
 
-    # Check limit
-    if len(requests) >= MAX_REQUESTS:
-        logger.warning(f"⏱ Rate limit hit for {user_id}")
-        return True
+        allowed, remaining, retry_after = result
 
-    # Record current request
-    requests.append(now)
+        self._count(policy, "allowed" if allowed else "limited", backend)
+
+        if not allowed:
+            logger.warning(f"⏱ Rate limit '{policy}' hit for {key} (retry in {retry_after:.1f}s)")
+
+        return {
+            "allowed": allowed,
+            "remaining": math.floor(remaining),
+            "retry_after": round(retry_after, 1)
+        }
+
+    def allow(self, policy, key, cost=1):
+        """True if the request may go ahead"""
+
+        return self.check(policy, key, cost)["allowed"]
+
+    def stats(self):
+        with self._lock:
+            stats = {policy: dict(counters) for policy, counters in self._stats.items()}
+            local_keys = {policy: len(buckets) for policy, buckets in self._local.items()}
+
+        for policy, counters in stats.items():
+            counters["local_keys"] = local_keys.get(policy, 0)
+
+        return stats
+
+    # ---------- BACKENDS ----------
+
+    def _check_redis(self, policy, key, capacity, per_seconds, now, cost):
+        client = get_redis(Config.REDIS_CACHE_DB)
+
+        if client is None:
+            return None
+
+        try:
+            script = self._scripts.get(id(client))
+
+            if script is None:
+                script = self._scripts[id(client)] = client.register_script(TOKEN_BUCKET_LUA)
+
+            allowed, remaining, retry_after = script(
+                keys=[f"{REDIS_KEY_PREFIX}{policy}:{key}"],
+                args=[capacity, capacity / per_seconds, now, cost]
+            )
+
+        except Exception as e:
+            logger.warning(f"⚠️ Redis rate limiter unavailable, limiting in-process: {e}")
+            mark_redis_down(Config.REDIS_CACHE_DB)
+            return None
+
+        return bool(int(allowed)), float(remaining), float(retry_after)
+
+    def _bucket(self, policy, capacity, per_seconds):
+        buckets = self._local.get(policy)
+
+        # Rebuilt if the policy was resized
+        if buckets is None or buckets.capacity != capacity or buckets.full_after != per_seconds:
+            with self._lock:
+                buckets = self._local.get(policy)
+
+                if buckets is None or buckets.capacity != capacity or buckets.full_after != per_seconds:
+                    buckets = self._local[policy] = LocalBuckets(capacity, per_seconds)
+
+        return buckets
+
+    def _count(self, policy, outcome, backend):
+        with self._lock:
+            counters = self._stats.get(policy)
+
+            if counters is None:
+                counters = self._stats[policy] = {"allowed": 0, "limited": 0, "local": 0}
+
+            counters[outcome] += 1
+
+            if backend == "local":
+                counters["local"] += 1
+
+
+_limiter = RateLimiter()
+
+
+# =========================
+# PUBLIC API
+# =========================
+
+def get_rate_limiter():
+    return _limiter
+
+
+def check(policy, key, cost=1):
+    """See RateLimiter.check"""
+
+    return _limiter.check(policy, key, cost)
+
+
+def allow(policy, key, cost=1):
+    """True if `key` is within `policy`"""
+
+    return _limiter.allow(policy, key, cost)
+
+
+def get_rate_limit_stats():
+    """Allowed / limited counts per policy, for health checks"""
+
+    return _limiter.stats()
+
+
+def is_rate_limited(user_id):
+    """
+    Returns True if user exceeded the inbound message limit
+    """
 
-    return False
+    return not allow("whatsapp_message", user_id)
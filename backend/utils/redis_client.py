@@ -0,0 +1,104 @@
+"""
+Shared Redis Clients
+One lazily-created client per logical database (cache, queue, sessions),
+with a short back-off when Redis is unreachable so callers can fall back
+to their in-process / SQLite implementations without stalling requests.
+"""
+
+import time
+import logging
+import threading
+from urllib.parse import urlparse
+
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+# =========================
+# CONFIG
+# =========================
+
+CONNECT_TIMEOUT_SECONDS = 0.25
+SOCKET_TIMEOUT_SECONDS = 0.5
+RETRY_AFTER_SECONDS = 60
+
+
+_clients = {}
+_down_until = {}
+_lock = threading.Lock()
+
+
+def get_redis(db=None):
+    """
+    Get a Redis client for a logical database
+
+    Args:
+        db: Database number (default: REDIS_CACHE_DB)
+
+    Returns:
+        redis.Redis or None if Redis is not installed / not reachable
+    """
+
+    if db is None:
+        db = Config.REDIS_CACHE_DB
+
+    client = _clients.get(db)
+
+    if client is not None:
+        return client
+
+    if time.monotonic() < _down_until.get(db, 0):
+        return None
+
+    with _lock:
+        client = _clients.get(db)
+
+        if client is not None:
+            return client
+
+        # Another thread just failed to connect
+        if time.monotonic() < _down_until.get(db, 0):
+            return None
+
+        try:
+            import redis
+
+            # A db in the URL path would win over the keyword, so strip it
+            base_url = urlparse(Config.REDIS_URL)._replace(path="").geturl()
+
+            client = redis.from_url(
+                base_url,
+                db=db,
+                max_connections=Config.REDIS_MAX_CONNECTIONS,
+                socket_connect_timeout=CONNECT_TIMEOUT_SECONDS,
+                socket_timeout=SOCKET_TIMEOUT_SECONDS,
+                decode_responses=True
+            )
+            client.ping()
+
+        except Exception as e:
+            logger.warning(f"⚠️ Redis db={db} unavailable, retrying in {RETRY_AFTER_SECONDS}s: {e}")
+            _down_until[db] = time.monotonic() + RETRY_AFTER_SECONDS
+            return None
+
+        _clients[db] = client
+        logger.info(f"✅ Redis connected (db={db})")
+
+        return client
+
+
+def mark_redis_down(db=None):
+    """
+    Drop a client after a connection error
+
+    The next get_redis() call for this database waits RETRY_AFTER_SECONDS
+    before trying to reconnect.
+    """
+
+    if db is None:
+        db = Config.REDIS_CACHE_DB
+
+    with _lock:
+        _clients.pop(db, None)
+        _down_until[db] = time.monotonic() + RETRY_AFTER_SECONDS
@@ -0,0 +1,358 @@
+"""
+Upstream Resilience
+Circuit breaker, adaptive timeout and bulkhead per upstream
+
+- Circuit breaker: outcomes are kept for a rolling BREAKER_WINDOW_SECONDS;
+  once at least BREAKER_MIN_CALLS calls were made and the failure rate
+  reaches BREAKER_FAILURE_RATE the circuit opens and calls fail fast for
+  BREAKER_OPEN_SECONDS. A single probe call is then let through
+  (half-open); its outcome closes or re-opens the circuit.
+- Adaptive timeout: p99 latency of recent successful calls times
+  ADAPTIVE_TIMEOUT_MULTIPLIER, clamped to the upstream's bounds; the
+  configured maximum until enough calls were observed.
+- Bulkhead: at most `max_concurrent` calls in flight per upstream; extra
+  callers wait BULKHEAD_WAIT_SECONDS and are then rejected.
+
+Usage:
+    guard = get_guard("openai")
+
+    response = guard.call(
+        lambda timeout: client.chat.completions.create(..., timeout=timeout)
+    )
+
+State is per process.
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+
+from backend.config import Config
+
+logger = logging.getLogger(__name__)
+
+
+# =========================
+# UPSTREAMS
+# =========================
+
+# min_timeout / max_timeout: bounds of the adaptive timeout in seconds
+# max_concurrent: bulkhead size
+GUARDS = {
+    "prokerala": {"min_timeout": 2.0, "max_timeout": Config.PROKERALA_TIMEOUT_SECONDS,
+                  "max_concurrent": Config.PROKERALA_MAX_CONCURRENT},
+    "openai": {"min_timeout": 5.0, "max_timeout": Config.OPENAI_TIMEOUT_SECONDS,
+               "max_concurrent": Config.OPENAI_MAX_CONCURRENT},
+    "default": {"min_timeout": 2.0, "max_timeout": 10.0, "max_concurrent": 10},
+}
+
+# Successful calls needed before the timeout adapts
+MIN_LATENCY_SAMPLES = 20
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class UpstreamUnavailable(Exception):
+    """Call rejected without reaching the upstream"""
+
+
+class CircuitOpenError(UpstreamUnavailable):
+    """The upstream's circuit is open"""
+
+
+class BulkheadFullError(UpstreamUnavailable):
+    """Too many calls to the upstream already in flight"""
+
+
+# =========================
+# GUARD
+# =========================
+
+class UpstreamGuard:
+    """
+    Breaker, timeout and bulkhead for one upstream
+
+    Args:
+        name: Upstream name (metrics / logs)
+        min_timeout: Lower bound of the adaptive timeout (seconds)
+        max_timeout: Upper bound, also used until latencies are known
+        max_concurrent: Calls allowed in flight at once
+    """
+
+    def __init__(self, name, min_timeout, max_timeout, max_concurrent):
+        self.name = name
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.max_concurrent = max_concurrent
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_concurrent)
+
+        # (monotonic time, ok, latency seconds)
+        self._outcomes = deque()
+
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._in_flight = 0
+
+        self._stats = {
+            "calls": 0,
+            "failures": 0,
+            "rejected_open": 0,
+            "rejected_full": 0,
+            "opened": 0
+        }
+
+    # ---------- PUBLIC ----------
+
+    def call(self, fn, is_failure=None):
+        """
+        Run fn(timeout) under the breaker and bulkhead
+
+        Args:
+            fn: Callable taking the timeout (seconds) to apply to the call
+            is_failure: Optional check of the result (e.g. HTTP 5xx) that
+                counts a returned value as a failure
+
+        Returns:
+            Result of fn
+
+        Raises:
+            CircuitOpenError / BulkheadFullError: call was not made
+        """
+
+        self._enter(wait=Config.BULKHEAD_WAIT_SECONDS)
+
+        started = time.monotonic()
+
+        try:
+            result = fn(self.timeout())
+        except Exception:
+            self._record(False, time.monotonic() - started)
+            raise
+        except BaseException:
+            # Cancelled: no verdict on the upstream, but free a probe slot
+            self._release_probe()
+            raise
+        finally:
+            self._leave()
+
+        self._record(not (is_failure and is_failure(result)), time.monotonic() - started)
+
+        return result
+
+    async def acall(self, fn, is_failure=None):
+        """
+        Coroutine flavour of call(): fn(timeout) returns an awaitable
+
+        The bulkhead never blocks the event loop; a full bulkhead rejects
+        immediately.
+        """
+
+        self._enter(wait=None)
+
+        started = time.monotonic()
+
+        try:
+            result = await fn(self.timeout())
+        except Exception:
+            self._record(False, time.monotonic() - started)
+            raise
+        except BaseException:
+            # Cancelled: no verdict on the upstream, but free a probe slot
+            self._release_probe()
+            raise
+        finally:
+            self._leave()
+
+        self._record(not (is_failure and is_failure(result)), time.monotonic() - started)
+
+        return result
+
+    def available(self):
+        """False while the circuit is open (callers should degrade)"""
+
+        with self._lock:
+            return self._state != OPEN or self._cooled_down()
+
+    def timeout(self):
+        """Current adaptive timeout in seconds"""
+
+        with self._lock:
+            self._prune()
+            latencies = sorted(lat for _, ok, lat in self._outcomes if ok)
+
+        if len(latencies) < MIN_LATENCY_SAMPLES:
+            return self.max_timeout
+
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+
+        return round(min(self.max_timeout, max(self.min_timeout, p99 * Config.ADAPTIVE_TIMEOUT_MULTIPLIER)), 2)
+
+    def stats(self):
+        timeout = self.timeout()
+
+        with self._lock:
+            self._prune()
+
+            calls = len(self._outcomes)
+            failures = sum(1 for _, ok, _ in self._outcomes if not ok)
+
+            stats = dict(self._stats)
+            stats.update({
+                "state": self._state,
+                "window_calls": calls,
+                "window_failure_rate": round(failures / calls, 3) if calls else 0.0,
+                "timeout_seconds": timeout,
+                "in_flight": self._in_flight
+            })
+
+            if self._state == OPEN:
+                stats["retry_in_seconds"] = max(0, round(self._opened_at + Config.BREAKER_OPEN_SECONDS - time.monotonic(), 1))
+
+        return stats
+
+    # ---------- BULKHEAD ----------
+
+    def _enter(self, wait):
+        if not self._admit():
+            raise CircuitOpenError(f"{self.name} circuit open")
+
+        acquired = (
+            self._slots.acquire(blocking=False) if wait is None
+            else self._slots.acquire(timeout=wait)
+        )
+
+        if not acquired:
+            self._release_probe()
+
+            with self._lock:
+                self._stats["rejected_full"] += 1
+
+            raise BulkheadFullError(f"{self.name} has {self.max_concurrent} calls in flight")
+
+        with self._lock:
+            self._in_flight += 1
+
+    def _leave(self):
+        with self._lock:
+            self._in_flight -= 1
+
+        self._slots.release()
+
+    # ---------- BREAKER ----------
+
+    def _cooled_down(self):
+        # Called with self._lock held
+        return time.monotonic() - self._opened_at >= Config.BREAKER_OPEN_SECONDS
+
+    def _admit(self):
+        with self._lock:
+            if self._state == OPEN and self._cooled_down():
+                self._state = HALF_OPEN
+                self._probing = False
+
+            if self._state == CLOSED:
+                return True
+
+            # Half-open: a single probe at a time
+            if self._state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+
+            self._stats["rejected_open"] += 1
+            return False
+
+    def _release_probe(self):
+        with self._lock:
+            self._probing = False
+
+    def _record(self, ok, latency):
+        with self._lock:
+            now = time.monotonic()
+
+            self._stats["calls"] += 1
+
+            if not ok:
+                self._stats["failures"] += 1
+
+            if self._state == HALF_OPEN:
+                self._probing = False
+
+                if ok:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                    logger.info(f"✅ {self.name} circuit closed")
+                else:
+                    self._open(now)
+
+                return
+
+            self._outcomes.append((now, ok, latency))
+            self._prune()
+
+            if self._state != CLOSED or len(self._outcomes) < Config.BREAKER_MIN_CALLS:
+                return
+
+            failures = sum(1 for _, success, _ in self._outcomes if not success)
+
+            if failures / len(self._outcomes) >= Config.BREAKER_FAILURE_RATE:
+                self._open(now)
+
+    def _open(self, now):
+        # Called with self._lock held
+        self._state = OPEN
+        self._opened_at = now
+        self._stats["opened"] += 1
+
+        logger.warning(f"🔌 {self.name} circuit open for {Config.BREAKER_OPEN_SECONDS}s")
+
+    def _prune(self):
+        # Called with self._lock held
+        cutoff = time.monotonic() - Config.BREAKER_WINDOW_SECONDS
+
+        while self._outcomes and self._outcomes[0][0] < cutoff:
+            self._outcomes.popleft()
+
+
+# =========================
+# REGISTRY
+# =========================
+
+_guards = {}
+_guards_lock = threading.Lock()
+
+
+def get_guard(upstream):
+    """Shared guard for an upstream ("prokerala", "openai", ...)"""
+
+    guard = _guards.get(upstream)
+
+    if guard is None:
+        with _guards_lock:
+            guard = _guards.get(upstream)
+
+            if guard is None:
+                settings = GUARDS.get(upstream, GUARDS["default"])
+                guard = _guards[upstream] = UpstreamGuard(upstream, **settings)
+
+    return guard
+
+
+def upstream_available(upstream):
+    """False while the upstream's circuit is open"""
+
+    return get_guard(upstream).available()
+
+
+def get_resilience_stats():
+    """Breaker state, timeout and bulkhead usage per upstream, for health checks"""
+
+    with _guards_lock:
+        guards = list(_guards.values())
+
+    return {guard.name: guard.stats() for guard in guards}
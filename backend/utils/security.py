@@ -8,7 +8,6 @@ Enterprise Security Utilities
 
 import hmac
 import hashlib
-import time
 from functools import wraps
 from typing import Optional, Callable
 import logging
@@ -103,15 +102,10 @@ def verify_twilio_signature(
 
 class RateLimiter:
     """
-    Simple in-memory rate limiter
-    For production, use Redis-based rate limiting
+    Per-call rate limits on top of the shared token-bucket limiter
+    (backend.utils.rate_limiter), for callers that pass limits inline
     """
     
-    def __init__(self):
-        self.requests = {}  # {key: [(timestamp, count), ...]}
-        self.cleanup_interval = 60  # Cleanup old entries every minute
-        self.last_cleanup = time.time()
-    
     def is_allowed(
         self,
         key: str,
@@ -129,47 +123,21 @@ class RateLimiter:
         Returns:
             bool: True if request is allowed
         """
-        now = time.time()
-        
-        # Cleanup old entries periodically
-        if now - self.last_cleanup > self.cleanup_interval:
-            self._cleanup(now)
-        
-        # Get request history for this key
-        if key not in self.requests:
-            self.requests[key] = []
-        
-        # Remove old requests outside the window
-        self.requests[key] = [
-            (ts, count) for ts, count in self.requests[key]
-            if now - ts < window_seconds
-        ]
+        from backend.utils.rate_limiter import POLICIES, register_policy, allow
         
-        # Count requests in window
-        total_requests = sum(count for _, count in self.requests[key])
+        policy = f"http_{max_requests}_{window_seconds}"
         
-        if total_requests >= max_requests:
-            logger.warning(f"Rate limit exceeded for key: {key}")
-            return False
+        if policy not in POLICIES:
+            register_policy(policy, max_requests, window_seconds)
         
-        # Add this request
-        self.requests[key].append((now, 1))
-        return True
-    
-    def _cleanup(self, now: float):
-        """Remove old entries"""
-        self.requests = {
-            k: v for k, v in self.requests.items()
-            if any(now - ts < 3600 for ts, _ in v)  # Keep last hour
-        }
-        self.last_cleanup = now
+        return allow(policy, key)
 
 
 # Global rate limiter instance
 _rate_limiter = RateLimiter()
 
 
-def rate_limit(max_requests: int = 60, window_seconds: int = 60):
+def rate_limit(max_requests: int = 60, window_seconds: int = 60, policy: Optional[str] = None):
     """
     Decorator for rate limiting
     
@@ -178,20 +146,31 @@ def rate_limit(max_requests: int = 60, window_seconds: int = 60):
         @rate_limit(max_requests=30, window_seconds=60)
         def webhook():
             ...
+        
+        @rate_limit(policy="http")   # named policy from rate_limiter.POLICIES
     """
     def decorator(func: Callable) -> Callable:
         @wraps(func)
         def wrapper(*args, **kwargs):
             from flask import request, jsonify
+            from backend.utils.rate_limiter import check
             
-            # Get client identifier
-            key = request.headers.get('X-Forwarded-For', request.remote_addr)
+            # Get client identifier (first hop behind proxies)
+            forwarded = request.headers.get('X-Forwarded-For', '')
+            key = forwarded.split(',')[0].strip() or request.remote_addr
+            
+            if policy:
+                result = check(policy, key)
+            else:
+                result = {"allowed": _rate_limiter.is_allowed(key, max_requests, window_seconds), "retry_after": window_seconds}
             
-            if not _rate_limiter.is_allowed(key, max_requests, window_seconds):
-                return jsonify({
+            if not result["allowed"]:
+                response = jsonify({
                     "error": "Rate limit exceeded",
-                    "message": f"Maximum {max_requests} requests per {window_seconds} seconds"
-                }), 429
+                    "message": f"Too many requests, retry in {result['retry_after']} seconds"
+                })
+                response.headers["Retry-After"] = str(max(1, int(result["retry_after"] + 0.5)))
+                return response, 429
             
             return func(*args, **kwargs)
         
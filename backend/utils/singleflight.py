@@ -0,0 +1,248 @@
+"""
+Single-Flight Request Coalescing
+Runs one computation per key; concurrent callers share its result
+
+In-process, callers for a key that is already being computed wait for
+the leader and get the same result (or exception). Across processes, a
+Redis lock elects one leader per key; callers in other processes poll
+the caller-supplied `peek` (normally the durable cache the leader writes
+to) until the result shows up or the lock is released.
+
+Waits are bounded by SINGLEFLIGHT_WAIT_SECONDS; a caller that runs out
+of time gets SingleFlightTimeout.
+
+Usage:
+    flight = get_flight("kundali")
+    chart = flight.do(chart_key, compute, peek=lambda: get_chart(chart_key))
+"""
+
+import time
+import uuid
+import logging
+import threading
+
+from backend.config import Config
+from backend.utils.redis_client import get_redis, mark_redis_down
+
+logger = logging.getLogger(__name__)
+
+
+REDIS_LOCK_PREFIX = "singleflight:"
+POLL_INTERVAL_SECONDS = 0.1
+
+# The lock outlives the wait so a slow leader isn't displaced early
+LOCK_TTL_SECONDS = 120
+
+# KEYS[1] lock; ARGV[1] owner token. Deletes the lock only if we still own
+# it - a leader that outlived the TTL must not release its successor's lock
+RELEASE_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlightTimeout(TimeoutError):
+    """Gave up waiting for another caller's computation"""
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent computations of the same key
+
+    Args:
+        name: Metric / lock namespace ("kundali", "transit")
+        distributed: Also coordinate across processes through Redis
+    """
+
+    def __init__(self, name, distributed=None):
+        self.name = name
+        self.distributed = Config.SINGLEFLIGHT_DISTRIBUTED if distributed is None else distributed
+
+        self._calls = {}
+        self._lock = threading.Lock()
+
+        self._stats = {
+            "executions": 0,   # computations actually run (upstream calls)
+            "coalesced": 0,    # callers served by an in-process leader
+            "remote": 0,       # callers served by another process's leader
+            "cache_hits": 0,   # leader found the result already stored
+            "timeouts": 0,
+            "errors": 0
+        }
+
+    def do(self, key, fn, peek=None, timeout=None):
+        """
+        Run fn() once per key across concurrent callers
+
+        Args:
+            key: Coalescing key (e.g. chart hash)
+            fn: Computation; its result is returned to every waiter
+            peek: Optional lookup of an already-stored result (checked
+                before computing and while waiting on other processes)
+            timeout: Max seconds to wait for another caller
+
+        Returns:
+            Result of fn() (or of peek())
+        """
+
+        timeout = Config.SINGLEFLIGHT_WAIT_SECONDS if timeout is None else timeout
+
+        with self._lock:
+            call = self._calls.get(key)
+
+            if call is not None:
+                call.waiters += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            if not call.done.wait(timeout):
+                self._count("timeouts")
+                raise SingleFlightTimeout(f"{self.name}:{key} still running after {timeout}s")
+
+            self._count("coalesced")
+
+            if call.error is not None:
+                raise call.error
+
+            return call.result
+
+        try:
+            call.result = self._lead(key, fn, peek, timeout)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+            call.done.set()
+
+        return call.result
+
+    # ---------- LEADER ----------
+
+    def _lead(self, key, fn, peek, timeout):
+        client = get_redis() if self.distributed else None
+
+        if client is None:
+            return self._execute(fn, peek)
+
+        lock_key = f"{REDIS_LOCK_PREFIX}{self.name}:{key}"
+        owner = uuid.uuid4().hex
+        deadline = time.monotonic() + timeout
+
+        while True:
+            try:
+                acquired = client.set(lock_key, owner, nx=True, ex=max(LOCK_TTL_SECONDS, int(timeout)))
+            except Exception as e:
+                logger.warning(f"⚠️ Single-flight lock unavailable, computing locally: {e}")
+                mark_redis_down()
+                return self._execute(fn, peek)
+
+            if acquired:
+                try:
+                    return self._execute(fn, peek)
+                finally:
+                    try:
+                        client.eval(RELEASE_LOCK_LUA, 1, lock_key, owner)
+                    except Exception:
+                        pass
+
+            # Another process is computing it
+            while time.monotonic() < deadline:
+                time.sleep(POLL_INTERVAL_SECONDS)
+
+                if peek is not None:
+                    result = peek()
+
+                    if result is not None:
+                        self._count("remote")
+                        return result
+
+                try:
+                    if not client.exists(lock_key):
+                        # Leader finished without storing (or died); take over
+                        break
+                except Exception:
+                    mark_redis_down()
+                    return self._execute(fn, peek)
+            else:
+                self._count("timeouts")
+                raise SingleFlightTimeout(f"{self.name}:{key} locked by another process after {timeout}s")
+
+    def _execute(self, fn, peek):
+        # A previous leader may have finished between the caller's cache
+        # check and our election
+        if peek is not None:
+            result = peek()
+
+            if result is not None:
+                self._count("cache_hits")
+                return result
+
+        self._count("executions")
+
+        try:
+            return fn()
+        except Exception:
+            self._count("errors")
+            raise
+
+    # ---------- METRICS ----------
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+
+        stats["saved"] = stats["coalesced"] + stats["remote"] + stats["cache_hits"]
+
+        return stats
+
+
+# =========================
+# REGISTRY
+# =========================
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def get_flight(name):
+    """Shared SingleFlight for a namespace"""
+
+    flight = _flights.get(name)
+
+    if flight is None:
+        with _flights_lock:
+            flight = _flights.setdefault(name, SingleFlight(name))
+
+    return flight
+
+
+def get_singleflight_stats():
+    """Per-namespace coalescing metrics for health checks"""
+
+    with _flights_lock:
+        flights = list(_flights.values())
+
+    return {flight.name: flight.stats() for flight in flights}
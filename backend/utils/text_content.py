@@ -437,6 +437,15 @@ QNA_MENU = {
         "BN": "📊 অবশিষ্ট প্রশ্ন: {remaining}"
     },
     
+    "THINKING": {
+        "EN": "🔮 Studying your chart for this question... your answer will arrive in a few messages.",
+        "HI": "🔮 इस प्रश्न के लिए आपकी कुंडली देखी जा रही है... उत्तर कुछ संदेशों में आएगा।",
+        "MR": "🔮 या प्रश्नासाठी तुमची कुंडली पाहत आहोत... उत्तर काही संदेशांमध्ये येईल.",
+        "TA": "🔮 இந்த கேள்விக்காக உங்கள் ஜாதகத்தை ஆராய்கிறோம்... பதில் சில செய்திகளில் வரும்.",
+        "TE": "🔮 ఈ ప్రశ్న కోసం మీ జాతకాన్ని పరిశీలిస్తున్నాము... సమాధానం కొన్ని సందేశాల్లో వస్తుంది.",
+        "BN": "🔮 এই প্রশ্নের জন্য আপনার কুণ্ডলী দেখা হচ্ছে... উত্তর কয়েকটি বার্তায় আসবে।"
+    },
+    
     "CONTINUE": {
         "EN": "Ask another question or type MENU to return to main menu",
         "HI": "दूसरा प्रश्न पूछें या मुख्य मेनू पर जाने के लिए MENU टाइप करें",
@@ -639,6 +648,33 @@ ERROR_MESSAGES = {
         "BN": "❌ এই ধাপ থেকে ফিরে যাওয়া যাবে না। মূল মেনুতে যেতে MENU টাইপ করুন।"
     },
     
+    "AI_BUSY": {
+        "EN": "⚠️ Our astrologer AI is busy right now. Your question credit has not been used - please ask again in a few minutes.",
+        "HI": "⚠️ हमारा ज्योतिष AI अभी व्यस्त है। आपका प्रश्न क्रेडिट उपयोग नहीं हुआ है - कृपया कुछ मिनट बाद फिर से पूछें।",
+        "MR": "⚠️ आमचे ज्योतिष AI सध्या व्यस्त आहे. तुमचे प्रश्न क्रेडिट वापरले गेले नाही - कृपया काही मिनिटांनी पुन्हा विचारा.",
+        "TA": "⚠️ எங்கள் ஜோதிட AI இப்போது பிஸியாக உள்ளது. உங்கள் கேள்வி கிரெடிட் பயன்படுத்தப்படவில்லை - சில நிமிடங்களில் மீண்டும் கேளுங்கள்.",
+        "TE": "⚠️ మా జ్యోతిష AI ప్రస్తుతం బిజీగా ఉంది. మీ ప్రశ్న క్రెడిట్ ఉపయోగించబడలేదు - కొన్ని నిమిషాల తర్వాత మళ్లీ అడగండి.",
+        "BN": "⚠️ আমাদের জ্যোতিষ AI এখন ব্যস্ত। আপনার প্রশ্ন ক্রেডিট ব্যবহার হয়নি - কয়েক মিনিট পরে আবার জিজ্ঞাসা করুন।"
+    },
+    
+    "CHART_BUSY": {
+        "EN": "⚠️ Our chart service is busy right now. Your details are fine - please send your birthplace again in a minute.",
+        "HI": "⚠️ हमारी कुंडली सेवा अभी व्यस्त है। आपकी जानकारी सही है - कृपया एक मिनट बाद अपना जन्म स्थान फिर से भेजें।",
+        "MR": "⚠️ आमची कुंडली सेवा सध्या व्यस्त आहे. तुमची माहिती बरोबर आहे - कृपया एका मिनिटाने तुमचे जन्मस्थान पुन्हा पाठवा.",
+        "TA": "⚠️ எங்கள் ஜாதக சேவை இப்போது பிஸியாக உள்ளது. உங்கள் விவரங்கள் சரியானவை - ஒரு நிமிடம் கழித்து உங்கள் பிறந்த இடத்தை மீண்டும் அனுப்பவும்.",
+        "TE": "⚠️ మా జాతక సేవ ప్రస్తుతం బిజీగా ఉంది. మీ వివరాలు సరైనవే - ఒక నిమిషం తర్వాత మీ జన్మస్థలాన్ని మళ్లీ పంపండి.",
+        "BN": "⚠️ আমাদের কুণ্ডলী পরিষেবা এখন ব্যস্ত। আপনার তথ্য ঠিক আছে - এক মিনিট পরে আপনার জন্মস্থান আবার পাঠান।"
+    },
+    
+    "AI_IN_PROGRESS": {
+        "EN": "⏳ Still answering your previous question - please wait for it before asking the next one.",
+        "HI": "⏳ आपके पिछले प्रश्न का उत्तर अभी तैयार हो रहा है - अगला प्रश्न पूछने से पहले कृपया प्रतीक्षा करें।",
+        "MR": "⏳ तुमच्या मागील प्रश्नाचे उत्तर अजून तयार होत आहे - पुढील प्रश्न विचारण्यापूर्वी कृपया थांबा.",
+        "TA": "⏳ உங்கள் முந்தைய கேள்விக்கு இன்னும் பதில் தயாராகிறது - அடுத்த கேள்வி கேட்கும் முன் காத்திருக்கவும்.",
+        "TE": "⏳ మీ మునుపటి ప్రశ్నకు సమాధానం ఇంకా సిద్ధమవుతోంది - తదుపరి ప్రశ్న అడిగే ముందు దయచేసి వేచి ఉండండి.",
+        "BN": "⏳ আপনার আগের প্রশ্নের উত্তর এখনও তৈরি হচ্ছে - পরের প্রশ্ন করার আগে অনুগ্রহ করে অপেক্ষা করুন।"
+    },
+    
     "UNKNOWN_COMMAND": {
         "EN": "❌ I didn't understand that. Type HELP for assistance.",
         "HI": "❌ मुझे समझ नहीं आया। सहायता के लिए HELP टाइप करें।",
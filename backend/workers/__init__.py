@@ -15,6 +15,7 @@ try:
     )
     from backend.workers.analytics import (
         generate_daily_report,
+        refresh_rollups,
         cleanup_old_reports
     )
     from backend.workers.cleanup import (
@@ -22,6 +23,8 @@ try:
         clean_old_webhook_events,
         vacuum_database
     )
+    from backend.workers.transits import precompute_transits
+    from backend.workers.kundali import generate_chart
 except ImportError:
     # Workers not installed yet, that's okay
     pass
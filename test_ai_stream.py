@@ -0,0 +1,67 @@
+"""
+Smoke test: the streaming OpenAI call builds against the pinned client
+
+Runs AIExecutor._stream with the installed openai package over a mocked
+HTTP transport, so an argument the pinned version does not accept fails
+here instead of on every user question.
+
+    python test_ai_stream.py
+"""
+
+import json
+import asyncio
+
+import httpx
+from openai import AsyncOpenAI
+
+from backend.engines.ai_stream_engine import AIExecutor, SentenceChunker
+
+
+def _sse(*deltas):
+    events = []
+
+    for delta in deltas:
+        events.append({
+            "id": "chatcmpl-smoke",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "smoke",
+            "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}]
+        })
+
+    body = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+
+    return body.encode()
+
+
+def test_stream_call_builds_against_pinned_client():
+    requests = []
+
+    def handler(request):
+        requests.append(json.loads(request.content))
+        return httpx.Response(
+            200,
+            headers={"content-type": "text/event-stream"},
+            content=_sse("Jupiter favours you. ", "Marriage looks likely next year.")
+        )
+
+    executor = AIExecutor()
+    executor._client = AsyncOpenAI(
+        api_key="smoke",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+
+    chunker = SentenceChunker(10, 100)
+    outbox = asyncio.Queue()
+    progress = {"chars": 0, "parts": []}
+    messages = [{"role": "user", "content": "When will I marry?"}]
+
+    asyncio.run(executor._stream(messages, 10, chunker, outbox, progress))
+
+    assert requests and requests[0]["stream"] is True
+    assert "".join(progress["parts"]) == "Jupiter favours you. Marriage looks likely next year."
+
+
+if __name__ == "__main__":
+    test_stream_call_builds_against_pinned_client()
+    print("✅ Streaming call works with the installed openai client")
@@ -27,13 +27,18 @@ def generate_daily_report():
     logger.info("📊 Generating daily revenue report...")
     
     from backend.services.analytics.analytics_service import get_analytics_service
+    from backend.services.analytics.rollup_service import refresh_rollups as _refresh
     
     try:
+        # Report on up-to-date rollups
+        _refresh()
+        
         analytics = get_analytics_service()
         
-        # Get yesterday's data
-        yesterday = datetime.now() - timedelta(days=1)
-        revenue_data = analytics.get_revenue_summary(days=1)
+        # Yesterday as a whole UTC day (rollup days are UTC); a 1-day
+        # summary would only cover today so far
+        yesterday = datetime.utcnow() - timedelta(days=1)
+        revenue_data = analytics.get_day_revenue(yesterday.strftime("%Y-%m-%d"))
         
         # Get last 7 days for comparison
         week_data = analytics.get_revenue_summary(days=7)
@@ -66,6 +71,27 @@ def generate_daily_report():
         return {"error": str(e)}
 
 
+@shared_task(name='backend.workers.analytics.refresh_rollups')
+def refresh_rollups(full: bool = False):
+    """
+    Refresh the analytics rollup tables
+    
+    Runs every 5 minutes. Only orders created or updated since the last
+    run are re-aggregated.
+    
+    Args:
+        full: Rebuild every rollup from scratch
+    """
+    from backend.services.analytics.rollup_service import refresh_rollups as _refresh
+    
+    try:
+        return _refresh(full=full)
+    
+    except Exception as e:
+        logger.error(f"❌ Rollup refresh failed: {e}", exc_info=True)
+        return {"error": str(e)}
+
+
 def _save_report(report: dict):
     """Save report to database"""
     from backend.engines.db_engine import get_conn
@@ -15,25 +15,14 @@ def clean_expired_sessions():
     """
     Clean expired user sessions
     
-    Runs every 6 hours to remove old sessions
+    Sessions expire in the session store itself (Redis TTL, or lazy expiry
+    on read for SQLite). This only reclaims expired SQLite rows and is a
+    no-op when sessions live in Redis.
     """
-    from backend.engines.db_engine import get_conn
+    from backend.engines.session_engine import purge_expired_sessions
     
     try:
-        conn = get_conn()
-        cursor = conn.cursor()
-        
-        # Delete sessions older than 24 hours
-        cutoff = datetime.now() - timedelta(hours=24)
-        
-        cursor.execute("""
-            DELETE FROM sessions
-            WHERE updated_at < ?
-        """, (cutoff,))
-        
-        deleted = cursor.rowcount
-        conn.commit()
-        conn.close()
+        deleted = purge_expired_sessions()
         
         logger.info(f"🗑️ Cleaned {deleted} expired sessions")
         return {"deleted": deleted}
@@ -0,0 +1,30 @@
+"""
+Kundali Worker
+Computes charts deferred from the WhatsApp webhook
+"""
+
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name='backend.workers.kundali.generate_chart')
+def generate_chart(job: dict):
+    """
+    Compute a deferred chart and push the result to the user
+    
+    Args:
+        job: Job created by kundali_job_engine.start_chart_job
+    
+    Returns:
+        dict: Whether the user was sent the result
+    """
+    from backend.engines.kundali_job_engine import run_chart_job
+    
+    try:
+        return {"job_id": job["job_id"], "delivered": run_chart_job(job)}
+    
+    except Exception as e:
+        logger.error(f"❌ Chart job failed: {e}")
+        return {"job_id": job.get("job_id"), "error": str(e)}
@@ -0,0 +1,33 @@
+"""
+Transit Worker
+Precomputes daily planetary transits
+"""
+
+from celery import shared_task
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(name='backend.workers.transits.precompute_transits')
+def precompute_transits(days: int = None):
+    """
+    Fetch transits for today and the next days
+    
+    Runs shortly after midnight (and every 6 hours as a retry) so the
+    first question of the day is answered from the precomputed snapshot.
+    
+    Args:
+        days: Days ahead (default: TRANSIT_PRECOMPUTE_DAYS)
+    
+    Returns:
+        dict: Days fetched / already cached / failed
+    """
+    from backend.engines.transit_engine import precompute_transits as _precompute
+    
+    try:
+        return _precompute(days)
+    
+    except Exception as e:
+        logger.error(f"❌ Transit precompute failed: {e}")
+        return {"error": str(e)}
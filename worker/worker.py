@@ -1,93 +1,453 @@
-import queue
-import threading
+"""
+In-process Task Executor
+Thread pools per task type with priority lanes
+
+- Every task type (AI, PDF, KUNDALI, CHART) has its own pool of worker
+  threads, so a slow PDF never holds up an AI answer or a chart
+- Within a pool, tasks wait in priority lanes: paid work first, then
+  interactive work a user is waiting on, then background prefetch
+- Each lane is bounded (WORKER_QUEUE_SIZE); a full lane makes the caller
+  wait up to WORKER_ENQUEUE_WAIT_SECONDS, then the task is rejected
+- Tasks carry a deadline and can be cancelled; expired or cancelled
+  tasks are skipped when their turn comes (a running task is not
+  interrupted)
+- shutdown() stops intake and drains what is queued, within a timeout
+
+Pools are threads: the tasks spend their time on Prokerala, OpenAI, the
+database and Twilio, and share the process caches.
+"""
+
+import time
+import uuid
+import atexit
 import logging
+import threading
+from collections import deque
 
+from backend.config import Config
 from backend.engines.ai_engine import ask_ai
 from backend.engines.pdf_engine import generate_pdf
 from backend.engines.astro_engine import get_kundali_cached
 
 logger = logging.getLogger(__name__)
 
+
 # =========================
-# TASK QUEUE
+# PRIORITIES + POOLS
 # =========================
 
-TASK_QUEUE = queue.Queue()
+PRIORITY_PAID = 0
+PRIORITY_INTERACTIVE = 1
+PRIORITY_BACKGROUND = 2
+
+PRIORITIES = (PRIORITY_PAID, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND)
+
+# task type -> worker threads, default deadline (seconds)
+POOLS = {
+    "AI": {"workers": Config.WORKER_AI_THREADS, "deadline": 60},
+    "PDF": {"workers": Config.WORKER_PDF_THREADS, "deadline": 300},
+    "KUNDALI": {"workers": Config.WORKER_KUNDALI_THREADS, "deadline": 600},
+    "CHART": {"workers": Config.WORKER_CHART_THREADS, "deadline": Config.KUNDALI_JOB_TIMEOUT_SECONDS},
+}
+
+
+def _run_ai(task):
+    ask_ai(task["phone"], task["question"], task["data"])
+
+
+def _run_pdf(task):
+    generate_pdf(task["phone"], task["data"])
+
+
+def _run_kundali(task):
+    get_kundali_cached(task["data"])
+
+
+def _run_chart(task):
+    from backend.engines.kundali_job_engine import run_chart_job
+
+    run_chart_job(task["job"])
+
+
+HANDLERS = {
+    "AI": _run_ai,
+    "PDF": _run_pdf,
+    "KUNDALI": _run_kundali,
+    "CHART": _run_chart,
+}
 
 
 # =========================
-# WORKER LOOP
+# TASK
 # =========================
 
-def worker_loop():
-    logger.info("⚙️ Background worker started")
+class Task:
+    """
+    A queued unit of work
 
-    while True:
-        task = TASK_QUEUE.get()
+    Attributes:
+        task_id: Unique id (logs)
+        type: Task type (pool)
+        payload: Handler argument
+        priority: PRIORITY_* lane
+        deadline: Monotonic time after which the task is skipped
+        state: queued / running / done / failed / expired / cancelled
+    """
 
-        try:
-            task_type = task["type"]
+    def __init__(self, task_type, payload, priority, deadline_seconds):
+        self.task_id = uuid.uuid4().hex[:12]
+        self.type = task_type
+        self.payload = payload
+        self.priority = priority
 
-            if task_type == "AI":
-                ask_ai(
-                    task["phone"],
-                    task["question"],
-                    task["data"]
-                )
+        self.enqueued_at = time.monotonic()
+        self.deadline = self.enqueued_at + deadline_seconds
+
+        self.state = "queued"
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        """
+        Skip the task if it has not started
+
+        Returns:
+            bool: False if it is already running or finished
+        """
+
+        with self._lock:
+            if self.state != "queued":
+                return False
+
+            self.state = "cancelled"
+            return True
+
+    def _claim(self):
+        # queued -> running, unless cancelled first
+        with self._lock:
+            if self.state != "queued":
+                return False
+
+            self.state = "running"
+            return True
 
-            elif task_type == "PDF":
-                generate_pdf(
-                    task["phone"],
-                    task["data"]
-                )
 
-            elif task_type == "KUNDALI":
-                get_kundali_cached(
-                    task["data"]
+# =========================
+# POOL
+# =========================
+
+class TaskPool:
+    """Worker threads for one task type, fed from bounded priority lanes"""
+
+    def __init__(self, task_type, workers, queue_size):
+        self.type = task_type
+        self.workers = workers
+        self.queue_size = queue_size
+
+        self._lanes = {priority: deque() for priority in PRIORITIES}
+        self._cond = threading.Condition()
+        self._threads = []
+        self._running = 0
+        self._accepting = True
+
+        self._stats = {
+            "submitted": 0,
+            "completed": 0,
+            "failed": 0,
+            "rejected": 0,
+            "expired": 0,
+            "cancelled": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+            "run_ms_total": 0.0
+        }
+
+    # ---------- LIFECYCLE ----------
+
+    def start(self):
+        with self._cond:
+            if self._threads:
+                return
+
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._loop,
+                    name=f"worker-{self.type.lower()}-{i}",
+                    daemon=True
                 )
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, drain=True):
+        """Stop intake; workers exit once the lanes are empty (drain) or at once"""
+
+        with self._cond:
+            self._accepting = False
+
+            if not drain:
+                for lane in self._lanes.values():
+                    for task in lane:
+                        task.state = "cancelled"
+                        self._stats["cancelled"] += 1
+                    lane.clear()
+
+            self._cond.notify_all()
+
+    def join(self, timeout):
+        deadline = time.monotonic() + timeout
+
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+
+        return not any(thread.is_alive() for thread in self._threads)
+
+    # ---------- SUBMISSION ----------
+
+    def submit(self, task, wait):
+        """
+        Queue a task, waiting up to `wait` seconds for room in its lane
+
+        Returns:
+            bool: False if the pool is stopped or the lane stayed full
+        """
+
+        lane = self._lanes[task.priority]
+        give_up = time.monotonic() + wait
+
+        with self._cond:
+            while self._accepting and len(lane) >= self.queue_size:
+                remaining = give_up - time.monotonic()
+
+                if remaining <= 0:
+                    break
+
+                self._cond.wait(remaining)
+
+            if not self._accepting or len(lane) >= self.queue_size:
+                self._stats["rejected"] += 1
+                return False
+
+            lane.append(task)
+            self._stats["submitted"] += 1
+            self._cond.notify_all()
+
+        return True
+
+    # ---------- WORKERS ----------
+
+    def _next(self):
+        # Called with self._cond held
+        for priority in PRIORITIES:
+            if self._lanes[priority]:
+                task = self._lanes[priority].popleft()
 
-        except Exception:
-            logger.exception("❌ Worker task failed")
+                # Room for a producer waiting on this lane
+                self._cond.notify_all()
 
-        finally:
-            TASK_QUEUE.task_done()
+                return task
+
+        return None
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                task = self._next()
+
+                while task is None:
+                    if not self._accepting:
+                        return
+
+                    self._cond.wait()
+                    task = self._next()
+
+                now = time.monotonic()
+                waited_ms = (now - task.enqueued_at) * 1000
+
+                self._stats["wait_ms_total"] += waited_ms
+                self._stats["wait_ms_max"] = max(self._stats["wait_ms_max"], waited_ms)
+
+                if now > task.deadline and task.cancel():
+                    task.state = "expired"
+                    self._stats["expired"] += 1
+                    logger.warning(f"⏳ {self.type} task {task.task_id} expired after {waited_ms / 1000:.0f}s in queue")
+                    continue
+
+                if not task._claim():
+                    self._stats["cancelled"] += 1
+                    continue
+
+                self._running += 1
+
+            started = time.monotonic()
+
+            try:
+                HANDLERS[self.type](task.payload)
+                task.state = "done"
+            except Exception:
+                task.state = "failed"
+                logger.exception(f"❌ {self.type} task {task.task_id} failed")
+
+            with self._cond:
+                self._running -= 1
+                self._stats["completed" if task.state == "done" else "failed"] += 1
+                self._stats["run_ms_total"] += (time.monotonic() - started) * 1000
+
+    # ---------- METRICS ----------
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["depth"] = {str(priority): len(lane) for priority, lane in self._lanes.items()}
+            stats["running"] = self._running
+            stats["workers"] = self.workers
+
+        dequeued = stats["completed"] + stats["failed"] + stats["expired"] + stats["cancelled"]
+        finished = stats["completed"] + stats["failed"]
+
+        stats["avg_wait_ms"] = round(stats.pop("wait_ms_total") / dequeued, 1) if dequeued else None
+        stats["max_wait_ms"] = round(stats.pop("wait_ms_max"), 1)
+        stats["avg_run_ms"] = round(stats.pop("run_ms_total") / finished, 1) if finished else None
+
+        return stats
+
+
+# =========================
+# EXECUTOR
+# =========================
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _get_pool(task_type):
+    pool = _pools.get(task_type)
+
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(task_type)
+
+            if pool is None:
+                settings = POOLS[task_type]
+                pool = _pools[task_type] = TaskPool(task_type, settings["workers"], Config.WORKER_QUEUE_SIZE)
+                pool.start()
+
+    return pool
+
+
+def submit(task_type, payload, priority=PRIORITY_INTERACTIVE, deadline_seconds=None):
+    """
+    Queue a task on its type's pool
+
+    Args:
+        task_type: "AI", "PDF", "KUNDALI" or "CHART"
+        payload: Handler argument
+        priority: PRIORITY_PAID / PRIORITY_INTERACTIVE / PRIORITY_BACKGROUND
+        deadline_seconds: Skip the task if it has not started by then
+            (default: the pool's deadline)
+
+    Returns:
+        Task, or None if it was rejected (pool full or shutting down)
+    """
+
+    if deadline_seconds is None:
+        deadline_seconds = POOLS[task_type]["deadline"]
+
+    task = Task(task_type, payload, priority, deadline_seconds)
+
+    if not _get_pool(task_type).submit(task, Config.WORKER_ENQUEUE_WAIT_SECONDS):
+        logger.warning(f"🚫 {task_type} task rejected (queue full or shutting down)")
+        return None
+
+    return task
+
+
+def shutdown(drain=True, timeout=None):
+    """
+    Stop intake and wait for the pools
+
+    Args:
+        drain: Run what is already queued (False drops it)
+        timeout: Seconds to wait in total (default: WORKER_DRAIN_SECONDS)
+
+    Returns:
+        bool: True if every worker finished in time
+    """
+
+    timeout = Config.WORKER_DRAIN_SECONDS if timeout is None else timeout
+
+    with _pools_lock:
+        pools = list(_pools.values())
+
+    for pool in pools:
+        pool.stop(drain)
+
+    deadline = time.monotonic() + timeout
+    finished = all([pool.join(max(0.0, deadline - time.monotonic())) for pool in pools])
+
+    if finished:
+        logger.info("⚙️ Background workers drained")
+    else:
+        logger.warning("⚠️ Background workers still busy at shutdown")
+
+    return finished
+
+
+def get_worker_stats():
+    """Queue depth per lane, wait and run times per pool, for health checks"""
+
+    with _pools_lock:
+        pools = list(_pools.values())
+
+    return {pool.type: pool.stats() for pool in pools}
 
 
 # =========================
-# START WORKER THREAD
+# START WORKER THREADS
 # =========================
 
+_started = False
+
+
 def start_worker():
-    thread = threading.Thread(
-        target=worker_loop,
-        daemon=True
-    )
-    thread.start()
+    global _started
+
+    for task_type in POOLS:
+        _get_pool(task_type)
+
+    if not _started:
+        _started = True
+        atexit.register(shutdown)
+
+    logger.info("⚙️ Background workers started: " + ", ".join(
+        f"{task_type}×{settings['workers']}" for task_type, settings in POOLS.items()
+    ))
 
 
 # =========================
 # ENQUEUE HELPERS
 # =========================
 
-def enqueue_ai(phone, question, data):
-    TASK_QUEUE.put({
-        "type": "AI",
+def enqueue_ai(phone, question, data, priority=PRIORITY_PAID):
+    return submit("AI", {
         "phone": phone,
         "question": question,
         "data": data
-    })
+    }, priority)
 
 
-def enqueue_pdf(phone, data):
-    TASK_QUEUE.put({
-        "type": "PDF",
+def enqueue_pdf(phone, data, priority=PRIORITY_PAID):
+    return submit("PDF", {
         "phone": phone,
         "data": data
-    })
+    }, priority)
 
 
-def enqueue_kundali(data):
-    TASK_QUEUE.put({
-        "type": "KUNDALI",
+def enqueue_kundali(data, priority=PRIORITY_BACKGROUND):
+    return submit("KUNDALI", {
         "data": data
-    })
+    }, priority)
+
+
+def enqueue_chart(job, priority=PRIORITY_INTERACTIVE):
+    return submit("CHART", {
+        "job": job
+    }, priority)